@@ -108,19 +108,20 @@ class HospitalRAGAgent:
                 Tool(
                     name="Waits",
                     func=get_current_wait_times,
-                    description="""Use when asked about current wait times at a specific hospital. \
-            This tool can only get the current wait time at a hospital and does not have any information \
-            about aggregate or historical wait times. Do not pass the word "hospital" as input, only the \
-            hospital name itself. For example, if the prompt is "What is the current wait time at \
-            Jordan Inc Hospital?", the input should be "Jordan Inc".""",
+                    description=f"""Use when asked about wait times at a specific hospital. \
+            This tool returns the current wait time at a hospital together with the rolling average \
+            and the {AppConfig.WAIT_TIME_PERCENTILE:g}th percentile wait time over the recent history \
+            kept by the wait time feed. Do not pass the word "hospital" as input, only the hospital \
+            name itself. For example, if the prompt is "What is the current wait time at Jordan Inc \
+            Hospital?", the input should be "Jordan Inc".""",
                 ),
                 Tool(
                     name="Availability",
                     func=get_most_available_hospital,
                     description="""Use when you need to find out which hospital has the shortest \
-            wait time. This tool does not have any information about aggregate or historical wait times. \
-            This tool returns a dictionary with the hospital name as the key and the wait time in minutes \
-            as the value.""",
+            current wait time. This tool returns a dictionary with the hospital name as the key and \
+            the current wait time in minutes as the value. For the recent average or percentile wait \
+            time of a specific hospital, use the Waits tool instead.""",
                 ),
             ]
         return self._tools
@@ -1,15 +1,69 @@
 import asyncio
-from typing import Any, Dict, List, Literal, Optional
+import time
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
 from elasticsearch import Elasticsearch
 from google import generativeai as genai
 from openai import OpenAI
 
+from retrieval import (
+    CHAPTER_FIELD,
+    DISORDER_FIELD,
+    BM25KeywordSource,
+    CriteriaIndex,
+    DisorderIndex,
+    ElasticsearchKeywordSource,
+    ElasticsearchVectorSource,
+    HybridOptions,
+    LocalVectorSource,
+    RankedList,
+    Reranker,
+    ResultCache,
+    RetrievalPlanner,
+    SearchRequest,
+    SearchSource,
+    SectionHierarchy,
+    SectionRouter,
+    SourceResults,
+    cached_result,
+    clause_names,
+    fuse,
+    get_bm25_index,
+    get_corpus,
+    get_index_profile,
+    get_reranker,
+    get_result_cache,
+    get_vector_index,
+    index_embedding_dims,
+    index_generation,
+    index_mappings,
+    is_chunk_doc_id,
+    load_centroids,
+    profile_report,
+    profile_stages,
+    skip_caching,
+)
+from retrieval.corpus import SOURCE_FIELDS
+from retrieval.fusion import FusedHit, FusionMethod
+from retrieval.sources import Payloads
 from utils import AppConfig, logger
 
 load_dotenv()
 
+# Fields returned by search_by_criteria
+CRITERIA_FIELDS = (
+    "title",
+    "sub_title",
+    "content",
+    "section_id",
+    "parent_section_title",
+    "context_headers",
+)
+
+# Sources có latency phụ thuộc cluster ES (planner theo dõi EWMA của chúng)
+_ES_SOURCES = (ElasticsearchKeywordSource, ElasticsearchVectorSource)
+
 
 class HealthcareRetriever:
     """
@@ -26,23 +80,36 @@ class HealthcareRetriever:
        - Dense vector search với cosine similarity
        - Tốt cho câu hỏi dài, paraphrase, đồng nghĩa
 
-    3. HYBRID + RRF:
-       - Reciprocal Rank Fusion kết hợp 2 phương pháp
-       - Ưu tiên documents xuất hiện trong cả 2 results
+    3. HYBRID + FUSION:
+       - Fuse N ranked lists (retrieval.fusion): RRF, weighted RRF, score
+       - Ưu tiên documents xuất hiện trong >= 2 sources (overlap boost)
 
     4. HIERARCHICAL BOOST:
        - Boost documents cùng section với top results
-       - Trả về context (parent, siblings) khi cần
+       - Trả về context (parent, siblings) khi cần, lấy từ SectionHierarchy
+         dựng sẵn trong memory (không tốn thêm 1 query ES)
     ─────────────────────────────────────────────────────────────────
     """
 
     def __init__(
         self,
         model_name: Literal["openai", "google"] = "openai",
+        vector_backend: Literal["elasticsearch", "local"] = (
+            AppConfig.DSM5_VECTOR_BACKEND
+        ),
+        keyword_backend: Literal["elasticsearch", "local"] = (
+            AppConfig.DSM5_KEYWORD_BACKEND
+        ),
+        reranker: str = AppConfig.DSM5_RERANKER,
     ):
-        self.index_name = AppConfig.INDEX_NAME_ELS
+        self.index_name = AppConfig.DSM5_INDEX_NAME
         self.model_name = model_name
-        self.vector_size = AppConfig.VECTOR_SIZE
+        # Kích thước embedding đọc từ metadata của index khi cần lần đầu
+        self._vector_size: Optional[int] = None
+        # Thời điểm dùng fallback VECTOR_SIZE (0 = đã đọc được từ index)
+        self._vector_size_fallback_at = 0.0
+        # Phải khớp profile đã dùng khi tạo index (process_data/index_elastic.py)
+        self.index_profile = get_index_profile(AppConfig.ELS_INDEX_PROFILE)
 
         # Elasticsearch client
         self.els_client = Elasticsearch(
@@ -57,6 +124,352 @@ class HealthcareRetriever:
             self.embed_model = AppConfig.OPENAI_EMBEDDING
             self.openai_client = OpenAI(api_key=AppConfig.OPENAI_API_KEY)
 
+        self._hierarchy = None
+        self._hierarchy_failed = False
+        self._criteria_index = None
+        self._criteria_index_failed = False
+        self._section_router = None
+        self._section_router_failed = False
+        self._disorder_index = None
+        self._disorder_index_failed = False
+        # field → index có field đó không (disorder_key, chapter_id)
+        self._filter_fields: Dict[str, bool] = {}
+
+        # Retrieval sources được fuse trong hybrid_search, theo thứ tự ưu tiên
+        # khi hòa điểm. Thêm retriever mới bằng `add_source`.
+        self.sources: List[SearchSource] = [
+            self._keyword_source(keyword_backend),
+            self._vector_source(vector_backend),
+        ]
+        self.reranker = self._build_reranker(reranker)
+        self.planner = RetrievalPlanner()
+        self.two_phase = AppConfig.DSM5_TWO_PHASE
+        self.payload_store = AppConfig.DSM5_PAYLOAD_STORE
+        # Kết quả hybrid_search / search_by_criteria, key theo index generation
+        self.result_cache: Optional[ResultCache] = (
+            get_result_cache() if AppConfig.DSM5_RESULT_CACHE else None
+        )
+        self._generation: Optional[str] = None
+        self._generation_checked = 0.0
+
+    def _build_reranker(self, name: str) -> Optional[Reranker]:
+        """
+        Reranker chạy sau fusion. Cosine feature dùng vectors của local index
+        nếu đã export (process_data/index_elastic.py --export-vectors).
+        """
+        if not name or name == "none":
+            return None
+        kwargs = {}
+        try:
+            # Có corpus thì reranker đọc content local, chỉ cần fetch title
+            kwargs["corpus"] = get_corpus()
+            kwargs["vector_index"] = get_vector_index()
+        except Exception as e:
+            logger.info(f"Reranker runs without cached vectors: {str(e)}")
+        return get_reranker(name, **kwargs)
+
+    def _keyword_source(self, backend: str) -> SearchSource:
+        """
+        BM25 source: Elasticsearch, or the in-process BM25Index built from the
+        chunk file (offline path for tests, benchmarks and ES outages).
+        """
+        if backend == "local":
+            try:
+                return BM25KeywordSource(get_bm25_index())
+            except Exception as e:
+                logger.warning(f"Local BM25 index unavailable, using ES: {str(e)}")
+        return ElasticsearchKeywordSource(self)
+
+    def _vector_source(self, backend: str) -> SearchSource:
+        """
+        kNN source: Elasticsearch, or the in-process NumPy index.
+
+        "local" needs the embeddings exported with
+        `python process_data/index_elastic.py --export-vectors`; if the file is
+        missing we fall back to Elasticsearch.
+        """
+        if backend == "local":
+            try:
+                return LocalVectorSource(get_vector_index(), get_corpus())
+            except Exception as e:
+                logger.warning(f"Local vector index unavailable, using ES: {str(e)}")
+        return ElasticsearchVectorSource(self)
+
+    @property
+    def hierarchy(self) -> Optional[SectionHierarchy]:
+        """
+        Section hierarchy built once from the chunk file.
+
+        None if the chunk file cannot be loaded; context expansion then falls
+        back to the Elasticsearch query in `_get_section_context`.
+        """
+        if self._hierarchy is None and not self._hierarchy_failed:
+            try:
+                self._hierarchy = SectionHierarchy.build(get_corpus())
+                logger.info(f"Built DSM-5 hierarchy: {len(self._hierarchy)} sections")
+            except Exception as e:
+                self._hierarchy_failed = True
+                logger.warning(f"Cannot build DSM-5 hierarchy, using ES: {str(e)}")
+        return self._hierarchy
+
+    @property
+    def criteria_index(self) -> Optional[CriteriaIndex]:
+        """
+        Disorder/criterion lookup built once from the chunk file.
+
+        None if the chunk file cannot be loaded; `search_by_criteria` then
+        always uses the Elasticsearch phrase query.
+        """
+        if self._criteria_index is None and not self._criteria_index_failed:
+            try:
+                self._criteria_index = CriteriaIndex(get_corpus())
+                logger.info(
+                    f"Built DSM-5 criteria index: {len(self._criteria_index)} disorders"
+                )
+            except Exception as e:
+                self._criteria_index_failed = True
+                logger.warning(f"Cannot build DSM-5 criteria index, using ES: {str(e)}")
+        return self._criteria_index
+
+    def _fetch_payloads(
+        self, doc_ids: List[str], fields: Sequence[str] = SOURCE_FIELDS
+    ) -> Payloads:
+        """
+        Phase 2 của two-phase search: lấy `_source` cho các doc đã thắng fusion.
+
+        "local" đọc từ chunk file trong memory (tra doc id), ngược lại dùng
+        1 request `mget` duy nhất. `fields` thu hẹp `_source` (vd. chỉ các
+        field reranker cần).
+        """
+        if not doc_ids:
+            return {}
+        if self.payload_store == "local":
+            try:
+                corpus = get_corpus()
+                rows = [(doc_id, corpus.row(doc_id)) for doc_id in doc_ids]
+                return {
+                    doc_id: corpus.source(row, fields)
+                    for doc_id, row in rows
+                    if row >= 0
+                }
+            except Exception as e:
+                logger.warning(f"Local payload store unavailable, using ES: {str(e)}")
+        response = self.els_client.mget(
+            index=self.index_name, ids=doc_ids, source=list(fields)
+        )
+        return {
+            doc["_id"]: doc["_source"] for doc in response["docs"] if doc.get("found")
+        }
+
+    @property
+    def index_generation(self) -> Optional[str]:
+        """
+        Generation id ElsIndexer ghi vào `_meta` của index mỗi lần (re)index.
+
+        Đọc lại tối đa mỗi DSM5_GENERATION_REFRESH_S giây, nên sau khi
+        reindex các kết quả cache cũ hết hiệu lực trong khoảng thời gian đó.
+        None nếu không đọc được mapping (khi đó không dùng cache).
+        """
+        now = time.monotonic()
+        if now - self._generation_checked >= AppConfig.DSM5_GENERATION_REFRESH_S:
+            generation = index_generation(self.els_client, self.index_name)
+            if generation != self._generation and self._generation is not None:
+                logger.info(f"DSM-5 index generation changed: {generation}")
+            self._generation, self._generation_checked = generation, now
+        return self._generation
+
+    def check_doc_ids(self) -> None:
+        """
+        Kiểm tra id của index theo scheme `chunk_doc_id` (lấy mẫu 1 hit).
+
+        Index tạo trước khi đổi sang id theo content hash dùng id theo vị trí;
+        mọi join với corpus / vector index local sẽ miss mà không báo lỗi.
+        Raise RuntimeError khi cần reindex; chỉ warning nếu không gọi được ES.
+        """
+        try:
+            response = self.els_client.search(
+                index=self.index_name,
+                body={"size": 1, "_source": False, "query": {"match_all": {}}},
+            )
+        except Exception as e:
+            logger.warning(f"Cannot check DSM-5 doc ids: {str(e)}")
+            return
+        hits = response["hits"]["hits"]
+        if hits and not is_chunk_doc_id(hits[0]["_id"]):
+            message = (
+                f"Index '{self.index_name}' uses legacy doc ids ('{hits[0]['_id']}'); "
+                "reindex with `./index_data.sh --index-els`"
+            )
+            logger.error(message)
+            raise RuntimeError(message)
+
+    @property
+    def cache_config(self) -> Dict[str, Any]:
+        """
+        Cấu hình làm đổi kết quả mà không đổi index generation; là một phần
+        key của result cache (đổi backend / reranker không dùng lại kết quả cũ).
+        """
+        return {
+            "sources": [type(source).__name__ for source in self.sources],
+            "reranker": self.reranker.name if self.reranker is not None else "none",
+            "index_profile": self.index_profile.name,
+            "index": self.index_name,
+        }
+
+    def add_source(self, source: SearchSource) -> None:
+        """Register one more ranked list for hybrid fusion."""
+        self.sources.append(source)
+
+    @property
+    def section_router(self) -> Optional[SectionRouter]:
+        """
+        Coarse stage của coarse-to-fine kNN: centroid theo chương, dựng từ
+        section hierarchy + vectors đã export, hoặc file centroid do
+        ElsIndexer ghi (DSM5_CENTROIDS_PATH) nếu không export vectors. None
+        nếu thiếu; khi đó kNN luôn search phẳng trên mọi chunk.
+        """
+        if self._section_router is None and not self._section_router_failed:
+            try:
+                if self.hierarchy is None:
+                    raise ValueError("section hierarchy unavailable")
+                try:
+                    vector_index = get_vector_index()
+                except FileNotFoundError:
+                    vector_index = None
+                self._section_router = (
+                    SectionRouter(self.hierarchy, vector_index)
+                    if vector_index is not None
+                    else SectionRouter(self.hierarchy, centroids=load_centroids())
+                )
+                logger.info(
+                    f"Built DSM-5 section router: {len(self._section_router)} chapters"
+                )
+            except Exception as e:
+                self._section_router_failed = True
+                logger.warning(f"Cannot build DSM-5 section router: {str(e)}")
+        return self._section_router
+
+    @property
+    def disorder_index(self) -> Optional[DisorderIndex]:
+        """
+        Từ điển tên rối loạn (từ section titles) để nhận diện rối loạn trong
+        query. None nếu không load được chunk file; khi đó không filter.
+        """
+        if self._disorder_index is None and not self._disorder_index_failed:
+            try:
+                self._disorder_index = DisorderIndex(get_corpus(), self.hierarchy)
+                logger.info(
+                    f"Built DSM-5 disorder index: {len(self._disorder_index)} disorders"
+                )
+            except Exception as e:
+                self._disorder_index_failed = True
+                logger.warning(f"Cannot build DSM-5 disorder index: {str(e)}")
+        return self._disorder_index
+
+    def _supports_entity_filter(self) -> bool:
+        return self._supports_filter_field(DISORDER_FIELD)
+
+    def _supports_filter_field(self, field: str) -> bool:
+        """
+        Local sources always can filter; Elasticsearch sources only if the
+        index was built with `field` (disorder_key, chapter_id).
+        """
+        if field not in self._filter_fields:
+            uses_es = any(isinstance(s, _ES_SOURCES) for s in self.sources)
+            mappings = (
+                index_mappings(self.els_client, self.index_name) if uses_es else []
+            )
+            if mappings is None:
+                return False
+            self._filter_fields[field] = all(
+                field in m.get("properties", {}) for m in mappings
+            )
+            if not self._filter_fields[field]:
+                logger.warning(
+                    f"Index {self.index_name} has no {field} field; "
+                    f"re-index to enable {field} filters"
+                )
+        return self._filter_fields[field]
+
+    @property
+    def vector_size(self) -> int:
+        """
+        Query embedding size, taken from the index rather than a constant.
+
+        Local kNN uses the dims of the exported matrix; otherwise the
+        `_meta.embedding_dims` (or `embedding.dims`) of `index_name`. Falls
+        back to AppConfig.VECTOR_SIZE if neither can be read; the fallback is
+        cached too and the index re-read every DSM5_GENERATION_REFRESH_S
+        seconds, like index_generation.
+        """
+        if self._vector_size is not None and (
+            not self._vector_size_fallback_at
+            or time.monotonic() - self._vector_size_fallback_at
+            < AppConfig.DSM5_GENERATION_REFRESH_S
+        ):
+            return self._vector_size
+        dims = None
+        for source in self.sources:
+            if isinstance(source, LocalVectorSource):
+                dims = source.index.dims
+        if dims is None:
+            dims = index_embedding_dims(self.els_client, self.index_name)
+        if dims is None:
+            logger.warning(
+                f"Embedding size of {self.index_name} unknown, "
+                f"using {AppConfig.VECTOR_SIZE}"
+            )
+            self._vector_size = AppConfig.VECTOR_SIZE
+            self._vector_size_fallback_at = time.monotonic()
+            return self._vector_size
+        self._vector_size, self._vector_size_fallback_at = dims, 0.0
+        logger.info(f"DSM-5 index {self.index_name}: {dims}-dim embeddings")
+        return self._vector_size
+
+    def warmup(self) -> None:
+        """Build in-memory indexes ahead of the first request."""
+        _ = self.hierarchy
+        _ = self.criteria_index
+        if AppConfig.DSM5_ENTITY_FILTER:
+            _ = self.disorder_index
+        if AppConfig.DSM5_COARSE_SECTIONS > 0:
+            _ = self.section_router
+
+    def profile_queries(
+        self,
+        questions: Sequence[str],
+        size: int = 20,
+        include_knn: bool = False,
+        slowest: int = 5,
+    ) -> Dict[str, Any]:
+        """
+        Chạy từng câu hỏi với `profile: true` trên index hiện tại.
+
+        Trả về thời gian theo clause / phase (p50/p90/p99) của keyword query
+        (retrieval/profiling.py) và các câu hỏi chậm nhất.
+        """
+        profiled, per_query, took = [], [], []
+        for question in questions:
+            body = self._build_keyword_query(question, size=size)
+            names = clause_names(body)
+            if include_knn:
+                body["knn"] = {
+                    "field": "embedding",
+                    "query_vector": self._get_embedding(text=question),
+                    "k": size,
+                    "num_candidates": self.index_profile.num_candidates(size),
+                }
+            body["profile"] = True
+            try:
+                response = self.els_client.search(index=self.index_name, body=body)
+            except Exception as e:
+                logger.warning(f"Profiling failed for '{question}': {str(e)}")
+                continue
+            profiled.append(question)
+            per_query.append(profile_stages(response.get("profile", {}), names))
+            took.append(response.get("took", 0))
+        return profile_report(profiled, per_query, took, slowest=slowest)
+
     def _get_embedding(self, text: str) -> List[float]:
         """Get embedding vector for query"""
         if self.model_name == "openai":
@@ -140,15 +553,22 @@ class HealthcareRetriever:
         }
 
     def _build_vector_query(
-        self, query_vector: List[float], size: int = 20, num_candidates: int = 100
+        self,
+        query_vector: List[float],
+        size: int = 20,
+        num_candidates: Optional[int] = None,
     ) -> Dict:
         """
         Build kNN vector search query.
 
         Strategy:
         - k: Số results trả về
-        - num_candidates: Số candidates xem xét (cao hơn = chính xác hơn nhưng chậm hơn)
+        - num_candidates: Số candidates xem xét (cao hơn = chính xác hơn nhưng chậm hơn).
+          Mặc định theo index profile: profile quantized (int8/int4/bbq) cần
+          nhiều candidates hơn để giữ recall.
         """
+        if num_candidates is None:
+            num_candidates = self.index_profile.num_candidates(size)
         return {
             "knn": {
                 "field": "embedding",
@@ -168,58 +588,6 @@ class HealthcareRetriever:
             ],
         }
 
-    def _reciprocal_rank_fusion(
-        self,
-        keyword_hits: List[Dict],
-        vector_hits: List[Dict],
-        k: int = 60,
-        keyword_weight: float = 1.0,
-        vector_weight: float = 1.0,
-    ) -> Dict[str, Dict]:
-        """
-        RRF với weighted scores.
-
-        Công thức: score = w1/(k + rank_keyword) + w2/(k + rank_vector)
-
-        Args:
-            k: RRF constant (60 là standard, cao hơn = ít phân biệt rank)
-            keyword_weight: Weight cho BM25 results
-            vector_weight: Weight cho semantic results
-        """
-        doc_scores = {}
-        doc_data = {}
-
-        # Process keyword results
-        for rank, hit in enumerate(keyword_hits, start=1):
-            doc_id = hit["_id"]
-            score = keyword_weight / (k + rank)
-            doc_scores[doc_id] = doc_scores.get(doc_id, 0) + score
-            doc_data[doc_id] = hit["_source"]
-            doc_data[doc_id]["_keyword_rank"] = rank
-            doc_data[doc_id]["_keyword_score"] = hit.get("_score", 0)
-
-        # Process vector results
-        for rank, hit in enumerate(vector_hits, start=1):
-            doc_id = hit["_id"]
-            score = vector_weight / (k + rank)
-            doc_scores[doc_id] = doc_scores.get(doc_id, 0) + score
-            if doc_id not in doc_data:
-                doc_data[doc_id] = hit["_source"]
-            doc_data[doc_id]["_vector_rank"] = rank
-            doc_data[doc_id]["_vector_score"] = hit.get("_score", 0)
-
-        # Add RRF score to doc_data
-        for doc_id, score in doc_scores.items():
-            doc_data[doc_id]["_rrf_score"] = score
-            # Bonus nếu xuất hiện trong cả 2 results
-            if (
-                "_keyword_rank" in doc_data[doc_id]
-                and "_vector_rank" in doc_data[doc_id]
-            ):
-                doc_data[doc_id]["_rrf_score"] *= 1.2  # 20% boost
-
-        return doc_data
-
     def _get_section_context(
         self, section_ids: List[str], max_siblings: int = 2
     ) -> List[Dict]:
@@ -265,115 +633,357 @@ class HealthcareRetriever:
         self,
         query: str,
         top_k: int = 10,
-        rrf_k: int = 60,
-        keyword_weight: float = 1.0,
-        vector_weight: float = 1.2,  # Slight boost cho semantic
-        include_context: bool = False,
-        num_candidates: int = 100,
+        options: Optional[HybridOptions] = None,
+        **overrides: Any,
     ) -> List[Dict[str, Any]]:
         """
-        Hybrid search với RRF fusion.
+        Hybrid search: chạy mọi source trong `self.sources` rồi fuse kết quả.
 
         Args:
             query: Search query
             top_k: Số results trả về
-            rrf_k: RRF constant
-            keyword_weight: Weight cho BM25
-            vector_weight: Weight cho semantic search
-            include_context: Có lấy thêm sibling sections không
-            num_candidates: Số candidates cho kNN
+            options: Fusion weights, rerank, two-phase, filters, planner...
+                (xem HybridOptions; None = mặc định)
+            overrides: Field của HybridOptions ghi đè lên `options`,
+                vd. `hybrid_search(q, include_context=True)`
 
         Returns:
             List of ranked results với scores và metadata
         """
-        # Generate query embedding
-        query_vector = self._get_embedding(text=query)
+        return self._hybrid_search(query, top_k, HybridOptions.of(options, **overrides))
 
-        # Lấy nhiều hơn top_k để RRF có đủ candidates
-        fetch_size = min(top_k * 3, 50)
+    @cached_result("hybrid")
+    def _hybrid_search(
+        self, query: str, top_k: int, options: HybridOptions
+    ) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        for _, results in self._hybrid_stages(query, top_k, options):
+            pass
+        return results
 
-        # Execute both searches
-        keyword_query = self._build_keyword_query(query, size=fetch_size)
-        vector_query = self._build_vector_query(
-            query_vector, size=fetch_size, num_candidates=num_candidates
-        )
+    def hybrid_search_stream(
+        self,
+        query: str,
+        top_k: int = 10,
+        options: Optional[HybridOptions] = None,
+        **overrides: Any,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Hybrid search trả kết quả dần theo từng giai đoạn.
 
-        try:
-            keyword_response = self.els_client.search(
-                index=self.index_name, body=keyword_query
+        Events (mỗi event: {"stage", "results", "elapsed_ms"}):
+        ─────────────────────────────────────────────────────────────────
+        • keyword:  fusion của các source không cần embedding (BM25), gửi
+                    trước khi gọi embedding API
+        • fused:    sau khi mọi source (kNN) xong, đã fuse + rerank; giống
+                    kết quả cuối của hybrid_search khi không lấy context
+        • context:  thêm related_sections (chỉ khi include_context)
+        ─────────────────────────────────────────────────────────────────
+        `options` / `overrides` giống hybrid_search. Không có "keyword" nếu
+        mọi source cần embedding hoặc planner dừng sớm sau BM25.
+        """
+        started = time.perf_counter()
+        options = HybridOptions.of(options, **overrides)
+        for stage, results in self._hybrid_stages(query, top_k, options, stream=True):
+            yield {
+                "stage": stage,
+                "results": results,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+
+    def _hybrid_stages(
+        self,
+        query: str,
+        top_k: int,
+        options: HybridOptions,
+        stream: bool = False,
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Các giai đoạn của hybrid_search, yield (stage, results).
+
+        Source không cần embedding chạy trước; với `stream` kết quả tạm của
+        chúng được yield ("keyword") trước khi embed query.
+        """
+        started = time.perf_counter()
+        two_phase = self.two_phase if options.two_phase is None else options.two_phase
+        include_context = options.include_context
+        rerank_depth = options.rerank_depth
+
+        entity_filter = options.entity_filter
+        if entity_filter is None:
+            entity_filter = AppConfig.DSM5_ENTITY_FILTER
+        disorders: List[str] = []
+        if entity_filter and self.disorder_index is not None:
+            disorders = self.disorder_index.detect(query)
+
+        # Lấy nhiều hơn top_k để fusion có đủ candidates; planner chọn số
+        # lượng theo latency budget nếu bật
+        adaptive = options.adaptive
+        if adaptive is None:
+            adaptive = AppConfig.DSM5_ADAPTIVE_PLANNER
+        plan = None
+        if adaptive:
+            # Không truyền include_context: lấy context khi nó gần như miễn
+            # phí (hierarchy trong memory), planner bỏ đi nếu ES quá tải
+            wants_context = (
+                self.hierarchy is not None
+                if include_context is None
+                else include_context
             )
-            vector_response = self.els_client.search(
-                index=self.index_name, body=vector_query
+            plan = self.planner.plan(
+                query,
+                top_k=top_k,
+                include_context=wants_context,
+                profile=self.index_profile,
+                es_stages=[s.name for s in self.sources if isinstance(s, _ES_SOURCES)],
+                disorders=disorders,
+                context_in_memory=self.hierarchy is not None,
             )
-        except Exception as e:
-            logger.error(f"Elasticsearch search failed: {str(e)}")
-            raise
+            # Plan đổi theo tải (ES chậm): kết quả đó không được cache, nếu
+            # không sẽ bị dùng lại suốt cả index generation
+            dropped_context = (
+                include_context is None and plan.include_context != wants_context
+            )
+            if dropped_context or plan.fetch_size != min(top_k * 3, 50):
+                skip_caching("planner changed fetch size / context")
+            if include_context is None:
+                include_context = plan.include_context
+            rerank_depth = rerank_depth or plan.rerank_depth
+        include_context = bool(include_context)
+        request = SearchRequest(
+            query=query,
+            size=plan.fetch_size if plan else min(top_k * 3, 50),
+            num_candidates=(
+                options.num_candidates
+                if options.num_candidates is not None or plan is None
+                else plan.num_candidates
+            ),
+            with_payloads=not two_phase,
+        )
 
-        keyword_hits = keyword_response["hits"]["hits"]
-        vector_hits = vector_response["hits"]["hits"]
+        if disorders and self._supports_entity_filter():
+            logger.info(f"Disorder filter: {disorders}")
+            request.keyword_filter = self.disorder_index.filter(disorders)
+            request.vector_filter = request.keyword_filter
 
-        # Log search stats
-        logger.info(
-            f"Keyword hits: {len(keyword_hits)}, Vector hits: {len(vector_hits)}"
-        )
+        coarse_sections = options.coarse_sections
+        if coarse_sections is None:
+            coarse_sections = AppConfig.DSM5_COARSE_SECTIONS
 
-        # Apply RRF fusion
-        doc_data = self._reciprocal_rank_fusion(
-            keyword_hits=keyword_hits,
-            vector_hits=vector_hits,
-            k=rrf_k,
-            keyword_weight=keyword_weight,
-            vector_weight=vector_weight,
+        weights = {"bm25": options.keyword_weight, "knn": options.vector_weight}
+        fusion = {
+            "method": options.fusion_method,
+            "k": options.rrf_k,
+            "overlap_boost": options.overlap_boost,
+            "top_k": top_k,
+            "rerank_depth": rerank_depth,
+            "reranker": self.reranker if options.rerank else None,
+        }
+        # Source không cần vector chạy trước (BM25 trước kNN); fusion vẫn theo
+        # thứ tự của self.sources
+        order = sorted(
+            range(len(self.sources)), key=lambda i: self.sources[i].needs_vector
         )
+        ran: Dict[int, Tuple[RankedList, Payloads]] = {}
+        fetched: Payloads = {}
+        skipped: List[str] = []
+        for n, i in enumerate(order):
+            source = self.sources[i]
+            if source.needs_vector and request.query_vector is None:
+                if stream and ran:
+                    yield "keyword", self._rank_results(
+                        query, request, ran, fetched, **fusion
+                    )
+                # Embed lần đầu khi cần, để early stop bỏ được cả API call
+                try:
+                    request.query_vector = self._get_embedding(text=query)
+                except Exception as e:
+                    logger.error(f"Query embedding failed: {str(e)}")
+                    raise
+                self._route_coarse(request, coarse_sections)
+            source_start = time.perf_counter()
+            try:
+                ranked, payloads = source.search(request)
+            except Exception as e:
+                backend = (
+                    "Elasticsearch" if isinstance(source, _ES_SOURCES) else "Local"
+                )
+                logger.error(f"{backend} {source.name} search failed: {str(e)}")
+                raise
+            self.planner.tracker.observe(
+                source.name, (time.perf_counter() - source_start) * 1000
+            )
+            ranked.weight = weights.get(source.name, source.weight)
+            ran[i] = (ranked, payloads)
+            if (
+                plan is not None
+                and plan.early_stop
+                and n < len(order) - 1
+                and self.planner.clear_winner(ranked.scores)
+            ):
+                skipped = [self.sources[j].name for j in order[n + 1 :]]
+                skip_caching(f"early stop skipped {', '.join(skipped)}")
+                break
 
-        # Sort by RRF score
-        sorted_docs = sorted(
-            doc_data.items(), key=lambda x: x[1].get("_rrf_score", 0), reverse=True
-        )[:top_k]
-
-        # Format results
-        results = []
-        section_ids = []
-
-        for doc_id, data in sorted_docs:
-            result = {
-                "id": doc_id,
-                "title": data.get("title", ""),
-                "sub_title": data.get("sub_title", ""),
-                "content": data.get("content", ""),
-                "section_id": data.get("section_id", ""),
-                "parent_section_title": data.get("parent_section_title", ""),
-                "context_headers": data.get("context_headers", ""),
-                "page_start": data.get("page_start"),
-                "scores": {
-                    "rrf": round(data.get("_rrf_score", 0), 4),
-                    "keyword_rank": data.get("_keyword_rank"),
-                    "vector_rank": data.get("_vector_rank"),
-                },
-            }
-            results.append(result)
-            if data.get("section_id"):
-                section_ids.append(data["section_id"])
+        results = self._rank_results(query, request, ran, fetched, log=True, **fusion)
+        yield "fused", results
+        if include_context:
+            # Bản sao: kết quả "fused" đã yield không bị thêm context
+            results = [dict(result) for result in results]
+        section_ids = [r["section_id"] for r in results if r["section_id"]]
 
         # Optionally add section context
-        if include_context and section_ids:
+        if include_context and results and self.hierarchy is not None:
+            for result in results:
+                result["related_sections"] = self.hierarchy.context(result["id"])
+        elif include_context and section_ids:
+            context_start = time.perf_counter()
             context_docs = self._get_section_context(section_ids)
+            self.planner.tracker.observe(
+                "context", (time.perf_counter() - context_start) * 1000
+            )
             for result in results:
                 result["related_sections"] = [
                     doc
                     for doc in context_docs
                     if doc.get("section_id") != result["section_id"]
                 ][:3]
+        if include_context:
+            yield "context", results
+
+        if plan is not None:
+            # 1 dòng / request để tune policy offline (JSON khi ENV_LOG=production)
+            logger.bind(
+                event="retrieval_plan",
+                plan=plan.as_dict(),
+                skipped_sources=skipped,
+                latency_ms=round((time.perf_counter() - started) * 1000, 2),
+                results=len(results),
+            ).info(
+                f"Retrieval plan: fetch={plan.fetch_size} "
+                f"candidates={plan.num_candidates} early_stop={bool(skipped)}"
+            )
+
+    def _rank_results(
+        self,
+        query: str,
+        request: SearchRequest,
+        ran: Dict[int, Tuple[RankedList, Payloads]],
+        fetched: Payloads,
+        method: FusionMethod,
+        k: int,
+        overlap_boost: float,
+        top_k: int,
+        rerank_depth: Optional[int],
+        reranker: Optional[Reranker],
+        log: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuse các source đã chạy, rerank, rồi lấy payload còn thiếu và format.
+
+        Với reranker, cả pool `rerank_depth` chỉ được fetch các field reranker
+        cần (`reranker.fields`, vd. title + section_id); payload đầy đủ chỉ
+        lấy cho top_k cuối cùng.
+        """
+        collected = SourceResults()
+        for i in sorted(ran):
+            collected.add(*ran[i])
+        collected.payloads.update(fetched)
+        if log:
+            logger.info(", ".join(f"{r.name} hits: {len(r)}" for r in collected.ranked))
+
+        fused = fuse(
+            collected.ranked,
+            method=method,
+            k=k,
+            top_k=max(rerank_depth or request.size, top_k) if reranker else top_k,
+            overlap_boost=overlap_boost,
+        )
+
+        results = []
+        if reranker is not None:
+            light = self._fetch_payloads(
+                [hit.doc_id for hit in fused if hit.doc_id not in collected.payloads],
+                fields=reranker.fields,
+            )
+            for hit in fused:
+                data = collected.payloads.get(hit.doc_id) or light.get(hit.doc_id, {})
+                results.append(self._format_hit(hit, data))
+            results = reranker.rerank(
+                query, results, top_k=top_k, query_vector=request.query_vector
+            )
+        else:
+            results = [self._format_hit(hit, {}) for hit in fused]
 
+        missing = [r["id"] for r in results if r["id"] not in collected.payloads]
+        if missing:
+            fetched.update(self._fetch_payloads(missing))
+            collected.payloads.update(fetched)
+        for result in results:
+            result.update(self._result_fields(collected.payloads.get(result["id"], {})))
         return results
 
+    @staticmethod
+    def _result_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Các field trả về của 1 chunk, từ `_source` (đầy đủ hoặc chỉ 1 phần)."""
+        return {
+            "title": data.get("title", ""),
+            "sub_title": data.get("sub_title", ""),
+            "content": data.get("content", ""),
+            "section_id": data.get("section_id", ""),
+            "parent_section_title": data.get("parent_section_title", ""),
+            "context_headers": data.get("context_headers", ""),
+            "page_start": data.get("page_start"),
+        }
+
+    def _format_hit(self, hit: FusedHit, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": hit.doc_id,
+            **self._result_fields(data),
+            "scores": {
+                "rrf": round(hit.score, 4),
+                "keyword_rank": hit.ranks.get("bm25"),
+                "vector_rank": hit.ranks.get("knn"),
+                "ranks": hit.ranks,
+            },
+        }
+
+    def _route_coarse(self, request: SearchRequest, coarse_sections: int) -> None:
+        """Coarse stage: giới hạn kNN vào các chương gần query nhất."""
+        # Filter theo rối loạn đã hẹp hơn 1 chương, không cần route thêm
+        if coarse_sections <= 0 or request.vector_filter is not None:
+            return
+        if not self._supports_filter_field(CHAPTER_FIELD):
+            return
+        router = self.section_router
+        if router is not None:
+            request.vector_filter = router.route(request.query_vector, coarse_sections)
+
+    @cached_result("criteria")
     def search_by_criteria(
         self, disorder_name: str, criteria: Optional[str] = None  # "A", "B", "C"...
     ) -> List[Dict[str, Any]]:
         """
         Tìm kiếm theo tên rối loạn và tiêu chí cụ thể.
         Ví dụ: search_by_criteria("Rối loạn trầm cảm", "A")
+
+        Tra `criteria_index` trong memory trước; chỉ query ES khi không tìm
+        thấy (tên rối loạn lạ, hoặc `criteria` là text tự do thay vì nhãn).
         """
+        if self.criteria_index is not None:
+            hits = self.criteria_index.lookup(disorder_name, criteria)
+            if hits:
+                corpus = self.criteria_index.corpus
+                return [
+                    {
+                        "id": corpus.ids[row],
+                        "score": score,
+                        **corpus.source(row, fields=CRITERIA_FIELDS),
+                    }
+                    for row, score in hits
+                ]
+            logger.info(f"Criteria index miss for '{disorder_name}', using ES")
+
         query_parts = [disorder_name]
         if criteria:
             query_parts.append(f"Tiêu chí {criteria}")
@@ -415,14 +1025,7 @@ class HealthcareRetriever:
                 }
             },
             "size": 10,
-            "_source": [
-                "title",
-                "sub_title",
-                "content",
-                "section_id",
-                "parent_section_title",
-                "context_headers",
-            ],
+            "_source": list(CRITERIA_FIELDS),
         }
 
         response = self.els_client.search(index=self.index_name, body=query)
@@ -447,6 +1050,8 @@ class HealthcareRetriever:
                 keyword_weight=config.get("keyword_weight", 1.0),
                 vector_weight=config.get("vector_weight", 1.2),
                 include_context=config.get("include_context", False),
+                fusion_method=config.get("fusion_method", "weighted_rrf"),
+                rerank=config.get("rerank", True),
             )
         except Exception as e:
             logger.error(f"Error during sync process healhcrare: {str(e)}")
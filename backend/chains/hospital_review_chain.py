@@ -1,7 +1,14 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain.chains.retrieval_qa.base import RetrievalQA
 from langchain.prompts import ChatPromptTemplate
 from langchain_community.vectorstores import Neo4jVector
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable
 
+from chains.review_retriever import ReviewVectorRetriever
 from prompt.hospital_prompt import SYSTEM_PROMPT, TEXT_NODE_PROPERTIES, USER_PROMPT
 from utils import AppConfig, ModelFactory, logger
 
@@ -12,17 +19,24 @@ class HospitalReviewChain:
 
     Chain type: 'stuff' - Gộp toàn bộ context → gửi 1 prompt duy nhất cho LLM
     Phù hợp khi: Context nhỏ, LLM mạnh
+
+    fast_attach=True (mặc định): chỉ bind vào index `reviews` đã có sẵn, dùng
+    driver dùng chung, không backfill embedding trên request path.
+    fast_attach=False: dùng Neo4jVector.from_existing_graph như trước
+    (tự embed các Review chưa có embedding - chậm ở request đầu tiên).
     """
 
-    def __init__(self, embedding_model: str, llm_model: str):
+    def __init__(self, embedding_model: str, llm_model: str, fast_attach: bool = True):
         """Initialize the HospitalReviewChain."""
         self.neo4j_uri = AppConfig.NEO4J_URI
         self.neo4j_user = AppConfig.NEO4J_USER
         self.neo4j_password = AppConfig.NEO4J_PASSWORD
         self.embedding_model = embedding_model
         self.llm_model = llm_model
+        self.fast_attach = fast_attach
         self._vector_index = None
         self._review_chain = None
+        self._stuff_chain = None
         self._llm = None
         self._embedder = None
 
@@ -43,21 +57,35 @@ class HospitalReviewChain:
         return self._embedder
 
     @property
-    def vector_index(self) -> Neo4jVector:
+    def vector_index(self) -> Neo4jVector | ReviewVectorRetriever:
         """Lazy initialization of Neo4j vector index."""
         if self._vector_index is None:
-            self._vector_index = Neo4jVector.from_existing_graph(
-                embedding=self.embedder,
-                url=self.neo4j_uri,
-                username=self.neo4j_user,
-                password=self.neo4j_password,
-                index_name=AppConfig.INDEX_NAME_NEO4J,
-                node_label="Review",
-                text_node_properties=TEXT_NODE_PROPERTIES,
-                embedding_node_property="embedding",
-            )
+            if self.fast_attach:
+                self._vector_index = ReviewVectorRetriever.attach(
+                    embedder=self.embedder,
+                    index_name=AppConfig.INDEX_NAME_NEO4J,
+                    k=AppConfig.REVIEW_TOP_K,
+                )
+            else:
+                self._vector_index = Neo4jVector.from_existing_graph(
+                    embedding=self.embedder,
+                    url=self.neo4j_uri,
+                    username=self.neo4j_user,
+                    password=self.neo4j_password,
+                    index_name=AppConfig.INDEX_NAME_NEO4J,
+                    node_label="Review",
+                    text_node_properties=TEXT_NODE_PROPERTIES,
+                    embedding_node_property="embedding",
+                )
         return self._vector_index
 
+    @property
+    def retriever(self) -> BaseRetriever:
+        """Retriever over the review vector index."""
+        if self.fast_attach:
+            return self.vector_index
+        return self.vector_index.as_retriever(k=AppConfig.REVIEW_TOP_K)
+
     def _create_prompt(self) -> ChatPromptTemplate:
         """Create the prompt template for review chain."""
         return ChatPromptTemplate.from_messages(
@@ -73,7 +101,7 @@ class HospitalReviewChain:
             self._review_chain = RetrievalQA.from_chain_type(
                 llm=self.llm,
                 chain_type="stuff",
-                retriever=self.vector_index.as_retriever(k=AppConfig.REVIEW_TOP_K),
+                retriever=self.retriever,
                 return_source_documents=True,
             )
 
@@ -82,6 +110,23 @@ class HospitalReviewChain:
 
         return self._review_chain
 
+    @property
+    def stuff_chain(self) -> Runnable:
+        """
+        Runnable 'stuff' chain (prompt | llm | str) used by the async path.
+
+        Same document formatting as RetrievalQA's combine_documents_chain, but
+        natively async and streamable token by token.
+        """
+        if self._stuff_chain is None:
+            self._stuff_chain = create_stuff_documents_chain(
+                llm=self.llm, prompt=self._create_prompt()
+            )
+        return self._stuff_chain
+
+    def _stuff_inputs(self, query: str, docs: list) -> dict:
+        return {"question": query, "context": docs, "language": AppConfig.LANGUAGE}
+
     def _process_response(self, query: str, docs: list) -> tuple[str, list]:
         """Process documents and generate response."""
 
@@ -113,28 +158,70 @@ class HospitalReviewChain:
             logger.error(f"Error in invoke: {str(e)}")
             raise e
 
-    async def ainvoke(self, query: str) -> tuple[str, list]:
+    async def ainvoke(
+        self, query: str, timeout: Optional[float] = None
+    ) -> tuple[str, list]:
         """
         Asynchronous review query.
 
+        Retrieval and generation are both awaited on the event loop, so
+        concurrent review questions no longer block each other. Cancelling the
+        calling task (or hitting `timeout`) aborts the in-flight LLM call.
+
         Args:
             query: User's question about hospital reviews
+            timeout: Optional deadline in seconds for the whole pipeline
 
         Returns:
             Tuple of (answer, source_documents)
         """
         try:
             logger.info(f"Processing async review query: {query}")
-            docs = await self.review_chain.retriever.ainvoke(input=query)
-            return self._process_response(query, docs)
+            async with asyncio.timeout(timeout):
+                docs = await self.retriever.ainvoke(input=query)
+                answer = await self.stuff_chain.ainvoke(self._stuff_inputs(query, docs))
+            return answer, docs
+        except asyncio.CancelledError:
+            logger.warning(f"Async review query cancelled: {query}")
+            raise
         except Exception as e:
             logger.error(f"Error in ainvoke: {str(e)}")
             raise e
 
+    async def astream(self, query: str) -> AsyncIterator[dict]:
+        """
+        Stream a review answer token by token.
+
+        Yields:
+            {"type": "context", "documents": [...]} once retrieval is done,
+            then {"type": "token", "content": str} for each generated chunk.
+
+        Closing the generator (e.g. client disconnect) cancels generation.
+        """
+        try:
+            logger.info(f"Processing streaming review query: {query}")
+            docs = await self.retriever.ainvoke(input=query)
+            yield {"type": "context", "documents": docs}
+            async for token in self.stuff_chain.astream(
+                self._stuff_inputs(query, docs)
+            ):
+                yield {"type": "token", "content": token}
+        except asyncio.CancelledError:
+            logger.warning(f"Streaming review query cancelled: {query}")
+            raise
+        except Exception as e:
+            logger.error(f"Error in astream: {str(e)}")
+            raise e
+
     def __del__(self):
         """Cleanup when object is destroyed."""
         try:
-            if self._vector_index and hasattr(self._vector_index, "_driver"):
+            # Fast-attach mode uses the shared driver, which must stay open
+            if (
+                not self.fast_attach
+                and self._vector_index
+                and hasattr(self._vector_index, "_driver")
+            ):
                 self._vector_index._driver.close()
         except Exception:
             pass
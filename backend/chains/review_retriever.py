@@ -0,0 +1,121 @@
+from typing import Any, Dict, List
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from prompt.hospital_prompt import TEXT_NODE_PROPERTIES
+from utils import AppConfig, get_async_neo4j_driver, get_neo4j_driver, logger
+
+
+def build_retrieval_query(
+    text_node_properties: List[str] = TEXT_NODE_PROPERTIES,
+    embedding_node_property: str = "embedding",
+) -> str:
+    """
+    Cypher tail applied to every (node, score) yielded by the vector index.
+
+    Same shape as the query Neo4jVector.from_existing_graph builds: the text
+    properties are concatenated into `text`, everything else (minus the
+    embedding) goes to `metadata`.
+    """
+    props = ", ".join(f"'{p}'" for p in text_node_properties)
+    nulls = ", ".join(f"`{p}`: Null" for p in text_node_properties)
+    return (
+        f"RETURN reduce(str='', k IN [{props}] |"
+        " str + '\\n' + k + ': ' + coalesce(node[k], '')) AS text, "
+        f"node {{.*, `{embedding_node_property}`: Null, id: Null, {nulls}}}"
+        " AS metadata, score"
+    )
+
+
+REVIEW_RETRIEVAL_QUERY = build_retrieval_query()
+
+
+class ReviewVectorRetriever(BaseRetriever):
+    """
+    Attach-only retriever over the existing Neo4j review vector index.
+
+    Unlike Neo4jVector.from_existing_graph it never scans for Review nodes
+    missing embeddings, never creates indexes and does not open its own
+    driver: it runs `db.index.vector.queryNodes` plus a prebuilt retrieval
+    query on the shared driver. Embedding backfill is done offline with
+    `process_data/index_neo4j.py insert`.
+    """
+
+    embedder: Embeddings
+    index_name: str = AppConfig.INDEX_NAME_NEO4J
+    k: int = AppConfig.REVIEW_TOP_K
+    retrieval_query: str = REVIEW_RETRIEVAL_QUERY
+    database: str = "neo4j"
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def search_query(self) -> str:
+        return (
+            "CALL db.index.vector.queryNodes($index, $k, $embedding) "
+            "YIELD node, score " + self.retrieval_query
+        )
+
+    @classmethod
+    def attach(cls, embedder: Embeddings, **kwargs: Any) -> "ReviewVectorRetriever":
+        """
+        Bind to an existing vector index, failing fast if it is missing.
+
+        Costs one `SHOW INDEXES` round trip; no embedding call is made.
+        """
+        retriever = cls(embedder=embedder, **kwargs)
+        with get_neo4j_driver().session(database=retriever.database) as session:
+            record = session.run(
+                "SHOW INDEXES YIELD name, type, state "
+                "WHERE name = $index AND type = 'VECTOR' RETURN state",
+                index=retriever.index_name,
+            ).single()
+        if record is None:
+            raise ValueError(
+                f"Vector index '{retriever.index_name}' does not exist. "
+                "Build it with `python process_data/index_neo4j.py insert`."
+            )
+        if record["state"] != "ONLINE":
+            logger.warning(
+                f"Vector index '{retriever.index_name}' is {record['state']}"
+            )
+        return retriever
+
+    @staticmethod
+    def _to_document(record: Dict[str, Any]) -> Document:
+        metadata = {k: v for k, v in record["metadata"].items() if v is not None}
+        metadata["score"] = record["score"]
+        return Document(page_content=record["text"], metadata=metadata)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = self.embedder.embed_query(query)
+        with get_neo4j_driver().session(database=self.database) as session:
+            records = session.run(
+                self.search_query,
+                index=self.index_name,
+                k=self.k,
+                embedding=embedding,
+            )
+            return [self._to_document(r.data()) for r in records]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = await self.embedder.aembed_query(query)
+        async with get_async_neo4j_driver().session(database=self.database) as session:
+            result = await session.run(
+                self.search_query,
+                index=self.index_name,
+                k=self.k,
+                embedding=embedding,
+            )
+            return [self._to_document(r.data()) async for r in result]
@@ -0,0 +1,84 @@
+"""Shared helpers for the retrieval benchmarks in this folder."""
+
+import json
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is the cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force cosine top-k row indices, shape (n_queries, k), best first."""
+    scores = normalize_rows(queries) @ normalize_rows(corpus).T
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def sample_queries(
+    corpus: np.ndarray, n: int, noise: float = 0.1, seed: int = 42
+) -> np.ndarray:
+    """
+    Synthetic queries: random corpus vectors plus Gaussian noise.
+
+    Keeps the benchmark free of embedding API calls; pass real query
+    embeddings instead when they are available.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(corpus), size=min(n, len(corpus)), replace=False)
+    base = normalize_rows(corpus[rows])
+    jitter = rng.normal(scale=noise / np.sqrt(corpus.shape[1]), size=base.shape)
+    return normalize_rows(base + jitter)
+
+
+def recall_at_k(
+    retrieved: Sequence[Sequence[Any]], truth: Sequence[Sequence[Any]]
+) -> float:
+    """Mean |retrieved ∩ truth| / |truth| over queries."""
+    if not truth:
+        return 0.0
+    hits = [len(set(r) & set(t)) / max(len(t), 1) for r, t in zip(retrieved, truth)]
+    return float(np.mean(hits))
+
+
+def latency_summary(latencies_ms: Sequence[float]) -> Dict[str, float]:
+    """p50 / p99 / mean of a list of latencies in milliseconds."""
+    if not len(latencies_ms):
+        return {"p50_ms": float("nan"), "p99_ms": float("nan"), "mean_ms": float("nan")}
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    """Print benchmark rows as an aligned text table."""
+    if not rows:
+        print("No results")
+        return
+    columns = list(dict.fromkeys(c for row in rows for c in row))
+    widths = {c: max(len(c), *(len(_fmt(row.get(c))) for row in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("─" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+
+def save_rows(rows: List[Dict[str, Any]], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+def _fmt(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
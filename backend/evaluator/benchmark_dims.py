@@ -0,0 +1,200 @@
+"""
+Recall / latency / memory of the DSM-5 embedding dimension profiles.
+
+Full-size embeddings (the largest dims index, or a .npy matrix) are cut to
+each size in EMBEDDING_DIMS Matryoshka-style and searched exactly with the
+in-process NumPy index; `--es` also indexes every size into a scratch
+Elasticsearch index and queries it with kNN. Ground truth is an exact
+search over the full-size embeddings, so recall shows what truncation costs.
+
+Usage (from backend/):
+    python -m evaluator.benchmark_dims --dims 256 512 768 1536 --k 10
+    python -m evaluator.benchmark_dims --vectors data/dsm5/full.npy --es --output dims.json
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from elasticsearch import Elasticsearch
+
+from evaluator.bench_utils import (
+    exact_top_k,
+    latency_summary,
+    print_table,
+    recall_at_k,
+    sample_queries,
+    save_rows,
+)
+from evaluator.benchmark_knn import (
+    build_profile_index,
+    index_size_bytes,
+    load_embeddings,
+    run_queries,
+)
+from retrieval import (
+    EMBEDDING_DIMS,
+    LocalVectorIndex,
+    VectorIndexProfile,
+    dims_index_name,
+    get_index_profile,
+    truncate_embeddings,
+)
+from utils import AppConfig, logger
+
+
+def benchmark_dims_local(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    dims_list: Sequence[int],
+    k: int = 10,
+    dtype: str = "float32",
+) -> List[Dict[str, Any]]:
+    """One row per size: exact search over truncated vectors vs. full-size truth."""
+    truth = exact_top_k(vectors, queries, k).tolist()
+    rows = []
+    for dims in dims_list:
+        index = LocalVectorIndex.build(truncate_embeddings(vectors, dims), dtype=dtype)
+        dim_queries = truncate_embeddings(queries, dims)
+        for vector in dim_queries[:10]:
+            index.search(vector, k=k)
+
+        retrieved, wall_ms = [], []
+        for vector in dim_queries:
+            start = time.perf_counter()
+            hits, _ = index.search(vector, k=k)
+            wall_ms.append((time.perf_counter() - start) * 1000)
+            retrieved.append(hits[0].tolist())
+        rows.append(
+            {
+                "dims": dims,
+                "backend": f"local-{dtype}",
+                f"recall@{k}": round(recall_at_k(retrieved, truth), 4),
+                **latency_summary(wall_ms),
+                "took_p50_ms": None,
+                "size_mb": round(index.vectors.nbytes / 2**20, 3),
+            }
+        )
+    return rows
+
+
+def benchmark_dims_es(
+    client: Elasticsearch,
+    ids: List[str],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    dims_list: Sequence[int],
+    profile: VectorIndexProfile,
+    k: int = 10,
+    source_index: str = AppConfig.INDEX_NAME_ELS,
+    keep: bool = False,
+) -> List[Dict[str, Any]]:
+    """Same comparison against a scratch kNN index per size."""
+    truth = [[ids[row] for row in rows] for rows in exact_top_k(vectors, queries, k)]
+    rows = []
+    for dims in dims_list:
+        name = f"{source_index}-bench-d{dims}"
+        build_profile_index(
+            client, name, profile, ids, truncate_embeddings(vectors, dims)
+        )
+        try:
+            retrieved, wall_ms, took_ms = run_queries(
+                client,
+                name,
+                truncate_embeddings(queries, dims),
+                k,
+                profile.num_candidates(k),
+            )
+            rows.append(
+                {
+                    "dims": dims,
+                    "backend": f"es-{profile.name}",
+                    f"recall@{k}": round(recall_at_k(retrieved, truth), 4),
+                    **latency_summary(wall_ms),
+                    "took_p50_ms": float(np.percentile(took_ms, 50)),
+                    "size_mb": round(index_size_bytes(client, name) / 2**20, 3),
+                }
+            )
+        finally:
+            if not keep:
+                client.indices.delete(index=name, ignore_unavailable=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark Matryoshka embedding sizes of the DSM-5 index"
+    )
+    parser.add_argument(
+        "--dims",
+        type=int,
+        nargs="+",
+        default=list(EMBEDDING_DIMS),
+        choices=EMBEDDING_DIMS,
+        help="Sizes to compare (default: all)",
+    )
+    parser.add_argument("--k", type=int, default=10, help="Hits per query")
+    parser.add_argument("--queries", type=int, default=200, help="Synthetic queries")
+    parser.add_argument(
+        "--noise", type=float, default=0.1, help="Noise added to synthetic queries"
+    )
+    parser.add_argument(
+        "--vectors",
+        type=str,
+        default=None,
+        help="Full-size .npy embeddings (default: read the largest dims index)",
+    )
+    parser.add_argument(
+        "--query-vectors",
+        type=str,
+        default=None,
+        help="Optional .npy file of real full-size query embeddings",
+    )
+    parser.add_argument(
+        "--es", action="store_true", help="Also benchmark Elasticsearch kNN"
+    )
+    parser.add_argument("--profile", type=str, default=AppConfig.ELS_INDEX_PROFILE)
+    parser.add_argument("--keep", action="store_true", help="Keep scratch indices")
+    parser.add_argument("--output", "-o", type=str, default=None, help="JSON output")
+    args = parser.parse_args()
+
+    client: Optional[Elasticsearch] = None
+    if args.es or not args.vectors:
+        client = Elasticsearch([f"http://{AppConfig.ELS_HOST}:{AppConfig.ELS_PORT}"])
+
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+        ids = [str(row) for row in range(len(vectors))]
+    else:
+        source = dims_index_name(max(args.dims))
+        ids, vectors = load_embeddings(client, source)
+        if not ids:
+            raise ValueError(f"Index '{source}' has no embeddings to benchmark")
+    dims_list = sorted(d for d in args.dims if d <= vectors.shape[1])
+    logger.info(f"Loaded {len(vectors)} embeddings ({vectors.shape[1]} dims)")
+
+    queries = (
+        np.load(args.query_vectors).astype(np.float32)
+        if args.query_vectors
+        else sample_queries(vectors, args.queries, noise=args.noise)
+    )
+    rows = benchmark_dims_local(vectors, queries, dims_list, k=args.k)
+    if args.es:
+        rows += benchmark_dims_es(
+            client,
+            ids,
+            vectors,
+            queries,
+            dims_list,
+            get_index_profile(args.profile),
+            k=args.k,
+            keep=args.keep,
+        )
+    print_table(rows)
+    if args.output:
+        save_rows(rows, args.output)
+
+
+if __name__ == "__main__":
+    main()
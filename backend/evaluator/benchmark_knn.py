@@ -0,0 +1,408 @@
+"""
+Recall / latency / size benchmark of the DSM-5 vector index profiles.
+
+For every profile (float, int8, int4, bbq) the embeddings of the live
+DSM-5 index are copied into a scratch index `<index>-bench-<profile>`,
+force-merged, and queried with kNN. Results are compared with an exact
+float brute-force search done in NumPy.
+
+Usage (from backend/):
+    python -m evaluator.benchmark_knn --profiles float int8 --k 10 --queries 200
+    python -m evaluator.benchmark_knn --query-vectors queries.npy --output knn.json
+    python -m evaluator.benchmark_knn --profiles float --local   # + in-process NumPy
+    python -m evaluator.benchmark_knn --vectors data/dsm5/dsm5_embeddings.npy \
+        --binary --rescore-factors 4 10 20 --tolerance 0.02      # offline, no ES
+
+With --binary the sign-bit tier is checked against the exact float ranking:
+the command exits with status 1 if any recall@k falls more than
+--tolerance below 1.0.
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from elasticsearch import Elasticsearch, helpers
+
+from evaluator.bench_utils import (
+    exact_top_k,
+    latency_summary,
+    print_table,
+    recall_at_k,
+    sample_queries,
+    save_rows,
+)
+from retrieval import (
+    INDEX_PROFILES,
+    BinaryVectorIndex,
+    LocalVectorIndex,
+    VectorIndexProfile,
+    get_index_profile,
+)
+from utils import AppConfig, logger
+
+
+def load_embeddings(client: Elasticsearch, index: str) -> tuple[List[str], np.ndarray]:
+    """All (doc id, embedding) pairs of an index, sorted by doc id."""
+    docs = [
+        (hit["_id"], hit["_source"]["embedding"])
+        for hit in helpers.scan(client, index=index, _source=["embedding"])
+        if hit["_source"].get("embedding")
+    ]
+    docs.sort(key=lambda doc: doc[0])
+    ids = [doc_id for doc_id, _ in docs]
+    return ids, np.asarray([vector for _, vector in docs], dtype=np.float32)
+
+
+def build_profile_index(
+    client: Elasticsearch,
+    name: str,
+    profile: VectorIndexProfile,
+    ids: List[str],
+    vectors: np.ndarray,
+) -> None:
+    """(Re)create a scratch index holding only the embeddings, then force-merge."""
+    client.indices.delete(index=name, ignore_unavailable=True)
+    client.indices.create(
+        index=name,
+        settings={"number_of_shards": 1, "number_of_replicas": 0},
+        mappings={"properties": {"embedding": profile.mapping(vectors.shape[1])}},
+    )
+    helpers.bulk(
+        client,
+        (
+            {"_index": name, "_id": doc_id, "_source": {"embedding": vector.tolist()}}
+            for doc_id, vector in zip(ids, vectors)
+        ),
+        chunk_size=256,
+    )
+    client.indices.refresh(index=name)
+    client.indices.forcemerge(index=name, max_num_segments=1)
+
+
+def index_size_bytes(client: Elasticsearch, name: str) -> int:
+    stats = client.indices.stats(index=name, metric="store")
+    return int(stats["_all"]["total"]["store"]["size_in_bytes"])
+
+
+def run_queries(
+    client: Elasticsearch,
+    name: str,
+    queries: np.ndarray,
+    k: int,
+    num_candidates: int,
+    warmup: int = 10,
+) -> tuple[List[List[str]], List[float], List[float]]:
+    """kNN ids per query, client-side latencies and ES `took` (ms)."""
+
+    def search(vector: np.ndarray) -> Dict[str, Any]:
+        return client.search(
+            index=name,
+            knn={
+                "field": "embedding",
+                "query_vector": vector.tolist(),
+                "k": k,
+                "num_candidates": num_candidates,
+            },
+            source=False,
+            size=k,
+        )
+
+    for vector in queries[:warmup]:
+        search(vector)
+
+    retrieved, wall_ms, took_ms = [], [], []
+    for vector in queries:
+        start = time.perf_counter()
+        response = search(vector)
+        wall_ms.append((time.perf_counter() - start) * 1000)
+        took_ms.append(float(response["took"]))
+        retrieved.append([hit["_id"] for hit in response["hits"]["hits"]])
+    return retrieved, wall_ms, took_ms
+
+
+def benchmark_local(
+    ids: List[str],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: List[List[str]],
+    k: int,
+    dtype: str = "float32",
+) -> Dict[str, Any]:
+    """Same queries against the in-process LocalVectorIndex (one query per call)."""
+    index = LocalVectorIndex.build(vectors, dtype=dtype)
+    for vector in queries[:10]:
+        index.search(vector, k=k)
+
+    retrieved, wall_ms = [], []
+    for vector in queries:
+        start = time.perf_counter()
+        rows, _ = index.search(vector, k=k)
+        wall_ms.append((time.perf_counter() - start) * 1000)
+        retrieved.append([ids[row] for row in rows[0]])
+    return {
+        "profile": f"local-{dtype}",
+        "index_type": "numpy",
+        "m": None,
+        "ef_construction": None,
+        "num_candidates": len(ids),
+        f"recall@{k}": round(recall_at_k(retrieved, truth), 4),
+        **latency_summary(wall_ms),
+        "took_p50_ms": None,
+        "took_p99_ms": None,
+        "size_mb": round(index.vectors.nbytes / 2**20, 2),
+        "build_s": None,
+    }
+
+
+def benchmark_binary(
+    ids: List[str],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: List[List[str]],
+    k: int,
+    rescore_factors: Sequence[int] = (4, 10, 20),
+    tolerance: float = 0.02,
+) -> List[Dict[str, Any]]:
+    """Binary tier per rescore factor; `within_tolerance` vs. exact float recall."""
+    float_index = LocalVectorIndex.build(vectors)
+    rows = []
+    for rescore_factor in rescore_factors:
+        index = BinaryVectorIndex.from_index(float_index, rescore_factor)
+        for vector in queries[:10]:
+            index.search(vector, k=k)
+
+        retrieved, wall_ms = [], []
+        for vector in queries:
+            start = time.perf_counter()
+            hits, _ = index.search(vector, k=k)
+            wall_ms.append((time.perf_counter() - start) * 1000)
+            retrieved.append([ids[row] for row in hits[0]])
+        recall = recall_at_k(retrieved, truth)
+        rows.append(
+            {
+                "profile": f"local-binary-x{rescore_factor}",
+                "index_type": "numpy-hamming",
+                "m": None,
+                "ef_construction": None,
+                "num_candidates": min(k * rescore_factor, len(ids)),
+                f"recall@{k}": round(recall, 4),
+                **latency_summary(wall_ms),
+                "took_p50_ms": None,
+                "took_p99_ms": None,
+                "size_mb": round(index.nbytes / 2**20, 3),
+                "build_s": None,
+                "within_tolerance": recall >= 1.0 - tolerance,
+            }
+        )
+    return rows
+
+
+def benchmark_offline(
+    vectors: np.ndarray,
+    k: int = 10,
+    n_queries: int = 200,
+    noise: float = 0.1,
+    query_vectors: Optional[np.ndarray] = None,
+    rescore_factors: Sequence[int] = (4, 10, 20),
+    tolerance: float = 0.02,
+) -> List[Dict[str, Any]]:
+    """Local float32 / float16 / binary tiers over a saved matrix, no cluster."""
+    ids = [str(row) for row in range(len(vectors))]
+    queries = (
+        query_vectors
+        if query_vectors is not None
+        else sample_queries(vectors, n_queries, noise=noise)
+    )
+    truth = [[ids[row] for row in rows] for rows in exact_top_k(vectors, queries, k)]
+    rows = [
+        benchmark_local(ids, vectors, queries, truth, k, dtype)
+        for dtype in ("float32", "float16")
+    ]
+    return rows + benchmark_binary(
+        ids, vectors, queries, truth, k, rescore_factors, tolerance
+    )
+
+
+def benchmark(
+    client: Elasticsearch,
+    profiles: List[VectorIndexProfile],
+    k: int = 10,
+    n_queries: int = 200,
+    noise: float = 0.1,
+    query_vectors: Optional[np.ndarray] = None,
+    num_candidates: Optional[int] = None,
+    source_index: str = AppConfig.INDEX_NAME_ELS,
+    keep: bool = False,
+    include_local: bool = False,
+    include_binary: bool = False,
+    rescore_factors: Sequence[int] = (4, 10, 20),
+    tolerance: float = 0.02,
+) -> List[Dict[str, Any]]:
+    ids, vectors = load_embeddings(client, source_index)
+    if not ids:
+        raise ValueError(f"Index '{source_index}' has no embeddings to benchmark")
+    logger.info(f"Loaded {len(ids)} embeddings ({vectors.shape[1]} dims)")
+
+    queries = (
+        query_vectors
+        if query_vectors is not None
+        else sample_queries(vectors, n_queries, noise=noise)
+    )
+    truth = [[ids[row] for row in rows] for rows in exact_top_k(vectors, queries, k)]
+
+    es_version = client.info()["version"]["number"]
+    rows = []
+    for profile in profiles:
+        if not profile.is_supported(es_version):
+            logger.warning(
+                f"Skip profile '{profile.name}': {profile.index_type} is not "
+                f"available on Elasticsearch {es_version}"
+            )
+            continue
+
+        name = f"{source_index}-bench-{profile.name}"
+        start = time.perf_counter()
+        build_profile_index(client, name, profile, ids, vectors)
+        build_s = time.perf_counter() - start
+
+        candidates = num_candidates or profile.num_candidates(k)
+        try:
+            retrieved, wall_ms, took_ms = run_queries(
+                client, name, queries, k, candidates
+            )
+            rows.append(
+                {
+                    "profile": profile.name,
+                    "index_type": profile.index_type,
+                    "m": profile.m,
+                    "ef_construction": profile.ef_construction,
+                    "num_candidates": candidates,
+                    f"recall@{k}": round(recall_at_k(retrieved, truth), 4),
+                    **latency_summary(wall_ms),
+                    "took_p50_ms": float(np.percentile(took_ms, 50)),
+                    "took_p99_ms": float(np.percentile(took_ms, 99)),
+                    "size_mb": round(index_size_bytes(client, name) / 2**20, 2),
+                    "build_s": round(build_s, 2),
+                }
+            )
+        finally:
+            if not keep:
+                client.indices.delete(index=name, ignore_unavailable=True)
+
+    if include_local:
+        for dtype in ("float32", "float16"):
+            rows.append(benchmark_local(ids, vectors, queries, truth, k, dtype))
+    if include_binary:
+        rows += benchmark_binary(
+            ids, vectors, queries, truth, k, rescore_factors, tolerance
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark quantized HNSW profiles of the DSM-5 index"
+    )
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        default=list(INDEX_PROFILES),
+        choices=list(INDEX_PROFILES),
+        help="Profiles to benchmark (default: all available)",
+    )
+    parser.add_argument("--k", type=int, default=10, help="Hits per query")
+    parser.add_argument("--queries", type=int, default=200, help="Synthetic queries")
+    parser.add_argument(
+        "--noise", type=float, default=0.1, help="Noise added to synthetic queries"
+    )
+    parser.add_argument(
+        "--query-vectors",
+        type=str,
+        default=None,
+        help="Optional .npy file of real query embeddings",
+    )
+    parser.add_argument("--m", type=int, default=None, help="HNSW m override")
+    parser.add_argument(
+        "--ef-construction", type=int, default=None, help="HNSW ef_construction"
+    )
+    parser.add_argument(
+        "--num-candidates",
+        type=int,
+        default=None,
+        help="Override the profile num_candidates policy",
+    )
+    parser.add_argument("--index", type=str, default=AppConfig.INDEX_NAME_ELS)
+    parser.add_argument("--keep", action="store_true", help="Keep scratch indices")
+    parser.add_argument(
+        "--local", action="store_true", help="Also benchmark the local NumPy index"
+    )
+    parser.add_argument(
+        "--binary", action="store_true", help="Also benchmark the binary tier"
+    )
+    parser.add_argument(
+        "--rescore-factors",
+        type=int,
+        nargs="+",
+        default=[4, 10, 20],
+        help="Binary tier: Hamming candidates per hit to rescore exactly",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.02,
+        help="Binary tier: max allowed recall@k loss vs. exact search",
+    )
+    parser.add_argument(
+        "--vectors",
+        type=str,
+        default=None,
+        help="Benchmark local tiers on a saved .npy matrix instead of the cluster",
+    )
+    parser.add_argument("--output", "-o", type=str, default=None, help="JSON output")
+    args = parser.parse_args()
+
+    query_vectors = np.load(args.query_vectors) if args.query_vectors else None
+    if args.vectors:
+        rows = benchmark_offline(
+            np.load(args.vectors).astype(np.float32),
+            k=args.k,
+            n_queries=args.queries,
+            noise=args.noise,
+            query_vectors=query_vectors,
+            rescore_factors=args.rescore_factors,
+            tolerance=args.tolerance,
+        )
+    else:
+        client = Elasticsearch([f"http://{AppConfig.ELS_HOST}:{AppConfig.ELS_PORT}"])
+        profiles = [
+            get_index_profile(name, m=args.m, ef_construction=args.ef_construction)
+            for name in args.profiles
+        ]
+        rows = benchmark(
+            client,
+            profiles,
+            k=args.k,
+            n_queries=args.queries,
+            noise=args.noise,
+            query_vectors=query_vectors,
+            num_candidates=args.num_candidates,
+            source_index=args.index,
+            keep=args.keep,
+            include_local=args.local,
+            include_binary=args.binary,
+            rescore_factors=args.rescore_factors,
+            tolerance=args.tolerance,
+        )
+    print_table(rows)
+    if args.output:
+        save_rows(rows, args.output)
+    if any(row.get("within_tolerance") is False for row in rows):
+        logger.error(f"Binary tier recall@{args.k} is below 1 - {args.tolerance}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Per-worker memory of the DSM-5 corpus + vectors, private vs. shared store.
+
+Starts N worker processes (spawned, like uvicorn/gunicorn workers) that each
+load the chunks and the embedding matrix, touch every payload and run a few
+searches, then wait on a barrier so all workers are resident together while
+their memory is read from /proc/self/smaps_rollup:
+
+    rss_mb   resident pages, shared ones included (what `top` shows)
+    pss_mb   shared pages split evenly between the processes mapping them
+    uss_mb   pages only this worker holds (what adding a worker costs)
+
+Numbers are deltas over the interpreter baseline. `private` parses the JSON
+file and loads the .npy into each worker; `shared` attaches the memory-mapped
+SharedStore. With the store, uss_mb stays flat and the summed pss stays at
+one copy as the worker count grows.
+
+Usage (from backend/):
+    python -m evaluator.benchmark_workers --workers 1 2 4 8
+    python -m evaluator.benchmark_workers --scale 20 --output workers.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from evaluator.bench_utils import print_table, save_rows
+from retrieval import load_chunks
+from utils import AppConfig, logger
+
+MODES = ("private", "shared")
+
+
+def memory_mb() -> Dict[str, float]:
+    """Rss / Pss / Uss of this process in MB (Linux smaps_rollup)."""
+    fields = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "uss_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def _worker(mode, chunks_path, vectors_path, store_dir, barrier, results):
+    from retrieval import DSM5Corpus, LocalVectorIndex, SharedStore
+
+    baseline = memory_mb()
+    if mode == "shared":
+        store = SharedStore.attach(store_dir)
+        corpus, index = store.corpus(), store.vector_index()
+    else:
+        corpus = DSM5Corpus.load(chunks_path)
+        index = LocalVectorIndex.load(vectors_path, mmap=False)
+
+    # Touch everything a request may read
+    for row in range(len(corpus)):
+        corpus.source(row)
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(10):
+        index.search(rng.normal(size=index.dims), k=10)
+
+    barrier.wait()
+    used = memory_mb()
+    results.put({key: used[key] - baseline[key] for key in used})
+    barrier.wait()
+
+
+def run_workers(
+    mode: str,
+    n_workers: int,
+    chunks_path: str,
+    vectors_path: str,
+    store_dir: str,
+) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+    barrier, results = ctx.Barrier(n_workers), ctx.Queue()
+    workers = [
+        ctx.Process(
+            target=_worker,
+            args=(mode, chunks_path, vectors_path, store_dir, barrier, results),
+        )
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    samples = [results.get(timeout=300) for _ in workers]
+    for worker in workers:
+        worker.join()
+    mean = {key: float(np.mean([s[key] for s in samples])) for key in samples[0]}
+    return {
+        "mode": mode,
+        "workers": n_workers,
+        **{key: round(value, 2) for key, value in mean.items()},
+        "total_pss_mb": round(sum(s["pss_mb"] for s in samples), 2),
+    }
+
+
+def prepare_inputs(
+    workdir: str, chunks_path: str, vectors_path: Optional[str], scale: int
+) -> tuple[str, str]:
+    """
+    Chunks (repeated `scale` times) and matching vectors in `workdir`.
+
+    Synthetic unit vectors stand in when no exported matrix is given.
+    """
+    from retrieval import LocalVectorIndex
+
+    chunks = load_chunks(chunks_path) * scale
+    scaled_chunks = os.path.join(workdir, "chunks.json")
+    with open(scaled_chunks, "w", encoding="utf-8") as f:
+        json.dump(chunks, f, ensure_ascii=False)
+
+    if vectors_path:
+        vectors = np.tile(np.load(vectors_path), (scale, 1))
+    else:
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(len(chunks), AppConfig.VECTOR_SIZE))
+    scaled_vectors = LocalVectorIndex.build(vectors).save(
+        os.path.join(workdir, "vectors.npy")
+    )
+    return scaled_chunks, scaled_vectors
+
+
+def benchmark_workers(
+    worker_counts: Sequence[int],
+    modes: Sequence[str] = MODES,
+    chunks_path: Optional[str] = None,
+    vectors_path: Optional[str] = None,
+    scale: int = 1,
+) -> List[Dict[str, Any]]:
+    from retrieval import SharedStore
+
+    with tempfile.TemporaryDirectory() as workdir:
+        chunks, vectors = prepare_inputs(
+            workdir, chunks_path or AppConfig.DSM5_CHUNKS_PATH, vectors_path, scale
+        )
+        store = SharedStore.build(os.path.join(workdir, "shared"), chunks, vectors)
+        logger.info(f"Store arrays (bytes): {store.nbytes}")
+        return [
+            run_workers(mode, n, chunks, vectors, store.directory)
+            for mode in modes
+            for n in worker_counts
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-worker memory of the DSM-5 indexes, private vs shared"
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--chunks-path", type=str, default=None)
+    parser.add_argument(
+        "--vectors",
+        type=str,
+        default=None,
+        help="Exported .npy embeddings (default: synthetic VECTOR_SIZE vectors)",
+    )
+    parser.add_argument(
+        "--scale", type=int, default=1, help="Repeat the corpus N times"
+    )
+    parser.add_argument("--output", "-o", type=str, default=None, help="JSON output")
+    args = parser.parse_args()
+
+    rows = benchmark_workers(
+        args.workers, args.modes, args.chunks_path, args.vectors, args.scale
+    )
+    print_table(rows)
+    if args.output:
+        save_rows(rows, args.output)
+
+
+if __name__ == "__main__":
+    main()
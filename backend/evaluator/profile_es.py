@@ -0,0 +1,61 @@
+"""
+Per-clause / per-phase cost of the DSM-5 keyword query in Elasticsearch.
+
+Replays a question set through `HealthcareRetriever.profile_queries` (keyword
+query with `profile: true`, see retrieval/profiling.py for the stages) and
+prints mean / p50 / p90 / p99 / max per stage, slowest first, plus the
+slowest individual questions.
+
+Usage (from backend/):
+    python -m evaluator.profile_es
+    python -m evaluator.profile_es --questions ../data/questions/questions_dsm5.csv \
+        --size 30 --knn --output profile.json
+"""
+
+import argparse
+import json
+
+from evaluator.bench_utils import print_table
+from retrieval import load_questions
+from utils import logger
+
+
+def main():
+    from chains.healthcare_chain import HealthcareRetriever
+
+    parser = argparse.ArgumentParser(
+        description="Profile the DSM-5 keyword query clauses in Elasticsearch"
+    )
+    parser.add_argument(
+        "--questions",
+        type=str,
+        default=None,
+        help="Questions CSV with a `question` column (default: DSM5_QUESTIONS_PATH)",
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Max questions")
+    parser.add_argument("--size", type=int, default=20, help="Hits per query")
+    parser.add_argument(
+        "--knn", action="store_true", help="Also profile kNN (embeds every question)"
+    )
+    parser.add_argument("--slowest", type=int, default=5, help="Slowest questions")
+    parser.add_argument("--output", "-o", type=str, default=None, help="JSON output")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions, args.limit)
+    logger.info(f"Profiling {len(questions)} questions")
+    report = HealthcareRetriever().profile_queries(
+        questions,
+        size=args.size,
+        include_knn=args.knn,
+        slowest=args.slowest,
+    )
+    print_table(report["stages"])
+    print()
+    print_table(report["slowest_queries"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
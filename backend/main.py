@@ -15,10 +15,13 @@ from app.schemas import (
     UserLogin,
     UserRegister,
 )
+from chains.hospital_review_chain import HospitalReviewChain
 from mlops import monitor_endpoint, setup_metrics, setup_tracing
-from tools import CypherTool
+from retrieval import get_title_suggester, load_questions
+from tools import CypherTool, get_all_wait_times
 from tools.health_tool import DSM5RetrievalTool
-from utils import AppConfig, logger
+from tools.wait_times import hospital_registry, wait_time_feed
+from utils import AppConfig, close_neo4j_drivers, logger
 from utils.logging import trace_id_ctx
 
 
@@ -69,7 +72,8 @@ def _initialize_tools() -> tuple:
     # These are stateless and can be shared
     dsm5_tool = DSM5RetrievalTool(embedding_model="google", top_k=10)
     cypher_tool = CypherTool(llm_model="google")
-    return dsm5_tool, cypher_tool
+    review_chain = HospitalReviewChain(embedding_model="openai", llm_model="openai")
+    return dsm5_tool, cypher_tool, review_chain
 
 
 def create_app() -> FastAPI:
@@ -86,12 +90,27 @@ def create_app() -> FastAPI:
 
 app = create_app()
 # Initialize tools (lazy initialization can be done in startup event if needed)
-dsm5_tool, cypher_tool = _initialize_tools()
+dsm5_tool, cypher_tool, review_chain = _initialize_tools()
+
+
+@app.on_event("startup")
+def startup():
+    # Refuse to serve an index with legacy positional ids (needs a reindex)
+    dsm5_tool.retriever.check_doc_ids()
+    # Build in-memory DSM-5 indexes before the first request
+    dsm5_tool.retriever.warmup()
+    try:
+        get_title_suggester()
+    except Exception as e:
+        logger.warning(f"Cannot build DSM-5 title suggester: {str(e)}")
 
 
 @app.on_event("shutdown")
-def shutdown():
+async def shutdown():
     logger.info("Graceful shutdown started")
+    wait_time_feed.stop()
+    hospital_registry.stop()
+    await close_neo4j_drivers()
     logger.complete()
 
 
@@ -212,6 +231,48 @@ async def dsm5_hybrid_search(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/dsm5/hybrid/stream")
+async def dsm5_hybrid_stream(
+    query: str = Query(..., description="Search query"),
+    top_k: int = Query(10, ge=1, le=50, description="Results to return"),
+    include_context: bool = Query(False, description="Add related sections"),
+):
+    """
+    Progressive hybrid search (SSE). Events, in order:
+    keyword (BM25 only, before the query is embedded) → fused (after kNN,
+    fused + reranked) → context (only with include_context) → done.
+    """
+    logger.info(f"DSM5 streaming hybrid search for query: {query}")
+
+    def event_generator():
+        try:
+            for event in dsm5_tool.retriever.hybrid_search_stream(
+                query,
+                top_k=top_k,
+                include_context=include_context,
+                keyword_weight=0.6,
+                vector_weight=1.2,
+            ):
+                results = event["results"]
+                payload = {
+                    "type": event["stage"],
+                    "elapsed_ms": event["elapsed_ms"],
+                    "ids": [result["id"] for result in results],
+                    "results_count": len(results),
+                    "response": dsm5_tool._format_results(
+                        results, include_scores=False
+                    ),
+                }
+                yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        except Exception as e:
+            logger.error(f"DSM5 streaming hybrid search error: {str(e)}")
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+
+    # Generator đồng bộ: Starlette chạy nó trong threadpool, không chặn event loop
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
 @app.post("/dsm5/criteria")
 async def dsm5_criteria_search(
     disorder: str = Query(..., description="Disorder name"),
@@ -237,6 +298,59 @@ async def dsm5_criteria_search(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/dsm5/suggest")
+async def dsm5_suggest(
+    q: str = Query(..., description="Partial section title"),
+    limit: int = Query(10, ge=1, le=50, description="Max suggestions"),
+):
+    """Autocomplete DSM-5 section titles (accent- and typo-tolerant)."""
+    try:
+        suggestions = get_title_suggester().suggest(q, limit=limit)
+        return {"query": q, "suggestions": suggestions}
+    except Exception as e:
+        logger.error(f"DSM5 suggest error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/admin/dsm5/profile")
+async def dsm5_profile(
+    limit: int = Query(30, ge=1, le=500, description="Max questions to replay"),
+    size: int = Query(20, ge=1, le=100, description="Hits per query"),
+    knn: bool = Query(False, description="Also profile kNN (embeds every question)"),
+):
+    """
+    Replay DSM5_QUESTIONS_PATH with `profile: true`; per-clause and per-phase
+    timings (p50/p90/p99) of the keyword query, slowest first.
+    Disabled unless DSM5_PROFILE_ENDPOINT is set.
+    """
+    if not AppConfig.DSM5_PROFILE_ENDPOINT:
+        raise HTTPException(status_code=404, detail="Profiling endpoint disabled")
+    try:
+        questions = load_questions(limit=limit)
+        return await asyncio.to_thread(
+            dsm5_tool.retriever.profile_queries,
+            questions,
+            size=size,
+            include_knn=knn,
+        )
+    except Exception as e:
+        logger.error(f"DSM5 profile error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/dsm5/cache/stats")
+async def dsm5_cache_stats():
+    """Hit rates of the DSM-5 result cache and the index generation it keys on."""
+    retriever = dsm5_tool.retriever
+    if retriever.result_cache is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "index_generation": retriever.index_generation,
+        **retriever.result_cache.stats(),
+    }
+
+
 # ============================================================
 # Neo4j Cypher Endpoints
 # ============================================================
@@ -282,6 +396,73 @@ async def cypher_hospital_stats(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================================
+# Hospital Review Endpoints
+# ============================================================
+
+
+@app.post("/reviews/stream")
+async def review_stream(
+    query: str = Query(..., description="Question about patient reviews"),
+):
+    """
+    Streaming review answer (SSE). Events, in order:
+    context (retrieved reviews) → token (one per generated chunk) → done.
+    A client disconnect closes the generator, which cancels the LLM call.
+    """
+    logger.info(f"Streaming review query: {query}")
+
+    async def event_generator():
+        try:
+            async for event in review_chain.astream(query=query):
+                if event["type"] == "context":
+                    payload = {
+                        "type": "context",
+                        "documents": [doc.page_content for doc in event["documents"]],
+                    }
+                else:
+                    payload = event
+                yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+        except Exception as e:
+            logger.error(f"Review stream error: {str(e)}")
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+# ============================================================
+# Hospital Wait Time Endpoints
+# ============================================================
+
+
+@app.get("/hospitals/wait-times")
+async def hospital_wait_times(
+    window: int = Query(
+        AppConfig.WAIT_TIME_WINDOW, ge=1, description="Rolling window in samples"
+    ),
+    percentile: float = Query(
+        AppConfig.WAIT_TIME_PERCENTILE, ge=0, le=100, description="Percentile"
+    ),
+):
+    """Current, rolling-average and percentile wait times for all hospitals."""
+    try:
+        logger.info(f"Wait times requested (window={window}, p={percentile})")
+        # Lần gọi đầu poll Neo4j + source đồng bộ: chạy ngoài event loop
+        hospitals = await asyncio.to_thread(
+            get_all_wait_times, window=window, percentile=percentile
+        )
+        return {
+            "window": window,
+            "percentile": percentile,
+            "count": len(hospitals),
+            "hospitals": hospitals,
+        }
+    except Exception as e:
+        logger.error(f"Wait times error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============================================================
 # Authentication Endpoints
 # ============================================================
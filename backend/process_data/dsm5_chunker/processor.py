@@ -1,6 +1,7 @@
 import re
 
-from utils import AppConfig, load_json, save_json
+from retrieval import load_chunks, save_chunks
+from utils import AppConfig
 
 
 def clean_text(text: str) -> str:
@@ -244,9 +245,9 @@ def process_chunks(chunks: list[dict]):
 
 
 if __name__ == "__main__":
-    chunks = load_json(path=AppConfig.DSM5_CHUNKS_PATH)
+    chunks = load_chunks(path=AppConfig.DSM5_CHUNKS_PATH)
     chunks = process_chunks(chunks=chunks)
-    save_json(data=chunks, output_path=AppConfig.DSM5_CHUNKS_PATH)
+    save_chunks(chunks, path=AppConfig.DSM5_CHUNKS_PATH)
 
     # content = None
     # for chunk in chunks:
@@ -0,0 +1,271 @@
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+from google import generativeai as genai
+from openai import OpenAI
+
+from utils import AppConfig, logger
+
+Vectors = List[List[float]]
+
+
+class RateLimited(Exception):
+    """Provider answered 429 (or equivalent); `retry_after` in seconds if known."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, bursts up to
+    `capacity`. `acquire` blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take `tokens`, sleeping as needed; returns the time waited (s)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _retry_after(headers) -> Optional[float]:
+    """Retry-After header in seconds (numeric form only)."""
+    try:
+        return float((headers or {}).get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    """429s, 5xx and network timeouts of any provider are worth retrying."""
+    if isinstance(exc, (RateLimited, requests.Timeout, requests.ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class EmbeddingProvider(ABC):
+    """One embedding API; `embed` sends a single batch request."""
+
+    name: str = "base"
+    max_batch: int = 64
+    model: str = ""
+
+    def __init__(self, dims: int):
+        self.dims = dims
+
+    @property
+    def key(self) -> str:
+        """Provider + model, identifies the vector space of the embeddings."""
+        return f"{self.name}:{self.model}"
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> Vectors:
+        """Embeddings of `texts` (at most `max_batch`), in order."""
+
+
+class OpenAIProvider(EmbeddingProvider):
+    name = "openai"
+    max_batch = 2048
+
+    def __init__(self, dims: int, model: str = AppConfig.OPENAI_EMBEDDING):
+        super().__init__(dims)
+        self.model = model
+        # Retries are done by the pipeline, with the shared rate limiter
+        self.client = OpenAI(
+            api_key=AppConfig.OPENAI_API_KEY,
+            max_retries=0,
+            timeout=AppConfig.EMBED_TIMEOUT,
+        )
+
+    def embed(self, texts: List[str]) -> Vectors:
+        response = self.client.embeddings.create(
+            input=texts, model=self.model, dimensions=self.dims
+        )
+        return [item.embedding for item in response.data]
+
+
+class GoogleProvider(EmbeddingProvider):
+    name = "google"
+    max_batch = 100  # batchEmbedContents limit
+
+    def __init__(self, dims: int, model: str = AppConfig.GOOGLE_EMBEDDING):
+        super().__init__(dims)
+        self.model = model
+        genai.configure(api_key=AppConfig.GOOGLE_API_KEY)
+
+    def embed(self, texts: List[str]) -> Vectors:
+        # A list `content` goes through batchEmbedContents: 1 request per batch
+        response = genai.embed_content(
+            content=texts,
+            model=self.model,
+            output_dimensionality=self.dims,
+            request_options={"timeout": AppConfig.EMBED_TIMEOUT},
+        )
+        return response["embedding"]
+
+
+class HFProvider(EmbeddingProvider):
+    name = "hf_api"
+    max_batch = 64
+
+    def __init__(self, dims: int, url: Optional[str] = None):
+        super().__init__(dims)
+        self.url = url or AppConfig.HF_EMBEDDING_API
+        self.model = self.url
+        self.session = requests.Session()
+        self.session.headers["Content-Type"] = "application/json"
+
+    def embed(self, texts: List[str]) -> Vectors:
+        response = self.session.post(
+            self.url, json={"texts": texts}, timeout=AppConfig.EMBED_TIMEOUT
+        )
+        if response.status_code in (429, 503):
+            raise RateLimited(
+                f"HF API {response.status_code}", _retry_after(response.headers)
+            )
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to get embeddings from HF API. Status: "
+                f"{response.status_code}, Response: {response.text}"
+            )
+        return response.json().get("embeddings")
+
+
+PROVIDERS = {
+    provider.name: provider for provider in (OpenAIProvider, GoogleProvider, HFProvider)
+}
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> TokenBucket:
+    """Process-wide request budget of a provider (EMBED_RPS_<PROVIDER>, req/s)."""
+    with _buckets_lock:
+        if provider not in _buckets:
+            rate = getattr(AppConfig, f"EMBED_RPS_{provider.upper()}")
+            _buckets[provider] = TokenBucket(rate)
+        return _buckets[provider]
+
+
+class EmbeddingPipeline:
+    """
+    Concurrent, rate-limited batch embedding.
+
+    ─────────────────────────────────────────────────────────────────
+    • batching:  each request carries up to `provider.max_batch` texts
+    • pool:      `workers` threads; at most `2 * workers` batches in flight
+    • limiter:   one token bucket per provider, shared by every pipeline
+    • retries:   429 / 5xx / timeouts, exponential backoff with jitter,
+                 honouring Retry-After when the provider sends it
+    ─────────────────────────────────────────────────────────────────
+    `map` yields results in input order while later batches are still
+    being embedded, so the caller can bulk-index batch i while batches
+    i+1.. are in flight.
+    """
+
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        workers: int = AppConfig.EMBED_WORKERS,
+        limiter: Optional[TokenBucket] = None,
+        max_retries: int = AppConfig.EMBED_MAX_RETRIES,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.provider = provider
+        self.workers = workers
+        self.limiter = limiter or get_rate_limiter(provider.name)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self.stats = {"requests": 0, "retries": 0, "throttled_s": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, **deltas) -> None:
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def embed(self, texts: Sequence[str]) -> Vectors:
+        """Embed texts of any length, `max_batch` per request, with retries."""
+        texts = list(texts)
+        vectors: Vectors = []
+        for start in range(0, len(texts), self.provider.max_batch):
+            vectors.extend(
+                self._embed_batch(texts[start : start + self.provider.max_batch])
+            )
+        return vectors
+
+    def _embed_batch(self, texts: List[str]) -> Vectors:
+        for attempt in range(self.max_retries + 1):
+            self._count(requests=1, throttled_s=self.limiter.acquire())
+            try:
+                vectors = self.provider.embed(texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(
+                        f"{self.provider.name} returned {len(vectors)} embeddings "
+                        f"for {len(texts)} texts"
+                    )
+                return vectors
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = getattr(e, "retry_after", None) or _retry_after(
+                    getattr(getattr(e, "response", None), "headers", None)
+                )
+                if delay is None:
+                    delay = min(self.max_backoff, self.backoff * 2**attempt)
+                    delay *= 0.5 + random.random() / 2
+                logger.warning(
+                    f"{self.provider.name} embedding failed ({str(e)}), "
+                    f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+                )
+                self._count(retries=1)
+                self._sleep(delay)
+
+    def map(self, batches: Iterable[List[str]]) -> Iterator[Tuple[int, Vectors]]:
+        """(batch index, embeddings) for each batch of texts, in input order."""
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="embed"
+        ) as pool:
+            pending: "deque[Future]" = deque()
+            done = 0
+            for texts in batches:
+                pending.append(pool.submit(self.embed, texts))
+                # Bounded in-flight: do not read the whole corpus ahead
+                while len(pending) > 2 * self.workers:
+                    yield done, pending.popleft().result()
+                    done += 1
+            while pending:
+                yield done, pending.popleft().result()
+                done += 1
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils import AppConfig
+
+
+class EmbeddingStore:
+    """
+    Local cache of chunk embeddings, keyed by (model, dims, content hash).
+
+    ─────────────────────────────────────────────────────────────────
+    • model:  `EmbeddingProvider.key`, e.g. "openai:text-embedding-3-small"
+    • dims:   requested embedding size
+    • hash:   `content_hash` of the embedded text
+    • vector: float32 bytes
+    ─────────────────────────────────────────────────────────────────
+    A re-chunked corpus only sends the texts whose hash is not stored yet;
+    unchanged chunks reuse their embedding whatever their position.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or AppConfig.DSM5_EMBEDDING_STORE
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, dims INTEGER NOT NULL, hash TEXT NOT NULL, "
+            "vector BLOB NOT NULL, PRIMARY KEY (model, dims, hash))"
+        )
+        self.conn.commit()
+
+    def get_many(
+        self, model: str, dims: int, hashes: Iterable[str]
+    ) -> Dict[str, List[float]]:
+        """Stored embeddings of `hashes` (missing ones are left out)."""
+        hashes = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        # SQLite caps the number of bound parameters per statement
+        for start in range(0, len(hashes), 500):
+            part = hashes[start : start + 500]
+            rows = self.conn.execute(
+                "SELECT hash, vector FROM embeddings WHERE model = ? AND dims = ? "
+                f"AND hash IN ({', '.join('?' * len(part))})",
+                (model, dims, *part),
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(
+        self,
+        model: str,
+        dims: int,
+        items: Iterable[Tuple[str, Sequence[float]]],
+    ) -> int:
+        """Insert or replace (hash, embedding) pairs; returns the count."""
+        rows = [
+            (model, dims, key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items
+        ]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, dims, hash, vector) "
+            "VALUES (?, ?, ?, ?)",
+            rows,
+        )
+        self.conn.commit()
+        return len(rows)
+
+    def count(self, model: Optional[str] = None, dims: Optional[int] = None) -> int:
+        query, params = "SELECT COUNT(*) FROM embeddings WHERE 1 = 1", []
+        if model is not None:
+            query, params = query + " AND model = ?", params + [model]
+        if dims is not None:
+            query, params = query + " AND dims = ?", params + [dims]
+        return self.conn.execute(query, params).fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
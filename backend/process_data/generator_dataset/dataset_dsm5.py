@@ -9,6 +9,7 @@ from pydantic import BaseModel, Field
 from tqdm import tqdm
 
 from prompt import DSM5_SYSTEM_GENERATION_TEMPLATE
+from retrieval import iter_chunks
 from utils import AppConfig
 
 DSM5_CHUNKS_PATH = AppConfig.DSM5_CHUNKS_PATH
@@ -107,10 +108,7 @@ def generate_dataset(
 
 
 if __name__ == "__main__":
-    with open(DSM5_CHUNKS_PATH, "r", encoding="utf-8") as f:
-        chunks_data = json.load(f)
-
-    documents = transform_chunks(chunks=chunks_data)
+    documents = transform_chunks(chunks=iter_chunks(DSM5_CHUNKS_PATH))
     testset_df = generate_dataset(
         chunks=documents, num_samples=3, num_pairs_generated=2
     )
@@ -1,13 +1,29 @@
-import json
-import time
-from typing import List, Literal, Union
+import os
+from collections import deque
+from typing import Dict, List, Literal, Optional, Sequence, Set, Union
 
-import requests
+import numpy as np
 import tqdm
 from elasticsearch import Elasticsearch, helpers
-from google import generativeai as genai
-from openai import OpenAI
 
+from process_data.embedding_pipeline import PROVIDERS, EmbeddingPipeline
+from process_data.embedding_store import EmbeddingStore
+from retrieval import (
+    EMBEDDING_DIMS,
+    GENERATION_META,
+    DisorderIndex,
+    DSM5Corpus,
+    LocalVectorIndex,
+    SectionHierarchy,
+    VectorIndexProfile,
+    content_hash,
+    dims_index_name,
+    get_index_profile,
+    new_index_generation,
+    row_chapters,
+    save_centroids,
+    truncate_embeddings,
+)
 from utils import AppConfig, logger
 
 
@@ -17,20 +33,45 @@ class ElsIndexer:
         model_name: Literal["google", "openai", "hf_api"] = "hf_api",
         batch_size: int = 64,
         chunk_path: str = None,
+        index_name: str = None,
+        index_profile: Union[str, VectorIndexProfile] = AppConfig.ELS_INDEX_PROFILE,
+        dims: int = AppConfig.VECTOR_SIZE,
+        truncate_to: Sequence[int] = (),
+        workers: int = AppConfig.EMBED_WORKERS,
+        embedding_store: Optional[str] = None,
+        centroids_path: Optional[str] = None,
     ):
 
         self._client = None
-        self.index_name = AppConfig.INDEX_NAME_ELS
+        self.dims = dims
+        self.index_name = index_name or dims_index_name(dims)
+        # Matryoshka: embed once at `dims`, also index the first d dims of
+        # each embedding into a side-by-side index per d in `truncate_to`
+        if any(d > dims for d in truncate_to):
+            raise ValueError(f"Cannot truncate {dims}-dim embeddings to {truncate_to}")
+        self.indices: Dict[int, str] = {dims: self.index_name}
+        for d in sorted(set(truncate_to) - {dims}, reverse=True):
+            self.indices[d] = f"{index_name}-d{d}" if index_name else dims_index_name(d)
+        self.index_profile = (
+            index_profile
+            if isinstance(index_profile, VectorIndexProfile)
+            else get_index_profile(index_profile)
+        )
         self.batch_size = batch_size
         self.model_name = model_name
         self.chunk_path = chunk_path or AppConfig.DSM5_CHUNKS_PATH
+        # Chunk + disorder_key / chapter_id của từng chunk theo vị trí,
+        # tính 1 lần trong upload_to_els
+        self._corpus: Optional[DSM5Corpus] = None
+        self._disorder_keys: List[List[str]] = []
+        self._chapters: List[str] = []
+        self.centroids_path = centroids_path or AppConfig.DSM5_CENTROIDS_PATH
+        self.embedding_store_path = embedding_store
+        self._embedding_store: Optional[EmbeddingStore] = None
         self.els_host = AppConfig.ELS_HOST
         self.els_port = AppConfig.ELS_PORT
-
-        if model_name == "google":
-            genai.configure(api_key=AppConfig.GOOGLE_API_KEY)
-        else:
-            self.openai_client = OpenAI(api_key=AppConfig.OPENAI_API_KEY)
+        # Batch request / provider, rate limit + retry 429, `workers` luồng song song
+        self.embedder = EmbeddingPipeline(PROVIDERS[model_name](dims), workers=workers)
 
     @property
     def client(self):
@@ -39,6 +80,12 @@ class ElsIndexer:
 
         return self._client
 
+    @property
+    def embedding_store(self) -> EmbeddingStore:
+        if self._embedding_store is None:
+            self._embedding_store = EmbeddingStore(self.embedding_store_path)
+        return self._embedding_store
+
     def _get_embeddings(
         self, text: Union[str, List[str]]
     ) -> Union[List[float], List[List[float]]]:
@@ -49,64 +96,9 @@ class ElsIndexer:
           - If input is str: List[float] (single embedding)
           - If input is List[str]: List[List[float]] (batch of embeddings)
         """
-        if self.model_name == "openai":
-            response = self.openai_client.embeddings.create(
-                input=text,
-                model=AppConfig.OPENAI_EMBEDDING,
-                dimensions=AppConfig.VECTOR_SIZE,
-            )
-            embeddings = [item.embedding for item in response.data]
-            return embeddings[0] if isinstance(text, str) else embeddings
-
-        elif self.model_name == "google":
-            if isinstance(text, str):
-                # Single text
-                response = genai.embed_content(
-                    content=text,
-                    model=AppConfig.GOOGLE_EMBEDDING,
-                    output_dimensionality=AppConfig.VECTOR_SIZE,
-                )
-                return response["embedding"]  # List[float]
-            else:
-                # Batch - Google API expects list of contents
-                embeddings = []
-                for t in text:
-                    response = genai.embed_content(
-                        content=t,
-                        model=AppConfig.GOOGLE_EMBEDDING,
-                        output_dimensionality=AppConfig.VECTOR_SIZE,
-                    )
-                    embeddings.append(response["embedding"])
-                return embeddings
-
-        else:  # hf_api
-            response = requests.post(
-                url=AppConfig.HF_EMBEDDING_API,
-                headers={"Content-Type": "application/json"},
-                json={"texts": text if isinstance(text, list) else [text]},
-            )
-            if response.status_code == 200:
-                result = response.json()
-                embeddings = result.get("embeddings")
-                return embeddings[0] if isinstance(text, str) else embeddings
-            else:
-                raise Exception(
-                    f"Failed to get embeddings from HF API. Status: {response.status_code}, Response: {response.text}"
-                )
-
-    def _get_chunks(self):
-        try:
-            with open(self.chunk_path, "r", encoding="utf-8") as f:
-                chunks = json.load(f)  # Load toàn bộ mảng
-                if isinstance(chunks, list):
-                    for chunk in chunks:
-                        yield chunk
-                else:
-                    logger.error(f"Expected list of chunks, got {type(chunks)}")
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing JSON file: {str(e)}")
-        except FileNotFoundError:
-            logger.error(f"Chunk file not found: {self.chunk_path}")
+        if isinstance(text, str):
+            return self.embedder.embed([text])[0]
+        return self.embedder.embed(text)
 
     def create_index(self):
         """
@@ -127,6 +119,8 @@ class ElsIndexer:
         • integer: Số nguyên, dùng cho range query (>, <, between)
 
         • dense_vector: Vector embedding cho semantic search (KNN)
+                  index_options theo `self.index_profile`:
+                  float (hnsw) | int8_hnsw | int4_hnsw | bbq_hnsw, với m/ef_construction
         ─────────────────────────────────────────────────────────────────
 
         Analyzer "vietnamese":
@@ -193,125 +187,339 @@ class ElsIndexer:
                     # ─────────── Metadata ───────────
                     "page_start": {"type": "integer"},  # Số trang, dùng cho range query
                     "merge_from": {"type": "text"},  # Thông tin merge (nếu có)
+                    # Rối loạn của chunk + các section cha, đã chuẩn hóa
+                    # (retrieval/entities.py), dùng làm filter cho kNN / BM25
+                    "disorder_key": {"type": "keyword"},
+                    # Chương (section gốc) của chunk: filter của coarse kNN
+                    # (retrieval/coarse.py), thay cho filter ids từng chunk
+                    "chapter_id": {"type": "keyword"},
                     # ─────────── Vector Embedding ───────────
-                    "embedding": {
-                        "type": "dense_vector",  # Vector số thực
-                        "dims": AppConfig.VECTOR_SIZE,  # Số chiều (768, 1024, etc.)
-                        "index": True,  # Cho phép KNN search
-                        "similarity": "cosine",  # Độ tương đồng cosine (phổ biến nhất)
-                    },
-                }
+                    # Vector số thực, cosine, HNSW (có thể quantized) theo profile
+                    "embedding": self.index_profile.mapping(self.dims),
+                },
+                # Đọc lại bởi HealthcareRetriever: embed query đúng số chiều,
+                # và generation làm key cho result cache (đổi mỗi lần index)
+                "_meta": {"embedding_dims": self.dims},
             },
         }
 
         try:
-            if not self.client.indices.exists(index=self.index_name):
-                self.client.indices.create(index=self.index_name, body=mappings)
-                logger.info("Create index for ELS successful")
-            else:
-                logger.info(
-                    f"Index name {self.index_name} already exists. Skip create index"
+            es_version = self.client.info()["version"]["number"]
+            if not self.index_profile.is_supported(es_version):
+                raise ValueError(
+                    f"Vector index profile '{self.index_profile.name}' "
+                    f"({self.index_profile.index_type}) needs Elasticsearch >= "
+                    f"{'.'.join(map(str, self.index_profile.min_es_version))}, "
+                    f"cluster is {es_version}"
                 )
+            for dims, index_name in self.indices.items():
+                mappings["mappings"]["properties"]["embedding"] = (
+                    self.index_profile.mapping(dims)
+                )
+                mappings["mappings"]["_meta"] = self._index_meta(dims)
+                if not self.client.indices.exists(index=index_name):
+                    self.client.indices.create(index=index_name, body=mappings)
+                    logger.info(
+                        f"Create index {index_name} for ELS successful "
+                        f"(profile: {self.index_profile.name}, dims: {dims})"
+                    )
+                else:
+                    logger.info(
+                        f"Index name {index_name} already exists. Skip create index"
+                    )
 
         except Exception as e:
             logger.error(f"Error while creating index for ELS. {str(e)} ")
 
-    def _proces_batch(self, chunks: list[dict], start_id: int):
+    def _indexed_ids(self, index_name: str) -> Set[str]:
+        """Doc id đang có trong index (rỗng nếu index chưa tồn tại)."""
+        if not self.client.indices.exists(index=index_name):
+            return set()
+        return {
+            hit["_id"]
+            for hit in helpers.scan(self.client, index=index_name, _source=False)
+        }
+
+    def _index_batch(
+        self, rows: List[int], embeddings: list, missing: Dict[str, np.ndarray]
+    ):
         """
-        Embedding + index batch vào Elasticsearch bằng Bulk API
+        Index các chunk `rows` (đã có embedding) vào Elasticsearch bằng Bulk API.
+
+        Mỗi index chỉ nhận các row có `missing[index_name][row]`.
         """
-        contents = [chunk["content"] for chunk in chunks]
-        embeddings = self._get_embeddings(text=contents)
 
-        # Chuẩn bị Bulk action
+        # Chuẩn bị Bulk action, 1 lần cho mỗi index (embedding cắt theo dims)
         def generate_actions():
-            for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                doc_id = f"{start_id + idx}"
-
-                # Safely access metadata
-                metadata = chunk.get("metadata") or {}
-
-                yield {
-                    "_op_type": "index",
-                    "_index": self.index_name,
-                    "_id": doc_id,
-                    "_source": {
-                        "index": chunk.get("index"),
-                        "section_id": chunk.get("section_id"),
-                        "parent_section_id": chunk.get("parent_section_id"),
-                        "title": chunk.get("title"),
-                        "sub_title": chunk.get("sub_title"),
-                        "parent_section_title": chunk.get("parent_section_title"),
-                        "context_headers": chunk.get("context_headers"),
-                        "content": chunk.get("content"),
-                        "page_start": metadata.get("page_start"),
-                        "merge_from": metadata.get("merge_from", "No merge"),
-                        "embedding": embedding,
-                    },
-                }
+            for dims, index_name in self.indices.items():
+                vectors = (
+                    embeddings
+                    if dims == self.dims
+                    else truncate_embeddings(embeddings, dims).tolist()
+                )
+                for row, embedding in zip(rows, vectors):
+                    if missing[index_name][row]:
+                        yield self._index_action(index_name, row, embedding)
+
+        self._bulk(generate_actions())
+
+    def _index_action(self, index_name: str, row: int, embedding: list) -> dict:
+        chunk = self._corpus.chunks[row]
+        # Safely access metadata
+        metadata = chunk.get("metadata") or {}
+
+        return {
+            "_op_type": "index",
+            "_index": index_name,
+            "_id": self._corpus.ids[row],
+            "_source": {
+                "index": chunk.get("index"),
+                "section_id": chunk.get("section_id"),
+                "parent_section_id": chunk.get("parent_section_id"),
+                "title": chunk.get("title"),
+                "sub_title": chunk.get("sub_title"),
+                "parent_section_title": chunk.get("parent_section_title"),
+                "context_headers": chunk.get("context_headers"),
+                "content": chunk.get("content"),
+                "page_start": metadata.get("page_start"),
+                "merge_from": metadata.get("merge_from", "No merge"),
+                "disorder_key": (
+                    self._disorder_keys[row] if row < len(self._disorder_keys) else []
+                ),
+                "chapter_id": (
+                    self._chapters[row] if row < len(self._chapters) else None
+                ),
+                "embedding": embedding,
+            },
+        }
 
+    def _bulk(self, actions) -> int:
         try:
             client_with_option = self.client.options(request_timeout=10)
             success, failed = helpers.bulk(
                 client=client_with_option,
-                actions=generate_actions(),
+                actions=actions,
                 chunk_size=self.batch_size,
             )
-            # failed = True
             if failed:
                 logger.error(
                     f"Failed to index {len(failed)} documents: {failed[:3]}..."
                 )
+            return success
         except Exception as e:
             logger.error(f"Error while processing batch chunks: {str(e)}")
             raise
 
-    def upload_to_els(self):
-        # Count chunks from JSON array
-        try:
-            with open(self.chunk_path, "r", encoding="utf-8") as f:
-                chunks_data = json.load(f)
-                total_chunks = len(chunks_data) if isinstance(chunks_data, list) else 0
-        except Exception as e:
-            logger.error(f"Error counting chunks: {str(e)}")
-            total_chunks = 0
+    def _delete(self, doc_ids: Dict[str, List[str]]) -> int:
+        """Xóa các doc id (theo index) bằng Bulk API."""
+        return self._bulk(
+            {"_op_type": "delete", "_index": index_name, "_id": doc_id}
+            for index_name, ids in doc_ids.items()
+            for doc_id in ids
+        )
 
-        logger.info(f"Total chunks to process: {total_chunks}")
+    def upload_to_els(self, full: bool = False) -> Dict[str, int]:
+        """
+        Đồng bộ index với file chunk, chỉ gửi phần thay đổi.
 
-        batch = []
-        chunk_id = 0
-        total_uploaded = 0
+        Doc id = section_id + hash nội dung chunk (`chunk_doc_id`), nên:
+        ─────────────────────────────────────────────────────────────────
+        • chunk không đổi:   id đã có trong index → bỏ qua
+        • chunk mới / sửa:   id mới → index; embedding lấy từ EmbeddingStore
+                             theo hash của content, chỉ gọi API khi chưa có
+        • chunk bị bỏ / sửa: id cũ không còn trong file → xóa khỏi index
+        ─────────────────────────────────────────────────────────────────
+        `full=True` index lại mọi chunk (vẫn dùng lại embedding đã lưu).
 
-        with tqdm.tqdm(total=total_chunks, desc="Indexing to ELS") as pbar:
-            for chunk in self._get_chunks():
-                batch.append(chunk)
+        Bộ nhớ: với chunk store (.jsonl) corpus chỉ map bảng id, không decode
+        chunk; ngoài set id đang có trong index (cần để so sánh), mỗi chunk
+        chỉ tốn vài mảng nhỏ (cờ cần index, chapter, disorder_key). Chunk và
+        embedding được đọc theo batch, tối đa ~2 × workers batch cùng lúc.
+        """
+        # Chunk store (.jsonl): đọc từng record theo offset, không load cả file
+        self._corpus = DSM5Corpus.load(self.chunk_path)
+        if not len(self._corpus):
+            # Không có chunk thì mọi doc đều "stale": không xóa cả index
+            raise ValueError(f"No chunks loaded from {self.chunk_path}")
+        hierarchy = SectionHierarchy.build(self._corpus)
+        self._disorder_keys = DisorderIndex(self._corpus, hierarchy).row_keys
+        self._chapters = row_chapters(hierarchy)
+
+        missing: Dict[str, np.ndarray] = {}
+        stale: Dict[str, List[str]] = {}
+        for index_name in self.indices.values():
+            existing = self._indexed_ids(index_name)
+            missing[index_name] = np.fromiter(
+                (full or doc_id not in existing for doc_id in self._corpus.ids),
+                dtype=bool,
+                count=len(self._corpus),
+            )
+            stale[index_name] = [
+                doc_id for doc_id in existing if self._corpus.row(doc_id) < 0
+            ]
+        rows = np.flatnonzero(np.logical_or.reduce(list(missing.values()))).tolist()
+        logger.info(
+            f"Chunks: {len(self._corpus)}, to index: {len(rows)}, "
+            f"stale: {sum(len(ids) for ids in stale.values())}"
+        )
+
+        # Batch được chuẩn bị khi embedder cần tới (không đọc trước cả corpus);
+        # embedding đã lưu theo hash, batch nào cũng chỉ gửi phần còn thiếu
+        model, store = self.embedder.provider.key, self.embedding_store
+        prepared: deque = deque()
+
+        def prepare_batches():
+            for start in range(0, len(rows), self.batch_size):
+                batch_rows = rows[start : start + self.batch_size]
+                contents = [self._corpus.chunks[row]["content"] for row in batch_rows]
+                hashes = [content_hash(content) for content in contents]
+                cached = store.get_many(model, self.dims, hashes)
+                to_embed = {
+                    key: content
+                    for key, content in zip(hashes, contents)
+                    if key not in cached
+                }
+                prepared.append((batch_rows, hashes, cached, to_embed))
+                yield list(to_embed.values())
+
+        stats = {"indexed": 0, "reused": 0, "embedded": 0, "deleted": 0}
+        # Embedding batch i+1.. chạy trên pool của embedder trong khi batch i
+        # được bulk index ở luồng chính; tốc độ chỉ bị giới hạn bởi rate limit
+        with tqdm.tqdm(total=len(rows), desc="Indexing to ELS") as pbar:
+            for _, vectors in self.embedder.map(prepare_batches()):
+                batch_rows, hashes, cached, to_embed = prepared.popleft()
+                new = dict(zip(to_embed, vectors))
+                store.put_many(model, self.dims, new.items())
+                embeddings = [
+                    cached[key] if key in cached else new[key] for key in hashes
+                ]
+                self._index_batch(batch_rows, embeddings, missing)
+                stats["indexed"] += len(batch_rows)
+                stats["reused"] += len(batch_rows) - len(to_embed)
+                stats["embedded"] += len(to_embed)
+                pbar.update(len(batch_rows))
+
+        if any(stale.values()):
+            stats["deleted"] = self._delete(stale)
+        logger.info(f"Complete! {stats}, embedding requests: {self.embedder.stats}")
+        if stats["indexed"] or stats["deleted"]:
+            self.bump_generation()
+        else:
+            logger.info("Index is up to date, generation unchanged")
+        if (
+            stats["indexed"]
+            or stats["deleted"]
+            or not os.path.exists(self.centroids_path)
+        ):
+            self.export_centroids()
+        return stats
+
+    def export_centroids(self, path: str = None) -> str:
+        """
+        Ghi centroid của từng chương cho coarse kNN (SectionRouter).
 
-                if len(batch) >= self.batch_size:
-                    self._proces_batch(chunks=batch, start_id=chunk_id)
-                    total_uploaded += len(batch)
-                    chunk_id += len(batch)
-                    pbar.update(len(batch))
-                    batch = []
-                    time.sleep(1)
+        Centroid = trung bình embedding các chunk của chương, đọc từ
+        EmbeddingStore theo batch: retriever route được kNN mà không cần
+        export cả ma trận vectors (export_vectors).
+        Gọi riêng (không qua upload_to_els) thì tự load chunk file.
+        """
+        corpus, chapters_of = self._corpus, self._chapters
+        if corpus is None:
+            corpus = DSM5Corpus.load(self.chunk_path)
+            chapters_of = row_chapters(SectionHierarchy.build(corpus))
+        model, store = self.embedder.provider.key, self.embedding_store
+        sums: Dict[str, np.ndarray] = {}
+        counts: Dict[str, int] = {}
+        for start in range(0, len(corpus), 500):
+            rows = range(start, min(start + 500, len(corpus)))
+            hashes = [content_hash(corpus.chunks[row]["content"]) for row in rows]
+            found = store.get_many(model, self.dims, hashes)
+            for row, key in zip(rows, hashes):
+                if key not in found:
+                    continue
+                chapter = chapters_of[row]
+                vector = np.asarray(found[key], dtype=np.float32)
+                sums[chapter] = sums.get(chapter, 0.0) + vector
+                counts[chapter] = counts.get(chapter, 0) + 1
+        chapters = list(sums)
+        path = save_centroids(
+            path or self.centroids_path,
+            chapters,
+            np.stack([sums[c] / counts[c] for c in chapters]),
+        )
+        logger.info(f"Exported {len(chapters)} chapter centroids to {path}")
+        return path
+
+    def _index_meta(self, dims: int, generation: str = None) -> dict:
+        return {
+            "embedding_dims": dims,
+            GENERATION_META: generation or new_index_generation(),
+        }
 
-            if batch:
-                self._proces_batch(chunks=batch, start_id=chunk_id)
-                total_uploaded += len(batch)
-                pbar.update(len(batch))
-        logger.info(f"Complete! Total chunks processed : {total_uploaded}")
+    def bump_generation(self) -> str:
+        """
+        Ghi generation mới vào `_meta` của mọi index sau khi (re)index xong.
+
+        Cache kết quả của HealthcareRetriever có generation trong key, nên
+        các kết quả cũ không còn được dùng (sau DSM5_GENERATION_REFRESH_S).
+        """
+        generation = new_index_generation()
+        for dims, index_name in self.indices.items():
+            self.client.indices.put_mapping(
+                index=index_name, meta=self._index_meta(dims, generation)
+            )
+        logger.info(
+            f"Index generation {generation}: {', '.join(self.indices.values())}"
+        )
+        return generation
+
+    def export_vectors(self, path: str = None, dtype: str = "float32") -> str:
+        """
+        Dump the indexed embeddings to a .npy matrix for LocalVectorIndex.
+
+        Row i of the matrix is chunk i of the chunk file, matched by doc id.
+        Docs whose id is no longer in the chunk file (stale, e.g. left by an
+        interrupted sync) are deleted from the index first.
+        """
+        corpus = DSM5Corpus.load(self.chunk_path)
+        rows, stale = {}, []
+        for hit in helpers.scan(
+            self.client, index=self.index_name, _source=["embedding"]
+        ):
+            row = corpus.row(hit["_id"])
+            if row < 0:
+                stale.append(hit["_id"])
+            elif hit["_source"].get("embedding"):
+                rows[row] = hit["_source"]["embedding"]
+        if stale:
+            logger.warning(
+                f"Deleting {len(stale)} stale docs from {self.index_name} before export"
+            )
+            self._delete({self.index_name: stale})
+            self.bump_generation()
+        if sorted(rows) != list(range(len(corpus))):
+            raise ValueError(
+                f"Index {self.index_name} is missing embeddings for some chunks; "
+                "re-index before exporting"
+            )
+        vectors = [rows[i] for i in range(len(rows))]
+        path = LocalVectorIndex.build(vectors, dtype=dtype).save(path)
+        logger.info(f"Exported {len(rows)} vectors ({dtype}) to {path}")
+        return path
 
     def delete_index(self):
-        try:
-            if self.client.indices.exists(index=self.index_name):
-                self.client.indices.delete(
-                    index=self.index_name, ignore_unavailable=True
-                )
-                logger.info(f"Delete index {self.index_name} sucessfull")
-            else:
-                logger.warning(f"Index {self.index_name} doesn't not exists")
-        except Exception as e:
-            logger.error(f"Error while delete index name {self.index_name}. {str(e)}")
-            raise
+        for index_name in self.indices.values():
+            try:
+                if self.client.indices.exists(index=index_name):
+                    self.client.indices.delete(
+                        index=index_name, ignore_unavailable=True
+                    )
+                    logger.info(f"Delete index {index_name} sucessfull")
+                else:
+                    logger.warning(f"Index {index_name} doesn't not exists")
+            except Exception as e:
+                logger.error(f"Error while delete index name {index_name}. {str(e)}")
+                raise
 
 
 def main():
@@ -333,6 +541,12 @@ def main():
         action="store_true",
         help="Create index with mapping (without indexing data)",
     )
+    group.add_argument(
+        "--export-vectors",
+        "-e",
+        action="store_true",
+        help="Export embeddings to a .npy file for the local vector index",
+    )
 
     # Optional arguments
     parser.add_argument(
@@ -345,24 +559,87 @@ def main():
         default=64,
         help="Batch size for indexing (default: 64)",
     )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=AppConfig.EMBED_WORKERS,
+        help="Concurrent embedding requests (default: EMBED_WORKERS)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=AppConfig.ELS_INDEX_PROFILE,
+        help="Vector index profile: float, int8, int4, bbq (default: ELS_INDEX_PROFILE)",
+    )
+    parser.add_argument(
+        "--vectors-path",
+        type=str,
+        default=None,
+        help="Output .npy for --export-vectors",
+    )
+    parser.add_argument(
+        "--vectors-dtype",
+        choices=["float32", "float16"],
+        default="float32",
+        help="Storage dtype for --export-vectors (default: float32)",
+    )
+    parser.add_argument(
+        "--dims",
+        type=int,
+        nargs="+",
+        default=[AppConfig.VECTOR_SIZE],
+        choices=EMBEDDING_DIMS,
+        help="Embedding sizes to index side by side; embeds once at the largest "
+        "and truncates for the others (default: VECTOR_SIZE)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-index every chunk, not only new / changed ones (with --index)",
+    )
+    parser.add_argument(
+        "--embedding-store",
+        type=str,
+        default=None,
+        help="SQLite embedding cache (default: DSM5_EMBEDDING_STORE)",
+    )
+    parser.add_argument("--m", type=int, default=None, help="HNSW m override")
+    parser.add_argument(
+        "--ef-construction",
+        type=int,
+        default=None,
+        help="HNSW ef_construction override",
+    )
 
     args = parser.parse_args()
 
     # Initialize indexer
     indexer = ElsIndexer(
-        model_name="openai", batch_size=args.batch_size, chunk_path=args.chunk_path
+        model_name="openai",
+        batch_size=args.batch_size,
+        chunk_path=args.chunk_path,
+        index_profile=get_index_profile(
+            args.profile, m=args.m, ef_construction=args.ef_construction
+        ),
+        dims=max(args.dims),
+        truncate_to=args.dims,
+        workers=args.workers,
+        embedding_store=args.embedding_store,
     )
 
     if args.index:
         logger.info("Starting indexing process...")
         indexer.create_index()  # Tạo index trước
-        indexer.upload_to_els()
+        indexer.upload_to_els(full=args.full)
     elif args.delete:
-        logger.info(f"Deleting index: {indexer.index_name}")
+        logger.info(f"Deleting indices: {', '.join(indexer.indices.values())}")
         indexer.delete_index()
     elif args.create:
-        logger.info(f"Creating index: {indexer.index_name}")
+        logger.info(f"Creating indices: {', '.join(indexer.indices.values())}")
         indexer.create_index()
+    elif args.export_vectors:
+        indexer.export_vectors(path=args.vectors_path, dtype=args.vectors_dtype)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+from .bm25 import BM25Index, analyze, get_bm25_index
+from .chunk_store import (
+    ChunkStore,
+    convert,
+    is_chunk_store,
+    iter_chunks,
+    load_chunks,
+    save_chunks,
+)
+from .coarse import (
+    CHAPTER_FIELD,
+    SectionRouter,
+    compute_centroids,
+    load_centroids,
+    row_chapters,
+    save_centroids,
+)
+from .corpus import (
+    DocIdTable,
+    DSM5Corpus,
+    chunk_doc_id,
+    chunk_doc_ids,
+    chunk_hash,
+    content_hash,
+    get_corpus,
+    id_key,
+    is_chunk_doc_id,
+    with_doc_ids,
+)
+from .criteria import CriteriaIndex, normalize_criterion, normalize_title
+from .dimensions import (
+    EMBEDDING_DIMS,
+    dims_index_name,
+    index_embedding_dims,
+    index_mappings,
+    truncate_embeddings,
+)
+from .entities import (
+    DISORDER_FIELD,
+    DisorderIndex,
+    disorder_key,
+    get_disorder_index,
+)
+from .fusion import FusedHit, RankedList, fuse
+from .hierarchy import SectionHierarchy
+from .index_profiles import INDEX_PROFILES, VectorIndexProfile, get_index_profile
+from .planner import LatencyTracker, RetrievalPlan, RetrievalPlanner
+from .profiling import (
+    clause_names,
+    load_questions,
+    profile_report,
+    profile_stages,
+    summarize,
+)
+from .rerank import RERANKERS, LexicalReranker, Reranker, get_reranker
+from .result_cache import (
+    GENERATION_META,
+    ResultCache,
+    cached_result,
+    get_result_cache,
+    index_generation,
+    new_index_generation,
+    normalize_query,
+    skip_caching,
+)
+from .shared_store import (
+    MappedChunks,
+    SharedStore,
+    ensure_shared_store,
+    get_shared_store,
+)
+from .sources import (
+    BM25KeywordSource,
+    ElasticsearchKeywordSource,
+    ElasticsearchVectorSource,
+    HybridOptions,
+    LocalVectorSource,
+    SearchFilter,
+    SearchRequest,
+    SearchSource,
+    SourceResults,
+)
+from .suggest import TitleSuggester, get_title_suggester
+from .vector_index import BinaryVectorIndex, LocalVectorIndex, get_vector_index
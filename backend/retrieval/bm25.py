@@ -0,0 +1,283 @@
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from retrieval.corpus import DSM5Corpus, get_corpus
+
+# Standard tokenizer approximation: runs of word characters, keeping "1.2.3",
+# "F80.0" and "l'école" together like Lucene's UAX#29 tokenizer does.
+_TOKEN_PATTERN = re.compile(r"\w+(?:[.'’]\w+)*")
+# asciifolding cases NFKD decomposition does not cover
+_FOLD_TABLE = str.maketrans({"đ": "d", "Đ": "D", "ø": "o", "ł": "l", "æ": "ae"})
+
+# Lucene BM25 defaults (k1, b), as used by Elasticsearch
+K1 = 1.2
+B = 0.75
+
+
+def fold(text: str) -> str:
+    """lowercase + asciifolding: "Rối Loạn" → "roi loan"."""
+    decomposed = unicodedata.normalize("NFKD", text.lower().translate(_FOLD_TABLE))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def analyze(text: Optional[str]) -> List[str]:
+    """
+    Python port of the index's `vietnamese` analyzer.
+
+    standard tokenizer → lowercase → asciifolding. Folding runs before
+    tokenizing so combining marks never split a token.
+    """
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(fold(text))
+
+
+class FieldIndex:
+    """
+    Inverted index of one text field, stored as CSR arrays.
+
+    ─────────────────────────────────────────────────────────────────
+    • term_ptr / doc_idx / tf → docs (and term freqs) of term t are
+                                doc_idx[term_ptr[t]:term_ptr[t + 1]]
+    • pos_ptr / positions     → token positions of posting p are
+                                positions[pos_ptr[p]:pos_ptr[p + 1]]
+    • doc_len[doc]            → number of tokens in the field
+    ─────────────────────────────────────────────────────────────────
+    """
+
+    def __init__(self, docs_tokens: Sequence[Sequence[int]], n_terms: int):
+        n_docs = len(docs_tokens)
+        postings: List[List[Tuple[int, List[int]]]] = [[] for _ in range(n_terms)]
+        for doc, tokens in enumerate(docs_tokens):
+            term_positions: Dict[int, List[int]] = {}
+            for pos, term in enumerate(tokens):
+                term_positions.setdefault(term, []).append(pos)
+            for term, positions in term_positions.items():
+                postings[term].append((doc, positions))
+
+        counts = np.fromiter((len(p) for p in postings), dtype=np.int64, count=n_terms)
+        self.term_ptr = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.term_ptr[1:])
+        flat = [posting for term_postings in postings for posting in term_postings]
+        self.doc_idx = np.fromiter(
+            (d for d, _ in flat), dtype=np.int32, count=len(flat)
+        )
+        self.tf = np.fromiter(
+            (len(p) for _, p in flat), dtype=np.float32, count=len(flat)
+        )
+        self.pos_ptr = np.zeros(len(flat) + 1, dtype=np.int64)
+        np.cumsum(self.tf.astype(np.int64), out=self.pos_ptr[1:])
+        self.positions = np.fromiter(
+            (pos for _, positions in flat for pos in positions),
+            dtype=np.int32,
+            count=int(self.pos_ptr[-1]),
+        )
+        self.doc_len = np.fromiter(
+            (len(t) for t in docs_tokens), dtype=np.float32, count=n_docs
+        )
+        self.avgdl = float(self.doc_len.mean()) if n_docs else 0.0
+        self.n_docs = n_docs
+
+    def postings(self, term: int) -> slice:
+        return slice(int(self.term_ptr[term]), int(self.term_ptr[term + 1]))
+
+    def idf(self, term: int) -> float:
+        df = int(self.term_ptr[term + 1] - self.term_ptr[term])
+        return math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def tf_norm(self, freq: np.ndarray, docs: np.ndarray) -> np.ndarray:
+        """Lucene BM25 term-frequency saturation (no (k1 + 1) factor)."""
+        avgdl = self.avgdl or 1.0
+        return freq / (freq + K1 * (1 - B + B * self.doc_len[docs] / avgdl))
+
+
+class BM25Index:
+    """
+    In-process BM25 over the DSM-5 chunks.
+
+    Mirrors `HealthcareRetriever._build_keyword_query` so it can stand in for
+    the Elasticsearch keyword search:
+    ─────────────────────────────────────────────────────────────────
+    1. best_fields multi_match (title^3, sub_title^2, context_headers^1.5,
+       content), operator OR, minimum_should_match 30% per field
+    2. phrase multi_match (title^4, content^2) with slop 2
+    3. match on parent_section_title
+    → bool/should: clause scores are summed
+    ─────────────────────────────────────────────────────────────────
+    Sloppy phrase frequency follows Lucene (each match counts
+    1 / (1 + edit distance)) but is computed greedily per anchor position,
+    so phrase scores are close to, not identical with, Elasticsearch.
+    """
+
+    FIELDS = (
+        "title",
+        "sub_title",
+        "context_headers",
+        "content",
+        "parent_section_title",
+    )
+
+    def __init__(self, corpus: DSM5Corpus, fields: Sequence[str] = FIELDS):
+        self.corpus = corpus
+        self.vocab: Dict[str, int] = {}
+        analyzed = {
+            field: [
+                [
+                    self.vocab.setdefault(t, len(self.vocab))
+                    for t in analyze(chunk.get(field))
+                ]
+                for chunk in corpus
+            ]
+            for field in fields
+        }
+        self.fields = {
+            field: FieldIndex(docs_tokens, len(self.vocab))
+            for field, docs_tokens in analyzed.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.corpus)
+
+    def _term_ids(self, query: str) -> List[int]:
+        """Query terms in order; unknown terms are -1."""
+        return [self.vocab.get(term, -1) for term in analyze(query)]
+
+    def match(self, field: str, terms: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """OR match of `terms` on one field: (BM25 scores, matched-term counts)."""
+        index = self.fields[field]
+        scores = np.zeros(len(self), dtype=np.float32)
+        matched = np.zeros(len(self), dtype=np.int32)
+        for term in terms:
+            if term < 0:
+                continue
+            span = index.postings(term)
+            docs = index.doc_idx[span]
+            scores[docs] += index.idf(term) * index.tf_norm(index.tf[span], docs)
+            matched[docs] += 1
+        return scores, matched
+
+    def phrase(self, field: str, terms: Sequence[int], slop: int = 0) -> np.ndarray:
+        """Phrase query with slop on one field."""
+        index = self.fields[field]
+        scores = np.zeros(len(self), dtype=np.float32)
+        if not terms or min(terms) < 0:
+            return scores
+        if len(terms) == 1:
+            return self.match(field, terms)[0]
+
+        spans = [index.postings(term) for term in terms]
+        candidates = index.doc_idx[spans[0]]
+        for span in spans[1:]:
+            candidates = np.intersect1d(candidates, index.doc_idx[span])
+        if not len(candidates):
+            return scores
+
+        freqs = np.zeros(len(candidates), dtype=np.float32)
+        for i, doc in enumerate(candidates):
+            per_term = []
+            for span in spans:
+                posting = span.start + int(np.searchsorted(index.doc_idx[span], doc))
+                per_term.append(
+                    index.positions[index.pos_ptr[posting] : index.pos_ptr[posting + 1]]
+                )
+            freqs[i] = _sloppy_freq(per_term, slop)
+
+        hit = freqs > 0
+        docs = candidates[hit]
+        idf = sum(index.idf(term) for term in terms)
+        scores[docs] = idf * index.tf_norm(freqs[hit], docs)
+        return scores
+
+    def score(
+        self,
+        query: str,
+        boost_title: float = 3.0,
+        boost_context: float = 1.5,
+        minimum_should_match: float = 0.3,
+        slop: int = 2,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores of every chunk for the hybrid keyword query, plus a hit mask."""
+        terms = self._term_ids(query)
+        n_terms = len(terms)
+        required = max(1, int(n_terms * minimum_should_match))
+
+        # 1. best_fields: max over fields that satisfy minimum_should_match
+        best = np.zeros(len(self), dtype=np.float32)
+        best_hit = np.zeros(len(self), dtype=bool)
+        for field, boost in (
+            ("title", boost_title),
+            ("sub_title", 2.0),
+            ("context_headers", boost_context),
+            ("content", 1.0),
+        ):
+            scores, matched = self.match(field, terms)
+            ok = matched >= required
+            best = np.maximum(best, np.where(ok, boost * scores, 0.0))
+            best_hit |= ok
+
+        # 2. phrase match, best of title^4 / content^2
+        phrase = np.maximum(
+            4.0 * self.phrase("title", terms, slop),
+            2.0 * self.phrase("content", terms, slop),
+        )
+
+        # 3. parent_section_title match
+        parent, parent_matched = self.match("parent_section_title", terms)
+
+        total = best + phrase + parent
+        hit = best_hit | (phrase > 0) | (parent_matched > 0)
+        return np.where(hit, total, 0.0), hit
+
+    def search(
+        self, query: str, size: int = 20, rows: Optional[np.ndarray] = None, **kwargs
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top `size` corpus rows and scores, best first, optionally within `rows`."""
+        scores, hit = self.score(query, **kwargs)
+        if rows is not None:
+            allowed = np.zeros(len(self), dtype=bool)
+            allowed[rows] = True
+            hit &= allowed
+        rows = np.flatnonzero(hit)
+        if len(rows) > size:
+            rows = rows[np.argpartition(-scores[rows], size - 1)[:size]]
+        order = np.lexsort((rows, -scores[rows]))
+        rows = rows[order]
+        return rows, scores[rows]
+
+
+def _sloppy_freq(per_term: List[np.ndarray], slop: int) -> float:
+    """
+    Sum of 1 / (1 + distance) over phrase matches within `slop`.
+
+    Each position of the first term anchors one candidate match; every other
+    term contributes its position closest to where the phrase expects it.
+    """
+    anchors = per_term[0].astype(np.int64)
+    relative = [anchors]
+    for i, positions in enumerate(per_term[1:], start=1):
+        expected = anchors + i
+        nearest = np.abs(positions[None, :] - expected[:, None]).argmin(axis=1)
+        relative.append(positions[nearest].astype(np.int64) - i)
+    relative = np.stack(relative)
+    distance = relative.max(axis=0) - relative.min(axis=0)
+    within = distance <= slop
+    return float((1.0 / (1.0 + distance[within])).sum())
+
+
+_bm25_index: Optional[BM25Index] = None
+_bm25_lock = threading.Lock()
+
+
+def get_bm25_index() -> BM25Index:
+    """Process-wide BM25 index over the DSM-5 corpus, built on first use."""
+    global _bm25_index
+    if _bm25_index is None:
+        with _bm25_lock:
+            if _bm25_index is None:
+                _bm25_index = BM25Index(get_corpus())
+    return _bm25_index
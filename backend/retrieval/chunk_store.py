@@ -0,0 +1,225 @@
+import json
+import os
+import re
+import struct
+from array import array
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from retrieval.corpus import DocIdTable, with_doc_ids
+from utils import AppConfig, logger, save_json
+
+STORE_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+MAGIC = b"DSM5CHK2"
+# magic, chunk count, size of the .jsonl the index was written for, bytes of
+# the doc id blob
+HEADER = struct.Struct("<8sQQQ")
+_WHITESPACE = re.compile(r"[\s,]*")
+
+
+def is_chunk_store(path: str) -> bool:
+    return str(path).endswith(STORE_SUFFIX)
+
+
+class ChunkStore(Sequence):
+    """
+    DSM-5 chunks as JSON lines plus a binary offset index.
+
+    Files
+    ─────────────────────────────────────────────────────────────────
+    • <name>.jsonl:      one chunk per line, in chunk order
+    • <name>.jsonl.idx:  header (magic, count, .jsonl size, id bytes),
+                         then uint64 arrays: offsets[count + 1] of every
+                         line, keys[count] / key_rows[count] (doc ids
+                         hashed to 64 bits, sorted, with their rows) and
+                         id_offsets[count + 1]; then the UTF-8 doc id blob
+    ─────────────────────────────────────────────────────────────────
+    Every array is memory-mapped: `len` reads the header, `store.ids` is a
+    `DocIdTable` over the mapped ids, `store[row]` and `store.get(doc_id)`
+    read one line with `os.pread`, and iterating streams the file line by
+    line. Opening a store decodes no chunk and holds no per-chunk object;
+    the index itself is ~40 bytes per chunk of mapped (page cache) memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        with open(self.index_path, "rb") as f:
+            magic, count, size, id_bytes = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(
+                f"{self.index_path} is not a current DSM-5 chunk index; "
+                "rewrite the store"
+            )
+        if os.path.getsize(path) != size:
+            raise ValueError(
+                f"{path} changed since {self.index_path} was written; "
+                "rewrite the store"
+            )
+        table = np.memmap(
+            self.index_path,
+            dtype="<u8",
+            mode="r",
+            offset=HEADER.size,
+            shape=(4 * count + 2,),
+        )
+        blob = (
+            np.memmap(
+                self.index_path,
+                dtype=np.uint8,
+                mode="r",
+                offset=HEADER.size + table.nbytes,
+                shape=(id_bytes,),
+            )
+            if id_bytes
+            else np.zeros(0, dtype=np.uint8)
+        )
+        self.offsets = table[: count + 1]
+        self.ids = DocIdTable(
+            blob,
+            offsets=table[3 * count + 1 :],
+            keys=table[count + 1 : 2 * count + 1],
+            key_rows=table[2 * count + 1 : 3 * count + 1],
+        )
+        self._fd = os.open(path, os.O_RDONLY)
+
+    def __del__(self):
+        if getattr(self, "_fd", None) is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"chunk row {row} out of range")
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(os.pread(self._fd, end - start, start))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with open(self.path, "rb") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def row(self, doc_id: str) -> int:
+        """Row of a doc id, or -1 if unknown."""
+        return self.ids.row(doc_id)
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Chunk with this doc id (see `chunk_doc_id`), or None."""
+        row = self.row(doc_id)
+        return self[row] if row >= 0 else None
+
+    @classmethod
+    def write(
+        cls, chunks: Iterable[Dict[str, Any]], path: Optional[str] = None
+    ) -> "ChunkStore":
+        """Stream `chunks` into a new store at `path` (written, then renamed)."""
+        path = path or AppConfig.DSM5_CHUNKS_PATH
+        if not is_chunk_store(path):
+            raise ValueError(f"Chunk store path must end with {STORE_SUFFIX}: {path}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp-{os.getpid()}"
+        # Offsets + doc ids only (~40 bytes per chunk); records are not held
+        offsets = array("Q", [0])
+        with open(tmp, "wb") as f:
+
+            def write_lines() -> Iterator[str]:
+                for doc_id, chunk in with_doc_ids(chunks):
+                    line = json.dumps(chunk, ensure_ascii=False).encode("utf-8")
+                    f.write(line + b"\n")
+                    offsets.append(offsets[-1] + len(line) + 1)
+                    yield doc_id
+
+            ids = DocIdTable.build(write_lines())
+
+        with open(tmp + INDEX_SUFFIX, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(ids), offsets[-1], len(ids.blob)))
+            for part in (offsets, ids.keys, ids.key_rows, ids.offsets):
+                f.write(np.asarray(part, dtype="<u8").tobytes())
+            f.write(ids.blob.tobytes())
+        os.replace(tmp + INDEX_SUFFIX, path + INDEX_SUFFIX)
+        os.replace(tmp, path)
+        logger.info(f"Wrote {len(ids)} chunks to {path}")
+        return cls(path)
+
+
+def iter_json_array(path: str, buffer_size: int = 1 << 20) -> Iterator[Any]:
+    """Elements of a top-level JSON array, decoded incrementally."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(buffer_size).lstrip()
+        if not buf.startswith("["):
+            raise ValueError(f"Expected list of chunks in {path}")
+        pos, eof = 1, False
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if buf.startswith("]", pos):
+                return
+            try:
+                item, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Element cut by the buffer: keep the tail, read further
+                if eof:
+                    raise
+                more = f.read(buffer_size)
+                buf, pos, eof = buf[pos:] + more, 0, not more
+                continue
+            yield item
+
+
+def iter_chunks(path: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stream the chunks of a `.jsonl` store or a `.json` array."""
+    path = path or AppConfig.DSM5_CHUNKS_PATH
+    if is_chunk_store(path):
+        yield from ChunkStore(path)
+    else:
+        yield from iter_json_array(path)
+
+
+def load_chunks(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    return list(iter_chunks(path))
+
+
+def save_chunks(chunks: Iterable[Dict[str, Any]], path: Optional[str] = None):
+    """Write chunks in the format given by the extension of `path`."""
+    path = path or AppConfig.DSM5_CHUNKS_PATH
+    if is_chunk_store(path):
+        ChunkStore.write(chunks, path)
+    else:
+        save_json(data=list(chunks), output_path=path)
+
+
+def convert(source: str, target: Optional[str] = None) -> ChunkStore:
+    """`dsm5_chunks.json` → `dsm5_chunks.jsonl` + `.idx`, streaming."""
+    target = target or os.path.splitext(source)[0] + STORE_SUFFIX
+    return ChunkStore.write(iter_json_array(source), target)
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert DSM-5 chunks to the streaming chunk store"
+    )
+    parser.add_argument(
+        "--input", type=str, default=None, help="JSON array (default: DSM5_CHUNKS_PATH)"
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="Store path (default: <input>.jsonl)"
+    )
+    args = parser.parse_args(argv)
+    store = convert(args.input or AppConfig.DSM5_CHUNKS_PATH, args.output)
+    print(json.dumps({"path": store.path, "chunks": len(store)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
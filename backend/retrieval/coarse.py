@@ -0,0 +1,146 @@
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from retrieval.hierarchy import SectionHierarchy, _csr
+from retrieval.sources import SearchFilter
+from retrieval.vector_index import LocalVectorIndex
+from utils import AppConfig
+
+# Keyword field holding the chapter (top-level section id) of each chunk;
+# ElsIndexer writes it, the coarse stage filters kNN on it
+CHAPTER_FIELD = "chapter_id"
+
+
+def row_chapters(hierarchy: SectionHierarchy) -> List[str]:
+    """Chapter section id of every corpus row."""
+    roots = hierarchy.root_nodes()[hierarchy.chunk_node]
+    return [hierarchy.section_ids[node] for node in roots.tolist()]
+
+
+def save_centroids(
+    path: Optional[str], section_ids: Sequence[str], centroids: np.ndarray
+) -> str:
+    """Chapter centroids as `.npz` (section_ids, centroids)."""
+    path = path or AppConfig.DSM5_CENTROIDS_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            section_ids=np.asarray(section_ids, dtype=str),
+            centroids=np.asarray(centroids, dtype=np.float32),
+        )
+    return path
+
+
+def load_centroids(path: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Chapter section id → centroid, as written by `save_centroids`."""
+    with np.load(path or AppConfig.DSM5_CENTROIDS_PATH) as data:
+        return dict(zip(data["section_ids"].tolist(), data["centroids"]))
+
+
+class SectionRouter:
+    """
+    Coarse stage of coarse-to-fine kNN over the DSM-5 section tree.
+
+    Every chunk belongs to the chapter at the top of its section path. A
+    chapter is summarized by the centroid of its chunk embeddings; a query
+    is first scored against the few centroids, and the fine kNN then only
+    searches the chunks of the best `n_sections` chapters:
+    ─────────────────────────────────────────────────────────────────
+    • local index:    `rows` of the chosen partitions (a smaller matmul)
+    • Elasticsearch:  a `terms` filter on CHAPTER_FIELD (a few chapter
+                      ids, whatever the number of chunks)
+    ─────────────────────────────────────────────────────────────────
+    Centroids come from the exported vectors, or, without them, from the
+    small file ElsIndexer writes (`load_centroids`).
+    Partitions are stored CSR-style: rows of chapter i are
+    part_rows[part_ptr[i]:part_ptr[i + 1]], in document order.
+    """
+
+    def __init__(
+        self,
+        hierarchy: SectionHierarchy,
+        vector_index: Optional[LocalVectorIndex] = None,
+        centroids: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        if vector_index is not None and len(vector_index) != len(hierarchy.corpus):
+            raise ValueError(
+                f"Vector index has {len(vector_index)} rows but corpus has "
+                f"{len(hierarchy.corpus)}"
+            )
+        self.corpus = hierarchy.corpus
+        chapter_nodes = hierarchy.root_nodes()[hierarchy.chunk_node]
+        self.chapters, chapter_of_row = np.unique(chapter_nodes, return_inverse=True)
+        self.section_ids = [hierarchy.section_ids[node] for node in self.chapters]
+        self.part_ptr, self.part_rows = _csr(
+            chapter_of_row.astype(np.int32), len(self.chapters)
+        )
+
+        if vector_index is not None:
+            centroids = compute_centroids(
+                vector_index, [self.partition(p) for p in range(len(self))]
+            )
+        elif centroids is not None:
+            missing = [sid for sid in self.section_ids if sid not in centroids]
+            if missing:
+                raise ValueError(f"No centroid for chapters {missing}")
+            centroids = np.stack([centroids[sid] for sid in self.section_ids]).astype(
+                np.float32
+            )
+        else:
+            raise ValueError("SectionRouter needs a vector index or centroids")
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids / np.where(norms > 0, norms, 1.0)
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    @property
+    def dims(self) -> int:
+        return self.centroids.shape[1]
+
+    def partition(self, part: int) -> np.ndarray:
+        return self.part_rows[self.part_ptr[part] : self.part_ptr[part + 1]]
+
+    def select(
+        self, query_vector: Sequence[float], n_sections: int = 3
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Best `n_sections` partitions and their centroid cosines, best first."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self.centroids @ query
+        n_sections = min(n_sections, len(self))
+        order = np.argsort(-scores, kind="stable")[:n_sections]
+        return order, scores[order]
+
+    def route(
+        self, query_vector: Sequence[float], n_sections: int = 3
+    ) -> Optional[SearchFilter]:
+        """
+        SearchFilter covering the chunks of the best `n_sections` chapters.
+
+        None when routing cannot help: the query vector has another size than
+        the centroids, or every chapter would be selected.
+        """
+        if len(query_vector) != self.dims or n_sections >= len(self):
+            return None
+        parts, _ = self.select(query_vector, n_sections)
+        rows = np.sort(np.concatenate([self.partition(part) for part in parts]))
+        return SearchFilter(
+            rows=rows,
+            es_clause={
+                "terms": {CHAPTER_FIELD: [self.section_ids[part] for part in parts]}
+            },
+        )
+
+
+def compute_centroids(
+    vector_index: LocalVectorIndex, partitions: Sequence[np.ndarray]
+) -> np.ndarray:
+    """Mean (normalized) embedding of each partition of rows."""
+    centroids = np.empty((len(partitions), vector_index.dims), np.float32)
+    for part, rows in enumerate(partitions):
+        centroids[part] = vector_index.vectors[rows].astype(np.float32).mean(axis=0)
+    return centroids
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import re
+import threading
+from array import array
+from collections import abc
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils import AppConfig, logger
+
+# Fields returned to callers for a chunk, same as the `_source` filter used by
+# HealthcareRetriever's Elasticsearch queries.
+SOURCE_FIELDS = (
+    "title",
+    "sub_title",
+    "content",
+    "section_id",
+    "parent_section_id",
+    "parent_section_title",
+    "context_headers",
+    "page_start",
+)
+
+
+def chunk_hash(chunk: Dict[str, Any]) -> str:
+    """Hash of every field of a chunk (canonical JSON), hex."""
+    payload = json.dumps(chunk, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def content_hash(text: str) -> str:
+    """Hash of the embedded text; key of the embedding store."""
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def chunk_doc_id(chunk: Dict[str, Any]) -> str:
+    """
+    Elasticsearch `_id` of a chunk: `<section_id>-<hash>`.
+
+    ElsIndexer and every local index derive ids through this function, so a
+    hit from Elasticsearch can be joined with in-memory data by id. The id
+    does not depend on the position of the chunk: an unchanged chunk keeps
+    its id across re-chunking, a changed one gets a new id.
+    """
+    return f"{chunk.get('section_id') or 'none'}-{chunk_hash(chunk)[:16]}"
+
+
+# `chunk_doc_id`, plus the `~n` suffix of duplicates; indices built before
+# content-hash ids used the chunk position ("17") and must be reindexed
+DOC_ID_PATTERN = re.compile(r".+-[0-9a-f]{16}(~\d+)?")
+
+
+def is_chunk_doc_id(doc_id: str) -> bool:
+    """Whether `doc_id` follows the `chunk_doc_id` scheme."""
+    return DOC_ID_PATTERN.fullmatch(doc_id) is not None
+
+
+def with_doc_ids(
+    chunks: Iterable[Dict[str, Any]],
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(doc id, chunk) in order; identical chunks get a `~n` suffix."""
+    seen: Dict[str, int] = {}
+    for chunk in chunks:
+        doc_id = chunk_doc_id(chunk)
+        count = seen.get(doc_id, 0)
+        seen[doc_id] = count + 1
+        yield (f"{doc_id}~{count}" if count else doc_id), chunk
+
+
+def chunk_doc_ids(chunks: Iterable[Dict[str, Any]]) -> List[str]:
+    """Doc ids of a chunk list, see `with_doc_ids`."""
+    return [doc_id for doc_id, _ in with_doc_ids(chunks)]
+
+
+def id_key(doc_id: str) -> int:
+    """64-bit key of a doc id in a sorted `DocIdTable`."""
+    return int.from_bytes(hashlib.sha1(doc_id.encode("utf-8")).digest()[:8], "little")
+
+
+class DocIdTable(abc.Sequence):
+    """
+    Doc ids of a corpus as flat arrays, which can be memory-mapped files.
+
+    Arrays
+    ─────────────────────────────────────────────────────────────────
+    • blob / offsets:  UTF-8 ids, id of row i is blob[offsets[i]:offsets[i + 1]]
+    • keys / key_rows: `id_key` of every id, sorted, and the row of each
+    ─────────────────────────────────────────────────────────────────
+    `table[row]` decodes one id and `table.row(doc_id)` is a binary search
+    on `keys`, so a store-backed corpus builds no per-chunk Python object.
+    """
+
+    def __init__(
+        self,
+        blob: np.ndarray,
+        offsets: np.ndarray,
+        keys: np.ndarray,
+        key_rows: np.ndarray,
+    ):
+        self.blob = blob
+        self.offsets = offsets
+        self.keys = keys
+        self.key_rows = key_rows
+
+    @classmethod
+    def build(cls, ids: Iterable[str]) -> "DocIdTable":
+        """In-memory table of `ids`, in row order (consumed once)."""
+        blob, offsets, keys = bytearray(), array("Q", [0]), array("Q")
+        for doc_id in ids:
+            blob += doc_id.encode("utf-8")
+            offsets.append(len(blob))
+            keys.append(id_key(doc_id))
+        keys = np.asarray(keys, dtype=np.uint64)
+        order = np.argsort(keys, kind="stable")
+        return cls(
+            np.frombuffer(bytes(blob), dtype=np.uint8),
+            np.asarray(offsets, dtype=np.uint64),
+            keys[order],
+            order.astype(np.uint64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"doc id row {row} out of range")
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+    def __contains__(self, doc_id) -> bool:
+        return isinstance(doc_id, str) and self.row(doc_id) >= 0
+
+    def row(self, doc_id: str) -> int:
+        """Row of a doc id, or -1 if unknown."""
+        key = np.uint64(id_key(doc_id))
+        i = int(np.searchsorted(self.keys, key))
+        # Keys are 64-bit hashes: compare the ids of every equal key
+        while i < len(self.keys) and self.keys[i] == key:
+            row = int(self.key_rows[i])
+            if self[row] == doc_id:
+                return row
+            i += 1
+        return -1
+
+
+class DSM5Corpus:
+    """
+    DSM-5 chunks addressable by Elasticsearch doc id.
+
+    Rows follow the order of the chunk file and `ids[row]` is the doc id.
+    For a list of chunks the ids are computed here; a chunk store or the
+    shared store brings its own `DocIdTable` (`chunks.ids`), so loading
+    does not decode the chunks and `row` is a lookup in the mapped table.
+    """
+
+    def __init__(self, chunks: Sequence[Dict[str, Any]]):
+        self.chunks = chunks
+        ids = getattr(chunks, "ids", None)
+        if ids is None:
+            self.ids = chunk_doc_ids(chunks)
+            self._rows: Optional[Dict[str, int]] = {
+                doc_id: row for row, doc_id in enumerate(self.ids)
+            }
+        else:
+            self.ids, self._rows = ids, None
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "DSM5Corpus":
+        """
+        Chunks of a `.json` array (in memory) or a chunk store (`.jsonl`,
+        records read from disk on access, see retrieval/chunk_store.py).
+        """
+        from retrieval.chunk_store import ChunkStore, is_chunk_store, load_chunks
+
+        path = path or AppConfig.DSM5_CHUNKS_PATH
+        chunks = ChunkStore(path) if is_chunk_store(path) else load_chunks(path)
+        logger.info(f"Loaded {len(chunks)} DSM-5 chunks from {path}")
+        return cls(chunks)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.chunks)
+
+    def row(self, doc_id: str) -> int:
+        """Row of a doc id, or -1 if unknown."""
+        if self._rows is None:
+            return self.ids.row(doc_id)
+        return self._rows.get(doc_id, -1)
+
+    def source(self, row: int, fields=SOURCE_FIELDS) -> Dict[str, Any]:
+        """ES-style `_source` payload of a chunk."""
+        chunk = self.chunks[row]
+        metadata = chunk.get("metadata") or {}
+        return {
+            field: (
+                metadata.get("page_start")
+                if field == "page_start"
+                else chunk.get(field)
+            )
+            for field in fields
+        }
+
+
+_corpus: Optional[DSM5Corpus] = None
+_corpus_lock = threading.Lock()
+
+
+def get_corpus() -> DSM5Corpus:
+    """
+    Process-wide DSM-5 corpus, loaded on first use.
+
+    With DSM5_SHARED_STORE the chunks are read from the memory-mapped store
+    shared by all workers instead of a per-process copy of the JSON file.
+    """
+    global _corpus
+    if _corpus is None:
+        with _corpus_lock:
+            if _corpus is None:
+                if AppConfig.DSM5_SHARED_STORE:
+                    from retrieval.shared_store import get_shared_store
+
+                    _corpus = get_shared_store().corpus()
+                else:
+                    _corpus = DSM5Corpus.load()
+    return _corpus
@@ -0,0 +1,109 @@
+import difflib
+import re
+from typing import Dict, List, Optional, Tuple
+
+from retrieval.bm25 import fold
+from retrieval.corpus import DSM5Corpus
+
+_SECTION_PREFIX = re.compile(r"^\s*\d+(?:\.\d+)*\.?\s*")
+_PARENTHESES = re.compile(r"\(([^)]*)\)")
+_NON_WORD = re.compile(r"[^\w]+")
+# "A", "Tiêu chí B", "tieu chi c", "criteria_D", "criterion E"
+_CRITERION_LABEL = re.compile(
+    r"^(?:tieu\s*chi|criteria|criterion)?[\s_]*([a-z])(?:_p\d+)?$"
+)
+
+
+def normalize_title(title: str) -> str:
+    """ascii-folded disorder title without its section number or punctuation."""
+    text = fold(_SECTION_PREFIX.sub("", title or ""))
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def normalize_criterion(criterion: Optional[str]) -> Optional[str]:
+    """Criterion label ("A".."Z") or None if the text is not a bare label."""
+    if not criterion:
+        return None
+    match = _CRITERION_LABEL.match(normalize_title(criterion))
+    return match.group(1).upper() if match else None
+
+
+class CriteriaIndex:
+    """
+    Disorder title + criterion label → chunk rows, built once from the corpus.
+
+    Criterion chunks are the ones `split_long_context` tagged with a
+    `sub_id` of `criteria_<label>` (or `criteria_<label>_p<n>` when a
+    criterion was split further). Lookup order for a disorder name:
+    exact normalized title, then substring of a title (covers the English
+    name in parentheses), then difflib fuzzy match against each title and
+    its Vietnamese / English parts.
+    """
+
+    def __init__(self, corpus: DSM5Corpus, fuzzy_cutoff: float = 0.75):
+        self.corpus = corpus
+        self.fuzzy_cutoff = fuzzy_cutoff
+        # normalized title -> criterion label -> rows in document order
+        self.entries: Dict[str, Dict[str, List[int]]] = {}
+        # normalized title or title part -> normalized title
+        self.aliases: Dict[str, str] = {}
+        for row, chunk in enumerate(corpus):
+            sub_id = chunk.get("sub_id") or ""
+            if not sub_id.startswith("criteria_"):
+                continue
+            label = sub_id.split("_")[1].upper()
+            raw_title = chunk.get("title") or ""
+            title = normalize_title(raw_title)
+            if not title:
+                continue
+            self.entries.setdefault(title, {}).setdefault(label, []).append(row)
+            parts = [_PARENTHESES.sub("", raw_title), *_PARENTHESES.findall(raw_title)]
+            for alias in [title, *map(normalize_title, parts)]:
+                if alias:
+                    self.aliases.setdefault(alias, title)
+        self.titles = list(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match_title(self, disorder: str) -> Tuple[Optional[str], float]:
+        """Best indexed title for a disorder name, with a 0..1 match score."""
+        key = normalize_title(disorder)
+        if not key:
+            return None, 0.0
+        if key in self.aliases:
+            return self.aliases[key], 1.0
+
+        containing = [title for title in self.titles if key in title]
+        if containing:
+            best = min(containing, key=len)
+            return best, 0.9
+
+        close = difflib.get_close_matches(
+            key, list(self.aliases), n=1, cutoff=self.fuzzy_cutoff
+        )
+        if close:
+            ratio = difflib.SequenceMatcher(None, key, close[0]).ratio()
+            return self.aliases[close[0]], round(ratio * 0.8, 4)
+        return None, 0.0
+
+    def lookup(
+        self, disorder: str, criterion: Optional[str] = None, limit: int = 10
+    ) -> List[Tuple[int, float]]:
+        """
+        (row, score) pairs for a disorder and optional criterion.
+
+        Empty on a miss, including a criterion that is free text rather than
+        a label, so callers can fall back to full-text search.
+        """
+        title, score = self.match_title(disorder)
+        if title is None:
+            return []
+
+        criteria = self.entries[title]
+        if criterion:
+            label = normalize_criterion(criterion)
+            rows = criteria.get(label, []) if label else []
+        else:
+            rows = sorted(row for label_rows in criteria.values() for row in label_rows)
+        return [(row, score) for row in rows[:limit]]
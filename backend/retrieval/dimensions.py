@@ -0,0 +1,61 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils import AppConfig, logger
+
+# Matryoshka-style embedding sizes an index can be built with. OpenAI
+# text-embedding-3-* and gemini-embedding-001 are trained so that the first
+# d dimensions of an embedding are themselves a usable embedding.
+EMBEDDING_DIMS = (256, 512, 768, 1536)
+
+
+def truncate_embeddings(vectors, dims: int) -> np.ndarray:
+    """
+    Keep the first `dims` dimensions of each embedding and re-normalize.
+
+    Works on one vector (d,) or a matrix (n, d); the result is float32.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if dims > matrix.shape[-1]:
+        raise ValueError(
+            f"Cannot truncate {matrix.shape[-1]}-dim embeddings to {dims} dims"
+        )
+    matrix = matrix[..., :dims]
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def dims_index_name(dims: int, base: Optional[str] = None) -> str:
+    """
+    Elasticsearch index holding `dims`-dimensional embeddings.
+
+    The default size keeps the plain index name so existing deployments are
+    untouched; other sizes live side by side as `<base>-d<dims>`.
+    """
+    base = base or AppConfig.INDEX_NAME_ELS
+    return base if dims == AppConfig.VECTOR_SIZE else f"{base}-d{dims}"
+
+
+def index_mappings(client: Any, index: str) -> Optional[List[Dict[str, Any]]]:
+    """`mappings` of every index behind a name or alias; None if unreadable."""
+    try:
+        response = client.indices.get_mapping(index=index)
+    except Exception as e:
+        logger.warning(f"Cannot read mapping of index {index}: {str(e)}")
+        return None
+    return [mapping.get("mappings", {}) for mapping in dict(response).values()]
+
+
+def index_embedding_dims(client: Any, index: str) -> Optional[int]:
+    """
+    Embedding size recorded in an index: `_meta.embedding_dims`, else the
+    `dims` of the `embedding` mapping. None if the index cannot be read.
+    """
+    for mappings in index_mappings(client, index) or []:
+        dims = (mappings.get("_meta") or {}).get("embedding_dims")
+        if dims is None:
+            dims = mappings.get("properties", {}).get("embedding", {}).get("dims")
+        if dims is not None:
+            return int(dims)
+    return None
@@ -0,0 +1,136 @@
+import re
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from retrieval.corpus import DSM5Corpus, get_corpus
+from retrieval.criteria import normalize_title
+from retrieval.hierarchy import SectionHierarchy
+from retrieval.sources import SearchFilter
+
+DISORDER_FIELD = "disorder_key"
+
+# "Rối loạn ngôn ngữ (Language Disorder). 1.2.2 Mã số: ..." → first title only
+_MERGED_TITLE = re.compile(r"\.\s+\d+(?:\.\d+)+\s")
+# Section titles that are not disorders, never used as a mention
+_GENERIC_KEYS = frozenset({"chan doan phan biet"})
+# Shorter single-word aliases collide with common folded words ("sang")
+_MIN_ALIAS_LENGTH = 5
+
+
+def disorder_key(title: Optional[str]) -> str:
+    """
+    Normalized disorder key of a section title: its Vietnamese name,
+    ascii-folded, without section number, English name or merged titles.
+
+    "4.2 Rối loạn trầm cảm chủ yếu (Major Depressive Disorder)"
+    → "roi loan tram cam chu yeu"
+    """
+    title = _MERGED_TITLE.split(title or "")[0]
+    return normalize_title(title.split("(")[0])
+
+
+def _english_alias(title: Optional[str]) -> str:
+    """Folded English name in the first parentheses, if the text is ASCII."""
+    title = _MERGED_TITLE.split(title or "")[0]
+    if "(" not in title:
+        return ""
+    inner = title.split("(", 1)[1].split(")")[0]
+    return normalize_title(inner) if inner.isascii() else ""
+
+
+class DisorderIndex:
+    """
+    Disorder dictionary built from the DSM-5 section titles.
+
+    Every chunk gets the keys of its own section and of all its ancestors
+    (`row_keys`), so a chapter name such as "rối loạn trầm cảm" covers every
+    disorder in that chapter while "rối loạn trầm cảm chủ yếu" covers only
+    its own section. The same keys are written to the `disorder_key`
+    keyword field at index time.
+
+    `detect` finds mentions in a query by longest-first, word-aligned
+    matching of folded aliases (Vietnamese names and ASCII English names).
+    """
+
+    def __init__(
+        self, corpus: DSM5Corpus, hierarchy: Optional[SectionHierarchy] = None
+    ):
+        self.corpus = corpus
+        hierarchy = hierarchy or SectionHierarchy.build(corpus)
+        node_keys: List[str] = [""] * len(hierarchy)
+        self.aliases: Dict[str, str] = {}
+        for row, chunk in enumerate(corpus):
+            node = int(hierarchy.chunk_node[row])
+            parent = int(hierarchy.parent[node])
+            for target, title in (
+                (node, chunk.get("title")),
+                (parent, chunk.get("parent_section_title")),
+            ):
+                key = disorder_key(title)
+                if target < 0 or not key or key in _GENERIC_KEYS:
+                    continue
+                node_keys[target] = node_keys[target] or key
+                for alias in (key, _english_alias(title)):
+                    if len(alias) >= _MIN_ALIAS_LENGTH:
+                        self.aliases.setdefault(alias, key)
+
+        self.row_keys: List[List[str]] = []
+        for row in range(len(corpus)):
+            node, keys = int(hierarchy.chunk_node[row]), []
+            while node >= 0:
+                if node_keys[node] and node_keys[node] not in keys:
+                    keys.append(node_keys[node])
+                node = int(hierarchy.parent[node])
+            self.row_keys.append(keys)
+
+        postings: Dict[str, List[int]] = {}
+        for row, keys in enumerate(self.row_keys):
+            for key in keys:
+                postings.setdefault(key, []).append(row)
+        self.postings = {
+            key: np.asarray(rows, dtype=np.int64) for key, rows in postings.items()
+        }
+        # Longest first, so a disorder wins over the chapter its name contains
+        self._patterns = sorted(self.aliases, key=len, reverse=True)
+
+    def __len__(self) -> int:
+        return len(self.postings)
+
+    def detect(self, query: str) -> List[str]:
+        """Disorder keys mentioned in a query, in order of detection."""
+        text = f" {normalize_title(query)} "
+        found: List[str] = []
+        for alias in self._patterns:
+            needle = f" {alias} "
+            if needle not in text:
+                continue
+            key = self.aliases[alias]
+            if key not in found and key in self.postings:
+                found.append(key)
+            # Consume the mention so shorter aliases inside it do not match
+            text = text.replace(needle, " | ")
+        return found
+
+    def filter(self, keys: Sequence[str]) -> Optional[SearchFilter]:
+        """SearchFilter of the chunks under any of `keys`; None if no key is known."""
+        keys = [key for key in keys if key in self.postings]
+        if not keys:
+            return None
+        rows = np.unique(np.concatenate([self.postings[key] for key in keys]))
+        return SearchFilter(rows=rows, es_clause={"terms": {DISORDER_FIELD: keys}})
+
+
+_disorder_index: Optional[DisorderIndex] = None
+_disorder_lock = threading.Lock()
+
+
+def get_disorder_index() -> DisorderIndex:
+    """Process-wide disorder dictionary over the DSM-5 corpus, built on first use."""
+    global _disorder_index
+    if _disorder_index is None:
+        with _disorder_lock:
+            if _disorder_index is None:
+                _disorder_index = DisorderIndex(get_corpus())
+    return _disorder_index
@@ -0,0 +1,134 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Literal, Optional, Sequence
+
+import numpy as np
+
+FusionMethod = Literal["rrf", "weighted_rrf", "score"]
+
+
+@dataclass
+class RankedList:
+    """
+    Output of one retriever: doc ids in rank order plus their raw scores.
+
+    `weight` is only used by "weighted_rrf" and "score" fusion.
+    """
+
+    name: str
+    ids: List[str]
+    scores: Optional[Sequence[float]] = None
+    weight: float = 1.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+@dataclass
+class FusedHit:
+    """A fused result. Payloads are not copied: look them up by `doc_id`."""
+
+    doc_id: str
+    score: float
+    ranks: Dict[str, int] = field(default_factory=dict)  # source -> 1-based rank
+    scores: Dict[str, float] = field(default_factory=dict)  # source -> raw score
+
+
+def fuse(
+    ranked_lists: Sequence[RankedList],
+    method: FusionMethod = "weighted_rrf",
+    k: int = 60,
+    top_k: int = 10,
+    overlap_boost: float = 1.0,
+) -> List[FusedHit]:
+    """
+    Fuse any number of ranked lists into one top-k list.
+
+    Methods:
+    ─────────────────────────────────────────────────────────────────
+    • rrf:          score = Σ 1 / (k + rank_i)
+    • weighted_rrf: score = Σ w_i / (k + rank_i)
+    • score:        score = Σ w_i * minmax(raw_score_i)   (0 when absent)
+    ─────────────────────────────────────────────────────────────────
+    Doc ids are interned to integers and each list becomes one row of a
+    (n_lists, n_docs) rank matrix, so fusion is a single weighted sum.
+    `overlap_boost` multiplies the score of docs found by 2+ retrievers.
+    Ties keep first-seen order (earlier lists first).
+    """
+    vocab: Dict[str, int] = {}
+    for ranked in ranked_lists:
+        for doc_id in ranked.ids:
+            vocab.setdefault(doc_id, len(vocab))
+    doc_ids = list(vocab)  # column -> doc id (dicts keep insertion order)
+    n_docs = len(doc_ids)
+    if n_docs == 0 or top_k <= 0:
+        return []
+
+    n_lists = len(ranked_lists)
+    ranks = np.zeros((n_lists, n_docs), dtype=np.int32)  # 0 = not retrieved
+    raw = np.zeros((n_lists, n_docs), dtype=np.float64)
+    for i, ranked in enumerate(ranked_lists):
+        if not len(ranked):
+            continue
+        cols = np.fromiter(
+            (vocab[doc_id] for doc_id in ranked.ids), dtype=np.int64, count=len(ranked)
+        )
+        # Reverse so the best rank wins if a list repeats an id
+        ranks[i, cols[::-1]] = np.arange(len(ranked), 0, -1, dtype=np.int32)
+        if ranked.scores is not None:
+            raw[i, cols[::-1]] = np.asarray(ranked.scores, dtype=np.float64)[::-1]
+
+    present = ranks > 0
+    if method == "score":
+        contrib = _minmax_rows(raw, present)
+    elif method in ("rrf", "weighted_rrf"):
+        contrib = np.where(present, 1.0 / (k + np.maximum(ranks, 1)), 0.0)
+    else:
+        raise ValueError(f"Unknown fusion method: {method}")
+
+    weights = np.array(
+        [1.0 if method == "rrf" else r.weight for r in ranked_lists], dtype=np.float64
+    )
+    fused = weights @ contrib
+    if overlap_boost != 1.0:
+        fused = np.where(present.sum(axis=0) > 1, fused * overlap_boost, fused)
+
+    top = _top_k(fused, top_k)
+    names = [r.name for r in ranked_lists]
+    hits = []
+    for col in top:
+        in_lists = np.flatnonzero(present[:, col])
+        hits.append(
+            FusedHit(
+                doc_id=doc_ids[col],
+                score=float(fused[col]),
+                ranks={names[i]: int(ranks[i, col]) for i in in_lists},
+                scores={names[i]: float(raw[i, col]) for i in in_lists},
+            )
+        )
+    return hits
+
+
+def _minmax_rows(raw: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """Min-max normalize each row over the docs it retrieved."""
+    masked = np.where(present, raw, np.nan)
+    with np.errstate(invalid="ignore", all="ignore"):
+        lo = np.nanmin(masked, axis=1, keepdims=True)
+        hi = np.nanmax(masked, axis=1, keepdims=True)
+    span = hi - lo
+    norm = np.where(span > 0, (masked - lo) / np.where(span > 0, span, 1.0), 1.0)
+    return np.where(present, norm, 0.0)
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k scores, best first, ties broken by index."""
+    n = scores.shape[0]
+    if top_k < n:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        # argpartition may split a tie at the boundary arbitrarily: pull in
+        # every doc tied with the k-th score, then order deterministically
+        threshold = scores[candidates].min()
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:top_k]
@@ -0,0 +1,151 @@
+from typing import Any, Dict, List
+
+import numpy as np
+
+from retrieval.corpus import DSM5Corpus
+
+
+class SectionHierarchy:
+    """
+    Precomputed DSM-5 section tree.
+
+    Section ids are not unique in the manual (e.g. "1.1" exists under "1" and
+    under "9"), so a node is one occurrence of a section: the parent of a
+    chunk is the closest preceding node with its `parent_section_id`, in
+    document order.
+
+    Storage is compact NumPy arrays:
+    ─────────────────────────────────────────────────────────────────
+    • parent[node]            → parent node (-1 for chapters)
+    • child_ptr / child_idx   → CSR list of child nodes per node
+    • chunk_ptr / chunk_rows  → CSR list of corpus rows per node
+    • chunk_node[row]         → node of a corpus row
+    ─────────────────────────────────────────────────────────────────
+    Chunk payloads stay in the corpus and are looked up by row, so context
+    expansion is an array walk instead of an Elasticsearch query.
+    """
+
+    def __init__(
+        self,
+        corpus: DSM5Corpus,
+        section_ids: List[str],
+        parent: np.ndarray,
+        chunk_node: np.ndarray,
+    ):
+        self.corpus = corpus
+        self.section_ids = section_ids
+        self.parent = parent
+        self.chunk_node = chunk_node
+        self.child_ptr, self.child_idx = _csr(parent, len(section_ids))
+        self.chunk_ptr, self.chunk_rows = _csr(chunk_node, len(section_ids))
+
+    @classmethod
+    def build(cls, corpus: DSM5Corpus) -> "SectionHierarchy":
+        section_ids: List[str] = []
+        parents: List[int] = []
+        node_of: Dict[tuple, int] = {}  # (parent node, section_id) -> node
+        latest: Dict[str, int] = {}  # section_id -> most recent node
+        chunk_node = np.empty(len(corpus), dtype=np.int32)
+
+        def add_node(parent: int, section_id: str) -> int:
+            key = (parent, section_id)
+            node = node_of.get(key)
+            if node is None:
+                node = len(section_ids)
+                node_of[key] = node
+                section_ids.append(section_id)
+                parents.append(parent)
+            latest[section_id] = node
+            return node
+
+        for row, chunk in enumerate(corpus):
+            section_id = chunk.get("section_id") or ""
+            parent_section_id = chunk.get("parent_section_id")
+            parent = -1
+            if parent_section_id:
+                parent = latest.get(parent_section_id, -1)
+                if parent < 0:
+                    # Parent section has no chunk of its own (e.g. a chapter
+                    # title page): add a node without chunks so siblings link up
+                    grand_parent = parent_section_id.rpartition(".")[0]
+                    parent = add_node(latest.get(grand_parent, -1), parent_section_id)
+            chunk_node[row] = add_node(parent, section_id)
+
+        return cls(
+            corpus=corpus,
+            section_ids=section_ids,
+            parent=np.asarray(parents, dtype=np.int32),
+            chunk_node=chunk_node,
+        )
+
+    def __len__(self) -> int:
+        return len(self.section_ids)
+
+    def node(self, doc_id: str) -> int:
+        """Section node of a chunk, or -1 if the doc id is unknown."""
+        row = self.corpus.row(doc_id)
+        return int(self.chunk_node[row]) if row >= 0 else -1
+
+    def root_nodes(self) -> np.ndarray:
+        """Top-level ancestor (chapter) of every node."""
+        root = np.arange(len(self), dtype=np.int32)
+        while True:
+            up = self.parent[root]
+            moving = up >= 0
+            if not moving.any():
+                return root
+            root = np.where(moving, up, root)
+
+    def children(self, node: int) -> np.ndarray:
+        return self.child_idx[self.child_ptr[node] : self.child_ptr[node + 1]]
+
+    def siblings(self, node: int) -> np.ndarray:
+        parent = self.parent[node]
+        if parent < 0:
+            return np.empty(0, dtype=np.int32)
+        children = self.children(parent)
+        return children[children != node]
+
+    def chunks(self, node: int) -> np.ndarray:
+        """Corpus rows of a section, in document order."""
+        return self.chunk_rows[self.chunk_ptr[node] : self.chunk_ptr[node + 1]]
+
+    def _first_chunk(self, node: int) -> Dict[str, Any] | None:
+        rows = self.chunks(node)
+        if not len(rows):
+            return None
+        return self.corpus.source(
+            int(rows[0]), fields=("title", "section_id", "content")
+        )
+
+    def context(
+        self, doc_id: str, max_siblings: int = 2, max_related: int = 3
+    ) -> List[Dict[str, Any]]:
+        """
+        Parent and sibling sections of a chunk.
+
+        Returns the first chunk of the parent section followed by the first
+        chunk of up to `max_siblings` sibling sections (same fields as the old
+        Elasticsearch context query: title, section_id, content).
+        """
+        node = self.node(doc_id)
+        if node < 0:
+            return []
+
+        related = []
+        parent = int(self.parent[node])
+        if parent >= 0:
+            related.append(self._first_chunk(parent))
+        for sibling in self.siblings(node)[:max_siblings]:
+            related.append(self._first_chunk(int(sibling)))
+        return [doc for doc in related if doc][:max_related]
+
+
+def _csr(owner: np.ndarray, n_nodes: int) -> tuple[np.ndarray, np.ndarray]:
+    """Group item positions by owner node: items of node i are idx[ptr[i]:ptr[i+1]]."""
+    valid = np.flatnonzero(owner >= 0)
+    order = valid[np.argsort(owner[valid], kind="stable")].astype(np.int32)
+    counts = np.bincount(owner[valid], minlength=n_nodes)
+    ptr = np.zeros(n_nodes + 1, dtype=np.int32)
+    np.cumsum(counts, out=ptr[1:])
+    return ptr, order
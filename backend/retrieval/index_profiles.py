@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from utils import AppConfig
+
+MAX_NUM_CANDIDATES = 10000  # Elasticsearch hard limit for knn.num_candidates
+
+
+@dataclass(frozen=True)
+class VectorIndexProfile:
+    """
+    How the DSM-5 `embedding` field is indexed and searched.
+
+    Quantized HNSW graphs are smaller and faster but less exact, so each
+    profile carries its own `num_candidates` policy: the lossier the vectors,
+    the more candidates kNN looks at before returning k hits.
+    """
+
+    name: str
+    index_type: str  # dense_vector index_options.type
+    m: int = 16
+    ef_construction: int = 100
+    candidates_per_hit: int = 3
+    min_candidates: int = 100
+    min_es_version: Tuple[int, int] = (8, 0)
+
+    def mapping(self, dims: int = AppConfig.VECTOR_SIZE) -> Dict[str, Any]:
+        """dense_vector mapping for the `embedding` field."""
+        return {
+            "type": "dense_vector",
+            "dims": dims,
+            "index": True,
+            "similarity": "cosine",
+            "index_options": {
+                "type": self.index_type,
+                "m": self.m,
+                "ef_construction": self.ef_construction,
+            },
+        }
+
+    def num_candidates(self, k: int) -> int:
+        """Candidates per shard for a kNN query returning k hits."""
+        return min(
+            max(k * self.candidates_per_hit, self.min_candidates, k),
+            MAX_NUM_CANDIDATES,
+        )
+
+    def is_supported(self, es_version: str) -> bool:
+        """Whether a cluster of version "X.Y.Z" supports this index type."""
+        major, minor = (int(part) for part in es_version.split(".")[:2])
+        return (major, minor) >= self.min_es_version
+
+
+INDEX_PROFILES: Dict[str, VectorIndexProfile] = {
+    profile.name: profile
+    for profile in (
+        VectorIndexProfile(name="float", index_type="hnsw"),
+        VectorIndexProfile(
+            name="int8",
+            index_type="int8_hnsw",
+            candidates_per_hit=5,
+            min_candidates=150,
+            min_es_version=(8, 12),
+        ),
+        VectorIndexProfile(
+            name="int4",
+            index_type="int4_hnsw",
+            candidates_per_hit=8,
+            min_candidates=200,
+            min_es_version=(8, 15),
+        ),
+        VectorIndexProfile(
+            name="bbq",
+            index_type="bbq_hnsw",
+            candidates_per_hit=10,
+            min_candidates=300,
+            min_es_version=(8, 18),
+        ),
+    )
+}
+
+
+def get_index_profile(
+    name: str = AppConfig.ELS_INDEX_PROFILE, **overrides: Any
+) -> VectorIndexProfile:
+    """
+    Look up a registered profile by name.
+
+    Keyword overrides (e.g. m=32, ef_construction=200) return a tuned copy.
+    """
+    if name not in INDEX_PROFILES:
+        raise ValueError(
+            f"Unknown vector index profile '{name}'. "
+            f"Available: {', '.join(INDEX_PROFILES)}"
+        )
+    profile = INDEX_PROFILES[name]
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    if not overrides:
+        return profile
+    return VectorIndexProfile(**{**profile.__dict__, **overrides})
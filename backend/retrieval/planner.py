@@ -0,0 +1,173 @@
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Sequence
+
+from retrieval.bm25 import analyze
+from retrieval.index_profiles import VectorIndexProfile
+from utils import AppConfig
+
+
+class LatencyTracker:
+    """
+    Exponentially weighted moving average of latencies (ms) per stage name.
+
+    A stage is `warm` after `min_samples` observations; before that its
+    average is dominated by the first (often cold-start) request and the
+    planner does not act on it.
+    """
+
+    def __init__(self, alpha: float = 0.2, min_samples: int = 5):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self._ewma: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, latency_ms: float) -> None:
+        with self._lock:
+            previous = self._ewma.get(stage)
+            self._ewma[stage] = (
+                latency_ms
+                if previous is None
+                else self.alpha * latency_ms + (1 - self.alpha) * previous
+            )
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    def get(self, stage: str, default: float = 0.0) -> float:
+        return self._ewma.get(stage, default)
+
+    def warm(self, stage: str) -> bool:
+        return self._counts.get(stage, 0) >= self.min_samples
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(value, 2) for stage, value in self._ewma.items()}
+
+
+@dataclass
+class RetrievalPlan:
+    """Knobs of one hybrid_search call, plus the signals they came from."""
+
+    fetch_size: int
+    num_candidates: Optional[int]
+    include_context: bool
+    rerank_depth: Optional[int]
+    early_stop: bool
+    signals: Dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class RetrievalPlanner:
+    """
+    Picks hybrid_search knobs per request from a latency budget.
+
+    Signals
+    ─────────────────────────────────────────────────────────────────
+    • es_ms:     EWMA latency of the Elasticsearch calls (per source)
+    • terms:     query length after analysis
+    • disorder:  the query is nothing but a disorder name
+    ─────────────────────────────────────────────────────────────────
+    Policy
+    ─────────────────────────────────────────────────────────────────
+    • pressure = expected ES time / budget. Above 1 the fetch size and
+      kNN num_candidates shrink toward top_k, and context expansion is
+      dropped unless it is served from memory. Below 0.5, long queries get
+      more kNN candidates.
+    • A bare disorder name is answered by its own section: fetch only top_k
+      and allow early stop.
+    • Early stop: once a source returns a clear winner (relative score gap
+      >= min_gap) the remaining sources are skipped.
+    • Pressure only counts once every ES stage is warm, and every
+      `probe_every`-th plan that would early stop runs all sources anyway,
+      so a skipped stage keeps being observed and its EWMA can recover.
+    ─────────────────────────────────────────────────────────────────
+    Decisions are returned as a RetrievalPlan; the caller logs it together
+    with the observed latency.
+    """
+
+    def __init__(
+        self,
+        budget_ms: float = AppConfig.DSM5_LATENCY_BUDGET_MS,
+        min_gap: float = 0.35,
+        long_query_terms: int = 12,
+        tracker: Optional[LatencyTracker] = None,
+        probe_every: int = 20,
+    ):
+        self.budget_ms = budget_ms
+        self.min_gap = min_gap
+        self.long_query_terms = long_query_terms
+        self.tracker = tracker or LatencyTracker()
+        self.probe_every = probe_every
+        self._early_stops = 0
+        self._lock = threading.Lock()
+
+    def plan(
+        self,
+        query: str,
+        top_k: int,
+        include_context: bool,
+        profile: VectorIndexProfile,
+        es_stages: Sequence[str] = (),
+        disorders: Sequence[str] = (),
+        context_in_memory: bool = True,
+    ) -> RetrievalPlan:
+        terms = analyze(query)
+        es_ms = sum(self.tracker.get(stage) for stage in es_stages)
+        warm = all(self.tracker.warm(stage) for stage in es_stages)
+        pressure = es_ms / self.budget_ms if self.budget_ms > 0 and warm else 0.0
+        pure_disorder = bool(disorders) and _only_mentions(terms, disorders)
+
+        fetch_size = min(top_k * 3, 50)
+        num_candidates = profile.num_candidates(fetch_size)
+        if pure_disorder:
+            fetch_size = top_k
+            num_candidates = profile.num_candidates(fetch_size)
+        elif pressure > 1.0:
+            fetch_size = max(top_k, min(fetch_size, top_k * 2))
+            num_candidates = max(fetch_size, num_candidates // 2)
+        elif pressure < 0.5 and len(terms) >= self.long_query_terms:
+            num_candidates = profile.num_candidates(fetch_size * 2)
+
+        early_stop = pure_disorder or pressure > 1.0
+        probe = early_stop and self._probe()
+        return RetrievalPlan(
+            fetch_size=fetch_size,
+            num_candidates=num_candidates,
+            include_context=include_context and (context_in_memory or pressure <= 1.0),
+            rerank_depth=fetch_size,
+            early_stop=early_stop and not probe,
+            signals={
+                "es_ms": round(es_ms, 2),
+                "warm": warm,
+                "probe": probe,
+                "pressure": round(pressure, 3),
+                "terms": len(terms),
+                "pure_disorder": pure_disorder,
+                "budget_ms": self.budget_ms,
+            },
+        )
+
+    def _probe(self) -> bool:
+        """Every `probe_every`-th early-stop plan runs all sources."""
+        if self.probe_every <= 0:
+            return False
+        with self._lock:
+            self._early_stops += 1
+            return self._early_stops % self.probe_every == 0
+
+    def clear_winner(self, scores: Optional[Sequence[float]]) -> bool:
+        """Whether the top score leads the runner-up by at least `min_gap`."""
+        if not scores:
+            return False
+        if len(scores) == 1:
+            return True
+        top, second = scores[0], scores[1]
+        return top > 0 and (top - second) / top >= self.min_gap
+
+
+def _only_mentions(terms: Sequence[str], disorders: Sequence[str]) -> bool:
+    """True if every query term belongs to one of the detected disorder keys."""
+    mentioned = {term for key in disorders for term in key.split()}
+    return all(term in mentioned for term in terms)
@@ -0,0 +1,147 @@
+"""
+Per-clause / per-phase cost of Elasticsearch searches, from `profile: true`.
+
+Profile trees of several searches are aggregated into one row per stage:
+
+    clause:<name>   inclusive time of each `should` clause (best_fields
+                    multi_match, phrase multi_match, parent-title match)
+    phase:<name>    Lucene phases of the whole query (create_weight,
+                    build_scorer, next_doc, advance, score, ...)
+    query / rewrite / collector / fetch / knn
+                    totals of the search phases
+
+`HealthcareRetriever.profile_queries` runs the searches; evaluator/profile_es.py
+and the /admin/dsm5/profile endpoint only call it.
+"""
+
+import csv
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from utils import AppConfig
+
+NANOS_PER_MS = 1e6
+
+
+def load_questions(
+    path: Optional[str] = None, limit: Optional[int] = None
+) -> List[str]:
+    """`question` column of a questions CSV (data/questions/questions_dsm5.csv)."""
+    with open(path or AppConfig.DSM5_QUESTIONS_PATH, "r", encoding="utf-8") as f:
+        questions = [
+            row["question"] for row in csv.DictReader(f) if row.get("question")
+        ]
+    return questions[:limit] if limit else questions
+
+
+def clause_names(body: Dict[str, Any]) -> List[str]:
+    """Readable names of the top-level `should` clauses of a keyword query."""
+    names = []
+    for clause in body.get("query", {}).get("bool", {}).get("should", []):
+        kind, spec = next(iter(clause.items()))
+        if kind == "multi_match":
+            names.append(f"multi_match:{spec.get('type', 'best_fields')}")
+        elif kind in ("match", "match_phrase", "term"):
+            names.append(f"{kind}:{next(iter(spec))}")
+        else:
+            names.append(kind)
+    return names
+
+
+def profile_stages(
+    profile: Dict[str, Any], names: Sequence[str] = ()
+) -> Dict[str, float]:
+    """
+    Milliseconds per stage of one profiled search, summed over shards.
+
+    Should clauses are matched to `names` by position when Lucene kept the
+    boolean query as written; otherwise they are labelled by Lucene type.
+    """
+    stages: Dict[str, float] = defaultdict(float)
+    for shard in profile.get("shards", []):
+        for search in shard.get("searches", []):
+            for root in search.get("query", []):
+                stages["query"] += root["time_in_nanos"] / NANOS_PER_MS
+                for phase, nanos in root.get("breakdown", {}).items():
+                    if not phase.endswith("_count"):
+                        stages[f"phase:{phase}"] += nanos / NANOS_PER_MS
+                children = root.get("children", [])
+                by_position = len(children) == len(names)
+                for i, child in enumerate(children):
+                    label = names[i] if by_position else f"{child['type']}[{i}]"
+                    stages[f"clause:{label}"] += child["time_in_nanos"] / NANOS_PER_MS
+            stages["rewrite"] += search.get("rewrite_time", 0) / NANOS_PER_MS
+            for collector in search.get("collector", []):
+                stages["collector"] += collector["time_in_nanos"] / NANOS_PER_MS
+        if shard.get("fetch"):
+            stages["fetch"] += shard["fetch"]["time_in_nanos"] / NANOS_PER_MS
+        for knn in (shard.get("dfs") or {}).get("knn", []):
+            nanos = sum(q["time_in_nanos"] for q in knn.get("query", []))
+            stages["knn"] += (nanos + knn.get("rewrite_time", 0)) / NANOS_PER_MS
+    return dict(stages)
+
+
+def summarize(per_query: List[Dict[str, float]]) -> List[Dict[str, Any]]:
+    """One row per stage across queries, slowest mean first."""
+    values: Dict[str, List[float]] = defaultdict(list)
+    for stages in per_query:
+        for stage, ms in stages.items():
+            values[stage].append(ms)
+    query_mean = float(np.mean(values["query"])) if values.get("query") else 0.0
+    rows = []
+    for stage, ms in values.items():
+        ms = np.asarray(ms)
+        rows.append(
+            {
+                "stage": stage,
+                "n": len(ms),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p90_ms": round(float(np.percentile(ms, 90)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+                "max_ms": round(float(ms.max()), 3),
+                # Clauses and phases overlap, so shares do not sum to 1
+                "share_of_query": (
+                    round(float(ms.mean()) / query_mean, 3)
+                    if query_mean and stage.startswith(("clause:", "phase:"))
+                    else None
+                ),
+            }
+        )
+    return sorted(rows, key=lambda row: row["mean_ms"], reverse=True)
+
+
+def profile_report(
+    questions: Sequence[str],
+    per_query: List[Dict[str, float]],
+    took: Sequence[float],
+    slowest: int = 5,
+) -> Dict[str, Any]:
+    """
+    Per-stage percentile rows of profiled searches, plus the `slowest`
+    questions with the clause that dominated each of them.
+    """
+    clauses = [
+        max(
+            (s for s in stages if s.startswith("clause:")),
+            key=stages.get,
+            default=None,
+        )
+        for stages in per_query
+    ]
+    order = np.argsort([-stages.get("query", 0.0) for stages in per_query])
+    return {
+        "queries": len(per_query),
+        "took_p50_ms": float(np.percentile(took, 50)) if took else None,
+        "stages": summarize(per_query),
+        "slowest_queries": [
+            {
+                "question": questions[i],
+                "query_ms": round(per_query[i].get("query", 0.0), 3),
+                "slowest_clause": clauses[i],
+            }
+            for i in order[:slowest].tolist()
+        ],
+    }
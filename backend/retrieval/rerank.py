@@ -0,0 +1,229 @@
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from retrieval.bm25 import analyze
+from retrieval.corpus import SOURCE_FIELDS, DSM5Corpus
+from retrieval.vector_index import LocalVectorIndex
+from utils import AppConfig, logger
+
+# (query, query vector dims or 0 without a vector, doc id)
+ScoreKey = Tuple[str, int, str]
+# Payload fields of the title feature, enough to rerank without chunk text
+TITLE_FIELDS = ("title", "sub_title", "parent_section_title", "section_id")
+
+
+class ScoreCache:
+    """Bounded LRU of (query, vector dims, doc id) → score, thread-safe."""
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._data: "OrderedDict[ScoreKey, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: ScoreKey) -> Optional[float]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: ScoreKey, value: float) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class Reranker(ABC):
+    """
+    Second stage after fusion.
+
+    Subclasses implement `score_batch`, which scores every candidate of one
+    query in a single call. `rerank` serves (query, doc id) pairs from the
+    cache, scores only the misses, then blends in the fusion order with
+    `prior_weight` so a weak scorer cannot throw away the first stage.
+
+    Scores computed without a query vector (streamed keyword stage, early
+    stop before kNN) lack vector features, so the cache keys them apart
+    from scores computed with one.
+
+    `fields` are the payload fields `score_batch` reads: the retriever
+    fetches only those for the whole rerank pool, and full payloads for
+    the final top_k.
+    """
+
+    name: str = "base"
+    fields: Tuple[str, ...] = SOURCE_FIELDS
+
+    def __init__(self, prior_weight: float = 0.15, cache_size: int = 4096):
+        self.prior_weight = prior_weight
+        self.cache = ScoreCache(cache_size)
+
+    @abstractmethod
+    def score_batch(
+        self,
+        query: str,
+        candidates: Sequence[Dict[str, Any]],
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> np.ndarray:
+        """One relevance score per candidate, higher is better."""
+
+    def rerank(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_k: Optional[int] = None,
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Reorder formatted hybrid_search results, best first."""
+        if not candidates:
+            return []
+
+        variant = 0 if query_vector is None else len(query_vector)
+        scores = np.empty(len(candidates), dtype=np.float32)
+        missing = []
+        for i, candidate in enumerate(candidates):
+            cached = self.cache.get((query, variant, candidate["id"]))
+            if cached is None:
+                missing.append(i)
+            else:
+                scores[i] = cached
+        if missing:
+            fresh = self.score_batch(
+                query, [candidates[i] for i in missing], query_vector=query_vector
+            )
+            for i, score in zip(missing, fresh.tolist()):
+                scores[i] = score
+                self.cache.put((query, variant, candidates[i]["id"]), score)
+
+        # Fusion order as a prior: 1.0 for the first candidate down to ~0
+        prior = 1.0 - np.arange(len(candidates)) / len(candidates)
+        final = (1 - self.prior_weight) * scores + self.prior_weight * prior
+        order = np.argsort(-final, kind="stable")[:top_k]
+
+        reranked = []
+        for i in order.tolist():
+            candidate = candidates[i]
+            candidate.setdefault("scores", {})["rerank"] = round(float(final[i]), 4)
+            reranked.append(candidate)
+        return reranked
+
+
+class LexicalReranker(Reranker):
+    """
+    CPU-cheap default scorer, a weighted sum of:
+    ─────────────────────────────────────────────────────────────────
+    • overlap: share of query terms found in the chunk text
+    • title:   share of query terms found in title / sub_title / parent title
+    • cosine:  query ↔ chunk embedding, read from the LocalVectorIndex
+               (skipped, and its weight redistributed, without vectors)
+    ─────────────────────────────────────────────────────────────────
+    Terms go through the same ascii-folding analyzer as BM25, and each
+    chunk's term sets are computed once per doc id. With a corpus the chunk
+    text is read from it by doc id, so candidates only need TITLE_FIELDS.
+    """
+
+    name: str = "lexical"
+
+    def __init__(
+        self,
+        vector_index: Optional[LocalVectorIndex] = None,
+        corpus: Optional[DSM5Corpus] = None,
+        overlap_weight: float = 0.4,
+        title_weight: float = 0.3,
+        cosine_weight: float = 0.3,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.vector_index = vector_index
+        self.corpus = corpus
+        self.weights = np.array(
+            [overlap_weight, title_weight, cosine_weight], dtype=np.float32
+        )
+        self._terms: Dict[str, Tuple[frozenset, frozenset]] = {}
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        return TITLE_FIELDS if self.corpus is not None else TITLE_FIELDS + ("content",)
+
+    def _content(self, candidate: Dict[str, Any]) -> Optional[str]:
+        row = self.corpus.row(candidate["id"]) if self.corpus is not None else -1
+        if row < 0:
+            return candidate.get("content")
+        return self.corpus.chunks[row].get("content")
+
+    def _doc_terms(self, candidate: Dict[str, Any]) -> Tuple[frozenset, frozenset]:
+        terms = self._terms.get(candidate["id"])
+        if terms is None:
+            title = " ".join(
+                candidate.get(field) or ""
+                for field in ("title", "sub_title", "parent_section_title")
+            )
+            terms = (
+                frozenset(analyze(self._content(candidate))),
+                frozenset(analyze(title)),
+            )
+            self._terms[candidate["id"]] = terms
+        return terms
+
+    def _cosines(
+        self, candidates: Sequence[Dict[str, Any]], query_vector
+    ) -> Optional[np.ndarray]:
+        if self.vector_index is None or self.corpus is None or query_vector is None:
+            return None
+        rows = np.array([self.corpus.row(c["id"]) for c in candidates])
+        if (rows < 0).any():
+            return None
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape[0] != self.vector_index.dims:
+            return None
+        query = query / (np.linalg.norm(query) or 1.0)
+        return self.vector_index.vectors[rows].astype(np.float32) @ query
+
+    def score_batch(
+        self,
+        query: str,
+        candidates: Sequence[Dict[str, Any]],
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> np.ndarray:
+        query_terms = set(analyze(query))
+        n_terms = max(len(query_terms), 1)
+        features = np.zeros((len(candidates), 3), dtype=np.float32)
+        for i, candidate in enumerate(candidates):
+            content_terms, title_terms = self._doc_terms(candidate)
+            features[i, 0] = len(query_terms & content_terms) / n_terms
+            features[i, 1] = len(query_terms & title_terms) / n_terms
+
+        weights = self.weights.copy()
+        cosines = self._cosines(candidates, query_vector)
+        if cosines is None:
+            weights[2] = 0.0
+        else:
+            features[:, 2] = np.clip(cosines, 0.0, 1.0)
+        return features @ (weights / (weights.sum() or 1.0))
+
+
+RERANKERS = {LexicalReranker.name: LexicalReranker}
+
+
+def get_reranker(
+    name: str = AppConfig.DSM5_RERANKER, **kwargs: Any
+) -> Optional[Reranker]:
+    """Instantiate a registered reranker by name; "none" disables reranking."""
+    if not name or name == "none":
+        return None
+    if name not in RERANKERS:
+        raise ValueError(
+            f"Unknown reranker '{name}'. Available: none, {', '.join(RERANKERS)}"
+        )
+    reranker = RERANKERS[name](**kwargs)
+    logger.info(f"Using DSM-5 reranker: {name}")
+    return reranker
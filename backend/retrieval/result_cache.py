@@ -0,0 +1,269 @@
+import dataclasses
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from opentelemetry import metrics
+
+from retrieval.dimensions import index_mappings
+from utils import AppConfig, logger
+
+# `_meta` key an index records its generation under; ElsIndexer writes a new
+# value on every (re)index, which invalidates every cached result at once
+GENERATION_META = "index_generation"
+
+# Reasons the running `cached_result` call must not be stored, see skip_caching
+_skip_reasons: ContextVar[Optional[List[str]]] = ContextVar(
+    "result_cache_skip", default=None
+)
+
+_cache_requests = metrics.get_meter(name="chatbot.retrieval").create_counter(
+    name="dsm5_result_cache_requests_total",
+    description="DSM-5 result cache lookups by kind, tier and outcome",
+    unit="1",
+)
+
+
+def new_index_generation() -> str:
+    """Fresh generation id: sortable timestamp plus a random suffix."""
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def index_generation(client: Any, index: str) -> Optional[str]:
+    """
+    Generation of the index (or every index behind an alias), from
+    `_meta.index_generation`. "" for indices built before generations were
+    recorded; None if the mapping cannot be read.
+    """
+    mappings = index_mappings(client, index)
+    if mappings is None:
+        return None
+    return ",".join(
+        sorted(str((m.get("_meta") or {}).get(GENERATION_META, "")) for m in mappings)
+    )
+
+
+def normalize_query(text: str) -> str:
+    """NFC, casefolded, single-spaced: spelling variants share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+def _key_value(value: Any) -> Any:
+    """Argument as it goes into a cache key: strings normalized, dataclasses as dicts."""
+    if isinstance(value, str):
+        return normalize_query(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    return value
+
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars from the rerankers
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+class ResultCache:
+    """
+    Two-tier cache of serialized retrieval results.
+
+    ─────────────────────────────────────────────────────────────────
+    • L1:  in-process LRU (`max_size` entries), per worker
+    • L2:  Redis (optional), shared by every worker, entries expire after
+           `ttl` seconds; an L2 hit is copied into L1
+    ─────────────────────────────────────────────────────────────────
+    Values are stored as JSON so both tiers hand out fresh copies that
+    callers may mutate. Redis errors are logged and counted, never raised:
+    the cache degrades to L1 only.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: int = 3600,
+        redis_client: Any = None,
+        namespace: str = "dsm5:results",
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis = redis_client
+        self.namespace = namespace
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "errors": 0}
+
+    @staticmethod
+    def key(kind: str, generation: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            [kind, generation, params], sort_keys=True, ensure_ascii=False
+        )
+        return f"{kind}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+    def _count(self, stat: str, kind: str, tier: str, outcome: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+        _cache_requests.add(1, {"kind": kind, "tier": tier, "outcome": outcome})
+
+    def get(self, key: str) -> Optional[Any]:
+        kind = key.split(":", 1)[0]
+        with self._lock:
+            raw = self._data.get(key)
+            if raw is not None:
+                self._data.move_to_end(key)
+        if raw is not None:
+            self._count("l1_hits", kind, "l1", "hit")
+            return json.loads(raw)
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(f"{self.namespace}:{key}")
+            except Exception as e:
+                logger.warning(f"Result cache Redis get failed: {str(e)}")
+                self._count("errors", kind, "l2", "error")
+            if raw is not None:
+                raw = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                self._put_local(key, raw)
+                self._count("l2_hits", kind, "l2", "hit")
+                return json.loads(raw)
+
+        self._count("misses", kind, "all", "miss")
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        raw = json.dumps(value, ensure_ascii=False, default=_json_default)
+        self._put_local(key, raw)
+        if self.redis is not None:
+            try:
+                self.redis.set(f"{self.namespace}:{key}", raw, ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Result cache Redis set failed: {str(e)}")
+                self._count("errors", key.split(":", 1)[0], "l2", "error")
+
+    def _put_local(self, key: str, raw: str) -> None:
+        with self._lock:
+            self._data[key] = raw
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop L1; L2 entries die with their generation or TTL."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._data))
+        lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["l1_hits"] + stats["l2_hits"]) / lookups, 4)
+            if lookups
+            else 0.0
+        )
+        stats["redis"] = self.redis is not None
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def skip_caching(reason: str) -> None:
+    """
+    Keep the result of the running `cached_result` call out of the cache.
+
+    For results that depend on transient state rather than on the arguments,
+    e.g. a plan degraded under load: caching them would serve the degraded
+    answer for the whole index generation. No-op outside a cached call.
+    """
+    reasons = _skip_reasons.get()
+    if reasons is not None:
+        reasons.append(reason)
+
+
+def cached_result(kind: str) -> Callable:
+    """
+    Serve a retriever method from `self.result_cache`.
+
+    The key is every bound argument (defaults applied, strings normalized,
+    option dataclasses as dicts), `self.index_generation` and
+    `self.cache_config` (backends, reranker, index profile: settings that
+    change results without changing the index). Nothing is cached when the
+    retriever has no cache or the generation is unknown: unreadable (None)
+    or a legacy index without a recorded generation (""), whose re-index
+    would not invalidate entries.
+    Empty results are not cached, nor results the method marked with
+    `skip_caching`.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, "result_cache", None)
+            generation = self.index_generation if cache is not None else None
+            if not generation or "" in generation.split(","):
+                return func(self, *args, **kwargs)
+
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = {
+                name: _key_value(value)
+                for name, value in list(bound.arguments.items())[1:]
+            }
+            params["config"] = getattr(self, "cache_config", None)
+            key = cache.key(kind, generation, params)
+            results = cache.get(key)
+            if results is None:
+                token = _skip_reasons.set([])
+                try:
+                    results = func(self, *args, **kwargs)
+                    reasons = _skip_reasons.get()
+                finally:
+                    _skip_reasons.reset(token)
+                if results and not reasons:
+                    cache.put(key, results)
+                elif reasons:
+                    logger.debug(f"Not caching {kind} result: {', '.join(reasons)}")
+            return results
+
+        return wrapper
+
+    return decorator
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Process-wide result cache; L2 is Redis at REDIS_URL when
+    DSM5_RESULT_CACHE_REDIS is on.
+    """
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                redis_client = None
+                if AppConfig.DSM5_RESULT_CACHE_REDIS and AppConfig.REDIS_URL:
+                    import redis
+
+                    redis_client = redis.Redis.from_url(
+                        AppConfig.REDIS_URL, socket_timeout=0.05
+                    )
+                _result_cache = ResultCache(
+                    max_size=AppConfig.DSM5_RESULT_CACHE_SIZE,
+                    ttl=AppConfig.DSM5_RESULT_CACHE_TTL,
+                    redis_client=redis_client,
+                )
+    return _result_cache
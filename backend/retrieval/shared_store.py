@@ -0,0 +1,292 @@
+import json
+import os
+import shutil
+import threading
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from retrieval.chunk_store import iter_chunks
+from retrieval.corpus import DocIdTable, DSM5Corpus, with_doc_ids
+from retrieval.vector_index import BinaryVectorIndex, LocalVectorIndex
+from utils import AppConfig, logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, see ensure_shared_store
+    fcntl = None
+
+MANIFEST = "manifest.json"
+# Bumped when the directory layout changes; older stores are rebuilt
+STORE_FORMAT = 2
+
+
+class MappedChunks(Sequence):
+    """
+    Read-only chunk list over a memory-mapped blob of JSON records.
+
+    Chunk i is `blob[offsets[i]:offsets[i + 1]]`, decoded on access, and
+    `ids` is the mapped `DocIdTable`, so a worker holds no Python objects for
+    the corpus, only shared file pages.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, ids: DocIdTable):
+        self.blob = blob
+        self.offsets = offsets
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self.blob[start:end].tobytes())
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for row in range(len(self)):
+            yield self[row]
+
+
+def _stamp(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Identity of a source file; the store is rebuilt when it changes."""
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+class SharedStore:
+    """
+    DSM-5 arrays shared by every worker process through memory-mapped files.
+
+    Directory layout
+    ─────────────────────────────────────────────────────────────────
+    • payloads.npy / offsets.npy:  chunks as UTF-8 JSON records + offsets
+    • id_blob.npy / id_offsets.npy
+      id_keys.npy / id_rows.npy:   doc ids + sorted hash table (DocIdTable)
+    • vectors.npy:                 normalized embedding matrix (if exported)
+    • codes.npy / center.npy:      sign-bit codes for the binary tier
+    • manifest.json:               counts + stamps of the source files
+    ─────────────────────────────────────────────────────────────────
+    `build` writes the directory once (in a temp dir, then renamed);
+    `attach` maps every array read-only. All workers map the same files, so
+    the pages live once in the OS page cache however many workers run;
+    with DSM5_SHARED_DIR on /dev/shm they never touch disk.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def _array(self, name: str) -> Optional[np.ndarray]:
+        if name not in self._arrays:
+            path = os.path.join(self.directory, f"{name}.npy")
+            if not os.path.exists(path):
+                return None
+            self._arrays[name] = np.load(path, mmap_mode="r")
+        return self._arrays[name]
+
+    @classmethod
+    def build(
+        cls,
+        directory: Optional[str] = None,
+        chunks_path: Optional[str] = None,
+        vectors_path: Optional[str] = None,
+    ) -> "SharedStore":
+        directory = directory or AppConfig.DSM5_SHARED_DIR
+        chunks_path = chunks_path or AppConfig.DSM5_CHUNKS_PATH
+        vectors_path = vectors_path or AppConfig.DSM5_VECTORS_PATH
+        tmp = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        records: List[bytes] = []
+
+        def encode_chunks() -> Iterator[str]:
+            for doc_id, chunk in with_doc_ids(iter_chunks(chunks_path)):
+                records.append(json.dumps(chunk, ensure_ascii=False).encode("utf-8"))
+                yield doc_id
+
+        ids = DocIdTable.build(encode_chunks())
+        offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in records], out=offsets[1:])
+        np.save(os.path.join(tmp, "offsets.npy"), offsets)
+        np.save(
+            os.path.join(tmp, "payloads.npy"),
+            np.frombuffer(b"".join(records), dtype=np.uint8),
+        )
+        for name, array in (
+            ("id_blob", ids.blob),
+            ("id_offsets", ids.offsets),
+            ("id_keys", ids.keys),
+            ("id_rows", ids.key_rows),
+        ):
+            np.save(os.path.join(tmp, f"{name}.npy"), array)
+
+        manifest = {
+            "format": STORE_FORMAT,
+            "chunks": len(records),
+            "payload_bytes": int(offsets[-1]),
+            "sources": {"chunks": _stamp(chunks_path), "vectors": _stamp(vectors_path)},
+        }
+        if manifest["sources"]["vectors"]:
+            index = LocalVectorIndex.load(vectors_path)
+            if len(index) != len(records):
+                raise ValueError(
+                    f"{vectors_path} has {len(index)} rows, {chunks_path} "
+                    f"has {len(records)} chunks"
+                )
+            binary = BinaryVectorIndex.from_index(index)
+            np.save(os.path.join(tmp, "vectors.npy"), np.asarray(index.vectors))
+            np.save(os.path.join(tmp, "codes.npy"), binary.codes)
+            np.save(os.path.join(tmp, "center.npy"), binary.center)
+            manifest["dims"] = index.dims
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.rename(tmp, directory)
+        logger.info(
+            f"Built DSM-5 shared store {directory}: {len(records)} chunks, "
+            f"vectors: {'yes' if 'dims' in manifest else 'no'}"
+        )
+        return cls(directory)
+
+    @classmethod
+    def attach(cls, directory: Optional[str] = None) -> "SharedStore":
+        return cls(directory or AppConfig.DSM5_SHARED_DIR)
+
+    def is_current(
+        self, chunks_path: Optional[str] = None, vectors_path: Optional[str] = None
+    ) -> bool:
+        """Whether the source files are unchanged since `build`."""
+        if self.manifest.get("format") != STORE_FORMAT:
+            return False
+        sources = self.manifest.get("sources", {})
+        return sources.get("chunks") == _stamp(
+            chunks_path or AppConfig.DSM5_CHUNKS_PATH
+        ) and sources.get("vectors") == _stamp(
+            vectors_path or AppConfig.DSM5_VECTORS_PATH
+        )
+
+    def corpus(self) -> DSM5Corpus:
+        ids = DocIdTable(
+            self._array("id_blob"),
+            offsets=self._array("id_offsets"),
+            keys=self._array("id_keys"),
+            key_rows=self._array("id_rows"),
+        )
+        return DSM5Corpus(
+            MappedChunks(self._array("payloads"), self._array("offsets"), ids)
+        )
+
+    def vector_index(
+        self, quantization: str = "none", rescore_factor: int = 10
+    ) -> Optional[LocalVectorIndex]:
+        """Mapped vector index, or None if no vectors were exported."""
+        vectors = self._array("vectors")
+        if vectors is None:
+            return None
+        if quantization == "binary":
+            return BinaryVectorIndex(
+                vectors,
+                codes=self._array("codes"),
+                center=np.asarray(self._array("center")),
+                rescore_factor=rescore_factor,
+            )
+        return LocalVectorIndex(vectors)
+
+    @property
+    def nbytes(self) -> Dict[str, int]:
+        """Size of every mapped array, by name."""
+        names = (
+            "payloads",
+            "offsets",
+            "id_blob",
+            "id_offsets",
+            "id_keys",
+            "id_rows",
+            "vectors",
+            "codes",
+            "center",
+        )
+        return {
+            name: int(array.nbytes)
+            for name in names
+            if (array := self._array(name)) is not None
+        }
+
+
+def ensure_shared_store(directory: Optional[str] = None) -> SharedStore:
+    """
+    Attach the shared store, building it first if missing or stale.
+
+    An exclusive file lock makes the first process build while the others
+    wait, so the store is written once however many workers start together.
+    The lock is `fcntl.flock` (Linux / macOS); without fcntl (Windows) builds
+    are not serialized, so build the store before starting the workers
+    (`python -m retrieval.shared_store`).
+    """
+    directory = directory or AppConfig.DSM5_SHARED_DIR
+    os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+    if fcntl is None:
+        logger.warning("fcntl unavailable: shared store build is not locked")
+        return _attach_or_build(directory)
+    with open(f"{directory}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _attach_or_build(directory)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _attach_or_build(directory: str) -> SharedStore:
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        store = SharedStore.attach(directory)
+        if store.is_current():
+            return store
+        logger.info(f"DSM-5 shared store {directory} is stale, rebuilding")
+    return SharedStore.build(directory)
+
+
+_shared_store: Optional[SharedStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_store() -> SharedStore:
+    """Process-wide shared store at DSM5_SHARED_DIR."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = ensure_shared_store()
+    return _shared_store
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Build the DSM-5 shared store before starting the workers"
+    )
+    parser.add_argument("--dir", type=str, default=None, help="DSM5_SHARED_DIR")
+    parser.add_argument("--chunks-path", type=str, default=None)
+    parser.add_argument("--vectors-path", type=str, default=None)
+    args = parser.parse_args(argv)
+    store = SharedStore.build(args.dir, args.chunks_path, args.vectors_path)
+    print(json.dumps({"directory": store.directory, **store.nbytes}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from retrieval.bm25 import BM25Index
+from retrieval.corpus import DSM5Corpus
+from retrieval.fusion import FusionMethod, RankedList
+from retrieval.vector_index import LocalVectorIndex
+
+Payloads = Dict[str, Dict[str, Any]]
+
+
+@dataclass
+class SearchFilter:
+    """
+    Restriction of a search to part of the corpus, in each backend's terms.
+
+    `rows` are the allowed corpus rows (local indexes search only those);
+    `es_clause` is the same restriction as an Elasticsearch filter clause.
+    """
+
+    rows: np.ndarray
+    es_clause: Dict[str, Any]
+
+    def __and__(self, other: "SearchFilter") -> "SearchFilter":
+        return SearchFilter(
+            rows=np.intersect1d(self.rows, other.rows),
+            es_clause={"bool": {"filter": [self.es_clause, other.es_clause]}},
+        )
+
+
+@dataclass
+class SearchRequest:
+    """Everything a retrieval source may need for one hybrid search."""
+
+    query: str
+    size: int = 20
+    num_candidates: Optional[int] = None  # None = index profile policy
+    query_vector: Optional[List[float]] = None
+    # False = two-phase: sources return ids + scores only, payloads of the
+    # fused winners are fetched afterwards in one call
+    with_payloads: bool = True
+    # Corpus subset the kNN sources search (coarse-to-fine, entity filters)
+    vector_filter: Optional[SearchFilter] = None
+    # Corpus subset the keyword sources search (entity filters)
+    keyword_filter: Optional[SearchFilter] = None
+
+
+@dataclass(frozen=True)
+class HybridOptions:
+    """
+    Tuning of one hybrid search. None = AppConfig default, or the planner's
+    choice when `adaptive`; values set here always win over the planner.
+    """
+
+    rrf_k: int = 60
+    keyword_weight: float = 1.0
+    vector_weight: float = 1.2  # slight boost for semantic
+    # Related sections per result (None: no, or the planner decides)
+    include_context: Optional[bool] = None
+    num_candidates: Optional[int] = None  # None = index profile policy
+    fusion_method: FusionMethod = "weighted_rrf"
+    # Multiplier for documents found by >= 2 sources
+    overlap_boost: float = 1.2
+    # Run the retriever's reranker over the top `rerank_depth` after fusion
+    rerank: bool = True
+    rerank_depth: Optional[int] = None  # None = fetch size
+    # Score-only searches, then one payload fetch for the fused winners
+    # (AppConfig.DSM5_TWO_PHASE)
+    two_phase: Optional[bool] = None
+    # kNN only over the chunks of the N chapters closest to the query, 0 = flat
+    # (AppConfig.DSM5_COARSE_SECTIONS); BM25 still searches everything
+    coarse_sections: Optional[int] = None
+    # Restrict kNN and BM25 to the disorder(s) a query names
+    # (AppConfig.DSM5_ENTITY_FILTER)
+    entity_filter: Optional[bool] = None
+    # RetrievalPlanner picks fetch size, num_candidates, context and early
+    # stop from the latency budget (AppConfig.DSM5_ADAPTIVE_PLANNER)
+    adaptive: Optional[bool] = None
+
+    @classmethod
+    def of(
+        cls, options: Optional["HybridOptions"] = None, **overrides: Any
+    ) -> "HybridOptions":
+        """`options` (or the defaults) with keyword overrides applied."""
+        return replace(options or cls(), **overrides)
+
+
+class SearchSource(ABC):
+    """
+    One retriever feeding the hybrid fusion.
+
+    `search` returns a RankedList (ids + raw scores, best first) and the
+    payloads it already has, keyed by doc id. Payloads are passed through by
+    reference and never mutated by the fusion step.
+    Sources with `needs_vector = True` get `request.query_vector` filled in.
+    When `request.with_payloads` is False they return no payloads at all.
+    """
+
+    name: str = "base"
+    weight: float = 1.0
+    needs_vector: bool = False
+
+    @abstractmethod
+    def search(self, request: SearchRequest) -> Tuple[RankedList, Payloads]:
+        """Ranked ids + scores for `request`, and the payloads already at hand."""
+
+    def _from_hits(
+        self, hits: List[Dict[str, Any]], request: SearchRequest
+    ) -> Tuple[RankedList, Payloads]:
+        ranked = RankedList(
+            name=self.name,
+            ids=[hit["_id"] for hit in hits],
+            scores=[hit.get("_score") or 0.0 for hit in hits],
+            weight=self.weight,
+        )
+        if not request.with_payloads:
+            return ranked, {}
+        return ranked, {hit["_id"]: hit.get("_source", {}) for hit in hits}
+
+    def _from_rows(
+        self,
+        corpus: DSM5Corpus,
+        rows: List[int],
+        scores: List[float],
+        request: SearchRequest,
+    ) -> Tuple[RankedList, Payloads]:
+        ids = [corpus.ids[row] for row in rows]
+        ranked = RankedList(name=self.name, ids=ids, scores=scores, weight=self.weight)
+        if not request.with_payloads:
+            return ranked, {}
+        return ranked, {doc_id: corpus.source(row) for doc_id, row in zip(ids, rows)}
+
+
+def _search_body(body: Dict[str, Any], request: SearchRequest) -> Dict[str, Any]:
+    """Drop `_source` from an ES query body for score-only searches."""
+    if not request.with_payloads:
+        body["_source"] = False
+    return body
+
+
+class ElasticsearchKeywordSource(SearchSource):
+    """BM25 multi-match over the DSM-5 index."""
+
+    name: str = "bm25"
+
+    def __init__(self, retriever, weight: float = 1.0):
+        self.retriever = retriever
+        self.weight = weight
+
+    def search(self, request: SearchRequest) -> Tuple[RankedList, Payloads]:
+        body = self.retriever._build_keyword_query(request.query, size=request.size)
+        if request.keyword_filter is not None:
+            body["query"] = {
+                "bool": {
+                    "must": [body["query"]],
+                    "filter": [request.keyword_filter.es_clause],
+                }
+            }
+        response = self.retriever.els_client.search(
+            index=self.retriever.index_name, body=_search_body(body, request)
+        )
+        return self._from_hits(response["hits"]["hits"], request)
+
+
+class ElasticsearchVectorSource(SearchSource):
+    """Dense kNN over the DSM-5 index."""
+
+    name: str = "knn"
+    needs_vector: bool = True
+
+    def __init__(self, retriever, weight: float = 1.2):
+        self.retriever = retriever
+        self.weight = weight
+
+    def search(self, request: SearchRequest) -> Tuple[RankedList, Payloads]:
+        body = self.retriever._build_vector_query(
+            request.query_vector,
+            size=request.size,
+            num_candidates=request.num_candidates,
+        )
+        if request.vector_filter is not None:
+            body["knn"]["filter"] = request.vector_filter.es_clause
+        response = self.retriever.els_client.search(
+            index=self.retriever.index_name, body=_search_body(body, request)
+        )
+        return self._from_hits(response["hits"]["hits"], request)
+
+
+class BM25KeywordSource(SearchSource):
+    """Keyword search served in-process by a BM25Index, no network hop."""
+
+    name: str = "bm25"
+
+    def __init__(self, index: BM25Index, weight: float = 1.0):
+        self.index = index
+        self.weight = weight
+
+    def search(self, request: SearchRequest) -> Tuple[RankedList, Payloads]:
+        rows, scores = self.index.search(
+            request.query,
+            size=request.size,
+            rows=request.keyword_filter.rows if request.keyword_filter else None,
+        )
+        return self._from_rows(
+            self.index.corpus, rows.tolist(), scores.tolist(), request
+        )
+
+
+class LocalVectorSource(SearchSource):
+    """Dense kNN served in-process by a LocalVectorIndex, no network hop."""
+
+    name: str = "knn"
+    needs_vector: bool = True
+
+    def __init__(
+        self, index: LocalVectorIndex, corpus: DSM5Corpus, weight: float = 1.2
+    ):
+        if len(index) != len(corpus):
+            raise ValueError(
+                f"Vector index has {len(index)} rows but corpus has {len(corpus)}"
+            )
+        self.index = index
+        self.corpus = corpus
+        self.weight = weight
+
+    def search(self, request: SearchRequest) -> Tuple[RankedList, Payloads]:
+        rows, scores = self.index.search(
+            request.query_vector,
+            k=request.size,
+            rows=request.vector_filter.rows if request.vector_filter else None,
+        )
+        return self._from_rows(
+            self.corpus, rows[0].tolist(), scores[0].tolist(), request
+        )
+
+
+@dataclass
+class SourceResults:
+    """Ranked lists and merged payloads collected from every source."""
+
+    ranked: List[RankedList] = field(default_factory=list)
+    payloads: Payloads = field(default_factory=dict)
+
+    def add(self, ranked: RankedList, payloads: Payloads) -> None:
+        self.ranked.append(ranked)
+        for doc_id, payload in payloads.items():
+            self.payloads.setdefault(doc_id, payload)
@@ -0,0 +1,133 @@
+import bisect
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from retrieval.corpus import DSM5Corpus, get_corpus
+from retrieval.criteria import normalize_title
+
+
+def _trigrams(key: str) -> set:
+    padded = f" {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleSuggester:
+    """
+    Autocomplete over DSM-5 section titles and parent section titles.
+
+    Keys are ascii-folded, lowercase titles without section numbers.
+    ─────────────────────────────────────────────────────────────────
+    • prefix:  sorted array of every word-start suffix of every key, so
+               "tram cam" finds "roi loan tram cam" with one bisect
+    • typos:   character trigram postings (CSR); a title's fuzzy score is
+               the share of query trigrams it contains
+    ─────────────────────────────────────────────────────────────────
+    Ranking: prefix of the whole title > prefix of a later word > fuzzy,
+    then shorter titles first.
+    """
+
+    def __init__(self, corpus: DSM5Corpus, min_fuzzy: float = 0.5):
+        self.min_fuzzy = min_fuzzy
+        entries: Dict[str, tuple] = {}
+        for chunk in corpus:
+            for title, section_id in (
+                (chunk.get("title"), chunk.get("section_id")),
+                (chunk.get("parent_section_title"), chunk.get("parent_section_id")),
+            ):
+                key = normalize_title(title or "")
+                if key and key not in entries:
+                    entries[key] = (title.strip(), section_id)
+
+        self.keys = list(entries)
+        self.titles = [entries[key][0] for key in self.keys]
+        self.section_ids = [entries[key][1] for key in self.keys]
+
+        suffixes = []
+        for entry, key in enumerate(self.keys):
+            words = key.split(" ")
+            for start in range(len(words)):
+                suffixes.append((" ".join(words[start:]), start > 0, entry))
+        suffixes.sort()
+        self._suffixes = [suffix for suffix, _, _ in suffixes]
+        self._suffix_later = np.array([later for _, later, _ in suffixes], dtype=bool)
+        self._suffix_entry = np.array(
+            [entry for _, _, entry in suffixes], dtype=np.int32
+        )
+
+        grams_per_key = [_trigrams(key) for key in self.keys]
+        self._gram_ids: Dict[str, int] = {}
+        postings: List[List[int]] = []
+        for entry, grams in enumerate(grams_per_key):
+            for gram in grams:
+                gram_id = self._gram_ids.setdefault(gram, len(postings))
+                if gram_id == len(postings):
+                    postings.append([])
+                postings[gram_id].append(entry)
+        self._gram_ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in postings], out=self._gram_ptr[1:])
+        self._gram_entries = np.fromiter(
+            (e for p in postings for e in p), dtype=np.int32, count=self._gram_ptr[-1]
+        )
+        self._lengths = np.array([len(key) for key in self.keys], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _prefix_scores(self, key: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        lo = bisect.bisect_left(self._suffixes, key)
+        hi = bisect.bisect_left(self._suffixes, key + "\uffff", lo)
+        if hi > lo:
+            entries = self._suffix_entry[lo:hi]
+            values = np.where(self._suffix_later[lo:hi], 0.8, 1.0).astype(np.float32)
+            np.maximum.at(scores, entries, values)
+        return scores
+
+    def _fuzzy_scores(self, key: str) -> np.ndarray:
+        grams = [self._gram_ids[g] for g in _trigrams(key) if g in self._gram_ids]
+        total = len(_trigrams(key))
+        if not grams or not total:
+            return np.zeros(len(self), dtype=np.float32)
+        entries = np.concatenate(
+            [
+                self._gram_entries[self._gram_ptr[g] : self._gram_ptr[g + 1]]
+                for g in grams
+            ]
+        )
+        containment = np.bincount(entries, minlength=len(self)) / total
+        return np.where(containment >= self.min_fuzzy, 0.7 * containment, 0.0)
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best matching titles for a partial, unaccented or misspelled query."""
+        key = normalize_title(query)
+        if not key or limit <= 0:
+            return []
+
+        scores = self._prefix_scores(key)
+        scores = np.maximum(scores, self._fuzzy_scores(key).astype(np.float32))
+        matched = np.flatnonzero(scores > 0)
+        order = np.lexsort((self._lengths[matched], -scores[matched]))[:limit]
+        return [
+            {
+                "title": self.titles[entry],
+                "section_id": self.section_ids[entry],
+                "score": round(float(scores[entry]), 3),
+            }
+            for entry in matched[order].tolist()
+        ]
+
+
+_suggester: Optional[TitleSuggester] = None
+_suggester_lock = threading.Lock()
+
+
+def get_title_suggester() -> TitleSuggester:
+    """Process-wide title suggester over the DSM-5 corpus, built on first use."""
+    global _suggester
+    if _suggester is None:
+        with _suggester_lock:
+            if _suggester is None:
+                _suggester = TitleSuggester(get_corpus())
+    return _suggester
@@ -0,0 +1,256 @@
+import os
+import threading
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from utils import AppConfig, logger
+
+
+class LocalVectorIndex:
+    """
+    In-process exact cosine index over the DSM-5 chunk embeddings.
+
+    Row i of the matrix is corpus row i (doc id `DSM5Corpus.ids[i]`), so
+    hits map straight onto `DSM5Corpus`. Vectors are L2-normalized when the
+    file is written, which makes cosine a plain dot product; a batch of
+    queries is one matmul followed by a per-row `argpartition`.
+
+    The matrix is a single `.npy` file opened with `mmap_mode="r"`: pages are
+    shared between worker processes through the OS page cache.
+    """
+
+    def __init__(self, vectors: np.ndarray):
+        if vectors.ndim != 2:
+            raise ValueError(f"Expected a 2-D matrix, got shape {vectors.shape}")
+        self.vectors = vectors
+
+    @classmethod
+    def build(
+        cls, vectors, dtype: Union[str, np.dtype] = np.float32
+    ) -> "LocalVectorIndex":
+        """Normalize raw embeddings into a contiguous matrix of `dtype`."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms > 0, norms, 1.0)
+        return cls(np.ascontiguousarray(matrix, dtype=dtype))
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, mmap: bool = True) -> "LocalVectorIndex":
+        path = path or AppConfig.DSM5_VECTORS_PATH
+        vectors = np.load(path, mmap_mode="r" if mmap else None)
+        logger.info(f"Loaded DSM-5 vectors {vectors.shape} {vectors.dtype} from {path}")
+        return cls(vectors)
+
+    def save(self, path: Optional[str] = None) -> str:
+        path = path or AppConfig.DSM5_VECTORS_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.save(path, np.ascontiguousarray(self.vectors))
+        return path
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dims(self) -> int:
+        return self.vectors.shape[1]
+
+    def _prepare_queries(self, queries) -> np.ndarray:
+        """(n, d) float32 unit-length queries from one query or a batch."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != self.dims:
+            raise ValueError(
+                f"Query has {queries.shape[1]} dims, index has {self.dims}"
+            )
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        return queries / np.where(norms > 0, norms, 1.0)
+
+    def search(
+        self, queries, k: int = 10, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows and cosine scores for one query (d,) or a batch (n, d).
+
+        Returns arrays of shape (n, k), best first; a single query gives n = 1.
+        `rows` restricts the search to a subset of the matrix (a partition
+        picked by a coarse stage, or a metadata filter).
+        """
+        queries = self._prepare_queries(queries)
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        # float16 storage halves memory; it is upcast per call for the matmul
+        scores = queries @ vectors.T.astype(np.float32, copy=False)
+        top, top_scores = _top_k(scores, k)
+        return (top if rows is None else np.asarray(rows)[top]), top_scores
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and values of the k largest scores per row, best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(top, order, axis=1),
+        np.take_along_axis(top_scores, order, axis=1),
+    )
+
+
+# Set bits of every uint16 value (64 KB), for popcount over packed codes.
+# NumPy < 2 has no np.bitwise_count; a 16-bit table needs half the lookups
+# of a per-byte one.
+_POPCOUNT16 = np.array([bin(i).count("1") for i in range(2**16)], dtype=np.uint8)
+
+
+class BinaryVectorIndex(LocalVectorIndex):
+    """
+    Sign-bit quantized tier on top of a LocalVectorIndex.
+
+    ─────────────────────────────────────────────────────────────────
+    • codes:   one bit per dimension (value > per-dimension mean), packed
+               into uint8 → d / 8 bytes per chunk, 32x less than float32
+    • search:  Hamming distance (XOR + 16-bit popcount table) over all
+               codes picks `k * rescore_factor` candidates, which are then
+               rescored exactly against the full-precision vectors
+    ─────────────────────────────────────────────────────────────────
+    Only the codes have to be resident. `vectors` stays memory-mapped, and
+    rescoring reads just the candidate rows from it, so each worker process
+    holds the small code matrix and shares the float pages via the OS cache.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        codes: Optional[np.ndarray] = None,
+        center: Optional[np.ndarray] = None,
+        rescore_factor: int = 10,
+        block_size: int = 4096,
+    ):
+        super().__init__(vectors)
+        self.rescore_factor = rescore_factor
+        if center is None:
+            center = np.zeros(self.dims, dtype=np.float32)
+            for start in range(0, len(vectors), block_size):
+                center += vectors[start : start + block_size].sum(
+                    axis=0, dtype=np.float32
+                )
+            center /= max(len(vectors), 1)
+        self.center = center.astype(np.float32)
+        if codes is None:
+            codes = np.concatenate(
+                [
+                    self.quantize(vectors[start : start + block_size])
+                    for start in range(0, len(vectors), block_size)
+                ]
+                or [self.quantize(np.empty((0, self.dims)))]
+            )
+        self.codes = codes
+
+    @classmethod
+    def from_index(
+        cls, index: LocalVectorIndex, rescore_factor: int = 10
+    ) -> "BinaryVectorIndex":
+        return cls(index.vectors, rescore_factor=rescore_factor)
+
+    @classmethod
+    def load(
+        cls, path: Optional[str] = None, mmap: bool = True, rescore_factor: int = 10
+    ) -> "BinaryVectorIndex":
+        """Quantize a saved matrix block by block; the floats stay mapped."""
+        return cls.from_index(LocalVectorIndex.load(path, mmap), rescore_factor)
+
+    def quantize(self, vectors) -> np.ndarray:
+        """Packed sign bits of (n, d) vectors relative to `center`, uint8."""
+        matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        codes = np.packbits(matrix > self.center, axis=1)
+        if codes.shape[1] % 2:
+            # Even width so the codes can be viewed as uint16
+            codes = np.pad(codes, ((0, 0), (0, 1)))
+        return codes
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the binary tier (codes + center)."""
+        return self.codes.nbytes + self.center.nbytes
+
+    def hamming(
+        self, query_codes: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """(n, len(rows)) Hamming distances between packed query and doc codes."""
+        codes = self.codes if rows is None else self.codes[rows]
+        xor = np.bitwise_xor(
+            query_codes.view(np.uint16)[:, None, :],
+            codes.view(np.uint16)[None, :, :],
+        )
+        return _POPCOUNT16[xor].sum(axis=2, dtype=np.uint16)
+
+    def search(
+        self, queries, k: int = 10, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Hamming candidates, exact cosine rescoring; same contract as the parent."""
+        queries = self._prepare_queries(queries)
+        subset = None if rows is None else np.asarray(rows)
+        rows = np.arange(len(self)) if subset is None else subset
+        k = min(k, len(rows))
+        n_candidates = min(max(k * self.rescore_factor, k), len(rows))
+        if k <= 0:
+            empty = np.empty((queries.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        distances = self.hamming(self.quantize(queries), subset)
+        if n_candidates < len(rows):
+            candidates = np.argpartition(distances, n_candidates - 1, axis=1)
+            candidates = rows[candidates[:, :n_candidates]]
+        else:
+            candidates = np.broadcast_to(rows, distances.shape)
+
+        rows = np.empty((queries.shape[0], k), dtype=np.int64)
+        scores = np.empty((queries.shape[0], k), dtype=np.float32)
+        for i, (query, cand) in enumerate(zip(queries, candidates)):
+            # Sorted rows keep memmap reads sequential
+            cand = np.sort(cand)
+            exact = self.vectors[cand].astype(np.float32, copy=False) @ query
+            top = np.argsort(-exact, kind="stable")[:k]
+            rows[i], scores[i] = cand[top], exact[top]
+        return rows, scores
+
+
+_vector_index: Optional[LocalVectorIndex] = None
+_vector_index_lock = threading.Lock()
+
+
+def get_vector_index() -> LocalVectorIndex:
+    """
+    Process-wide local vector index, memory-mapped on first use.
+
+    With DSM5_VECTOR_QUANTIZATION=binary the binary tier is built on top of
+    the mapped matrix. With DSM5_SHARED_STORE the matrix (and the binary
+    codes) come from the store shared by all workers.
+    """
+    global _vector_index
+    if _vector_index is None:
+        with _vector_index_lock:
+            if _vector_index is None and AppConfig.DSM5_SHARED_STORE:
+                from retrieval.shared_store import get_shared_store
+
+                _vector_index = get_shared_store().vector_index(
+                    AppConfig.DSM5_VECTOR_QUANTIZATION, AppConfig.DSM5_RESCORE_FACTOR
+                )
+                if _vector_index is None:
+                    raise FileNotFoundError(
+                        f"No vectors in the DSM-5 shared store; export them to "
+                        f"{AppConfig.DSM5_VECTORS_PATH} first"
+                    )
+            if _vector_index is None:
+                if AppConfig.DSM5_VECTOR_QUANTIZATION == "binary":
+                    _vector_index = BinaryVectorIndex.load(
+                        rescore_factor=AppConfig.DSM5_RESCORE_FACTOR
+                    )
+                else:
+                    _vector_index = LocalVectorIndex.load()
+    return _vector_index
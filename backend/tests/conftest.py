@@ -147,3 +147,4 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "message: mark test as message test")
     config.addinivalue_line("markers", "dsm5: mark test as DSM-5 tool test")
     config.addinivalue_line("markers", "cypher: mark test as Cypher query test")
+    config.addinivalue_line("markers", "wait_times: mark test as wait time test")
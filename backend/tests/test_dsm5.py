@@ -120,3 +120,13 @@ def test_dsm5_search_response_format(client: TestClient):
         assert isinstance(data, dict)
         assert "query" in data
         assert isinstance(data["query"], str)
+
+
+@pytest.mark.dsm5
+def test_dsm5_hybrid_stream_sends_events(client: TestClient):
+    """Test DSM-5 streaming hybrid search sends SSE events."""
+    response = client.post("/dsm5/hybrid/stream?query=depression&top_k=3")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line for line in response.text.splitlines() if line]
+    assert events and all(line.startswith("data: ") for line in events)
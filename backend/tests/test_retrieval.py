@@ -0,0 +1,1184 @@
+"""Tests for the in-memory DSM-5 retrieval components."""
+
+import numpy as np
+import pytest
+
+from evaluator.bench_utils import exact_top_k, latency_summary, recall_at_k
+from retrieval import (
+    BM25Index,
+    BinaryVectorIndex,
+    BM25KeywordSource,
+    CriteriaIndex,
+    DSM5Corpus,
+    DisorderIndex,
+    ElasticsearchKeywordSource,
+    ElasticsearchVectorSource,
+    HybridOptions,
+    LexicalReranker,
+    LocalVectorIndex,
+    LocalVectorSource,
+    RankedList,
+    ResultCache,
+    RetrievalPlanner,
+    SearchRequest,
+    SectionHierarchy,
+    SectionRouter,
+    SharedStore,
+    TitleSuggester,
+    analyze,
+    dims_index_name,
+    fuse,
+    get_index_profile,
+    get_reranker,
+    load_centroids,
+    normalize_criterion,
+    save_centroids,
+    truncate_embeddings,
+)
+from utils import AppConfig
+
+
+def _chunk(section_id, parent_section_id, title, **extra):
+    return {
+        "section_id": section_id,
+        "parent_section_id": parent_section_id,
+        "title": title,
+        "content": f"{title} content",
+        "metadata": {"page_start": 1},
+        **extra,
+    }
+
+
+@pytest.fixture
+def corpus():
+    """Small corpus with a duplicated section id under two chapters."""
+    return DSM5Corpus(
+        [
+            _chunk("1", None, "1 Chapter one"),
+            _chunk("1.1", "1", "1.1 First"),
+            _chunk("1.1", "1", "1.1 First", sub_title="Tiêu chí B"),
+            _chunk("1.2", "1", "1.2 Second"),
+            _chunk("1.3", "1", "1.3 Third"),
+            _chunk("9.1", "9", "9.1 Orphan chapter child"),
+            _chunk("1.1", "9", "1.1 Duplicate id under chapter nine"),
+        ]
+    )
+
+
+@pytest.mark.dsm5
+def test_hierarchy_parent_and_siblings(corpus):
+    """Context is the parent section followed by siblings."""
+    hierarchy = SectionHierarchy.build(corpus)
+    related = hierarchy.context(corpus.ids[1], max_siblings=2)
+    assert [doc["section_id"] for doc in related] == ["1", "1.2", "1.3"]
+    assert set(related[0]) == {"title", "section_id", "content"}
+
+
+@pytest.mark.dsm5
+def test_hierarchy_groups_chunks_of_a_section(corpus):
+    """Sub-chunks of one section share a node."""
+    hierarchy = SectionHierarchy.build(corpus)
+    node = hierarchy.node(corpus.ids[1])
+    assert hierarchy.node(corpus.ids[2]) == node
+    assert hierarchy.chunks(node).tolist() == [1, 2]
+
+
+@pytest.mark.dsm5
+def test_hierarchy_duplicate_section_ids(corpus):
+    """A repeated section id resolves to the enclosing chapter."""
+    hierarchy = SectionHierarchy.build(corpus)
+    node = hierarchy.node(corpus.ids[6])
+    assert node != hierarchy.node(corpus.ids[1])
+    assert hierarchy.section_ids[hierarchy.parent[node]] == "9"
+    siblings = [hierarchy.section_ids[s] for s in hierarchy.siblings(node)]
+    assert siblings == ["9.1"]
+
+
+@pytest.mark.dsm5
+def test_hierarchy_unknown_doc(corpus):
+    """Unknown doc ids have no context."""
+    hierarchy = SectionHierarchy.build(corpus)
+    assert hierarchy.context("does-not-exist") == []
+
+
+@pytest.mark.dsm5
+def test_fuse_matches_weighted_rrf_with_overlap_boost():
+    """Two-list weighted RRF with a 1.2x bonus for docs in both lists."""
+    keyword = RankedList("bm25", ["a", "b", "c"], weight=1.0)
+    vector = RankedList("knn", ["c", "d"], weight=1.2)
+    hits = fuse([keyword, vector], k=60, top_k=4, overlap_boost=1.2)
+
+    expected = {
+        "a": 1.0 / 61,
+        "b": 1.0 / 62,
+        "c": (1.0 / 63 + 1.2 / 61) * 1.2,
+        "d": 1.2 / 62,
+    }
+    assert [h.doc_id for h in hits] == sorted(expected, key=expected.get, reverse=True)
+    for hit in hits:
+        assert hit.score == pytest.approx(expected[hit.doc_id])
+    assert hits[0].ranks == {"bm25": 3, "knn": 1}
+
+
+@pytest.mark.dsm5
+def test_fuse_n_lists_and_top_k():
+    """Any number of lists; ties keep first-seen order."""
+    lists = [RankedList(f"r{i}", ["x", "y", "z"]) for i in range(3)]
+    lists.append(RankedList("r3", ["w"]))
+    hits = fuse(lists, method="rrf", top_k=2)
+    assert [h.doc_id for h in hits] == ["x", "y"]
+    assert len(hits[0].ranks) == 3
+    assert fuse([], top_k=5) == []
+
+
+@pytest.mark.dsm5
+def test_fuse_score_normalization():
+    """Score fusion min-max normalizes each list before weighting."""
+    bm25 = RankedList("bm25", ["a", "b"], scores=[20.0, 10.0])
+    knn = RankedList("knn", ["b", "a"], scores=[0.9, 0.7], weight=3.0)
+    hits = fuse([bm25, knn], method="score", top_k=2)
+    assert [h.doc_id for h in hits] == ["b", "a"]
+    assert hits[0].score == pytest.approx(3.0)
+    assert hits[0].scores == {"bm25": 10.0, "knn": 0.9}
+
+    with pytest.raises(ValueError):
+        fuse([bm25], method="unknown")
+
+
+@pytest.mark.dsm5
+def test_index_profiles_mapping_and_candidates():
+    """Quantized profiles map to their HNSW type and widen num_candidates."""
+    float_profile = get_index_profile("float")
+    int8 = get_index_profile("int8", m=32)
+    assert int8.mapping(768)["index_options"] == {
+        "type": "int8_hnsw",
+        "m": 32,
+        "ef_construction": 100,
+    }
+    assert float_profile.num_candidates(30) == 100
+    assert int8.num_candidates(30) > float_profile.num_candidates(30)
+    assert get_index_profile("bbq").num_candidates(5000) == 10000
+    assert int8.is_supported("8.13.0")
+    assert not get_index_profile("int4").is_supported("8.13.4")
+    with pytest.raises(ValueError):
+        get_index_profile("fp64")
+
+
+@pytest.mark.dsm5
+def test_benchmark_exact_top_k_and_recall():
+    """Brute-force ground truth ranks a vector's own row first."""
+    rng = np.random.default_rng(0)
+    corpus = rng.normal(size=(50, 16)).astype(np.float32)
+    truth = exact_top_k(corpus, corpus[[3, 7]], k=5)
+    assert truth[:, 0].tolist() == [3, 7]
+    assert recall_at_k([[3, 1], [9, 9]], [[3, 1], [7, 8]]) == pytest.approx(0.5)
+    assert latency_summary([1.0, 2.0, 3.0])["p50_ms"] == 2.0
+
+
+@pytest.mark.dsm5
+def test_matryoshka_truncation_and_dims_benchmark():
+    """Truncated embeddings are unit length; full size has perfect recall."""
+    from evaluator.benchmark_dims import benchmark_dims_local
+
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(60, 32)).astype(np.float32)
+    short = truncate_embeddings(vectors, 8)
+    assert short.shape == (60, 8)
+    assert np.allclose(np.linalg.norm(short, axis=1), 1.0)
+    assert np.allclose(short[0], vectors[0, :8] / np.linalg.norm(vectors[0, :8]))
+    with pytest.raises(ValueError):
+        truncate_embeddings(vectors, 64)
+    assert dims_index_name(768, base="dsm5") == "dsm5"
+    assert dims_index_name(256, base="dsm5") == "dsm5-d256"
+
+    rows = benchmark_dims_local(vectors, vectors[:10] + 0.01, [8, 32], k=5)
+    assert [row["dims"] for row in rows] == [8, 32]
+    assert rows[1]["recall@5"] == 1.0
+    assert rows[0]["size_mb"] < rows[1]["size_mb"]
+
+
+@pytest.mark.dsm5
+def test_local_vector_index_matches_brute_force(tmp_path):
+    """Memory-mapped index returns the exact cosine top-k, float16 included."""
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(40, 8)).astype(np.float32)
+    queries = vectors[[5, 12]] + 0.01
+    expected = exact_top_k(vectors, queries, k=4)
+
+    path = LocalVectorIndex.build(vectors).save(str(tmp_path / "vectors.npy"))
+    index = LocalVectorIndex.load(path)
+    assert isinstance(index.vectors, np.memmap)
+    rows, scores = index.search(queries, k=4)
+    assert rows.tolist() == expected.tolist()
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+    half = LocalVectorIndex.build(vectors, dtype=np.float16)
+    assert half.search(queries[0], k=1)[0].tolist() == [[5]]
+
+
+@pytest.mark.dsm5
+def test_local_vector_source_payloads(corpus):
+    """Local kNN hits carry corpus payloads under the corpus doc ids."""
+    vectors = np.eye(len(corpus), 4, dtype=np.float32) + 0.01
+    source = LocalVectorSource(LocalVectorIndex.build(vectors), corpus)
+    ranked, payloads = source.search(
+        SearchRequest(query="q", size=2, query_vector=[0, 0, 1, 0])
+    )
+    assert ranked.ids[0] == corpus.ids[2]
+    assert payloads[corpus.ids[2]]["sub_title"] == "Tiêu chí B"
+    with pytest.raises(ValueError):
+        LocalVectorSource(LocalVectorIndex.build(vectors[:3]), corpus)
+
+
+@pytest.mark.dsm5
+def test_bm25_analyzer_folds_vietnamese():
+    """lowercase + asciifolding, section numbers and ICD codes stay whole."""
+    assert analyze("Rối Loạn ĐAU, mã F80.0 mục 1.2.3") == [
+        "roi",
+        "loan",
+        "dau",
+        "ma",
+        "f80.0",
+        "muc",
+        "1.2.3",
+    ]
+
+
+@pytest.mark.dsm5
+def test_bm25_field_boost_and_phrase():
+    """Title hits outrank content hits; phrase slop is respected."""
+    chunks = DSM5Corpus(
+        [
+            _chunk("1", None, "Rối loạn trầm cảm"),
+            {"section_id": "2", "title": "Khác", "content": "trầm cảm kéo dài"},
+            {"section_id": "3", "title": "Khác", "content": "trầm uất và cảm xúc"},
+            {"section_id": "4", "title": "Khác", "content": "không liên quan"},
+        ]
+    )
+    index = BM25Index(chunks)
+    rows, scores = index.search("roi loan tram cam", size=10)
+    assert rows[0] == 0
+    assert 3 not in rows.tolist()
+    assert np.all(np.diff(scores) <= 0)
+
+    terms = index._term_ids("trầm cảm")
+    exact = index.phrase("content", terms, slop=0)
+    assert exact[1] > 0 and exact[2] == 0
+    assert index.phrase("content", terms, slop=2)[2] > 0
+
+    source = BM25KeywordSource(index)
+    ranked, payloads = source.search(SearchRequest(query="trầm cảm", size=2))
+    assert ranked.ids[0] in payloads and len(ranked) == 2
+
+
+def _result(doc_id, title, content):
+    return {"id": doc_id, "title": title, "content": content, "scores": {}}
+
+
+@pytest.mark.dsm5
+def test_lexical_reranker_promotes_title_match():
+    """A chunk titled with the query beats an off-topic chunk ranked first."""
+    reranker = LexicalReranker()
+    candidates = [
+        _result("0", "Rối loạn lo âu", "lo âu lan tỏa"),
+        _result("1", "Rối loạn trầm cảm", "trầm cảm chủ yếu"),
+    ]
+    reranked = reranker.rerank("rối loạn trầm cảm", candidates, top_k=1)
+    assert [r["id"] for r in reranked] == ["1"]
+    assert "rerank" in reranked[0]["scores"]
+
+
+@pytest.mark.dsm5
+def test_reranker_caches_scores_and_uses_vectors(corpus):
+    """(query, doc) scores are memoized; cached vectors add a cosine feature."""
+    vectors = np.eye(len(corpus), 4, dtype=np.float32)
+    reranker = LexicalReranker(
+        vector_index=LocalVectorIndex.build(vectors), corpus=corpus
+    )
+    calls = []
+    score_batch = reranker.score_batch
+
+    def counting(query, candidates, query_vector=None):
+        calls.append(len(candidates))
+        return score_batch(query, candidates, query_vector=query_vector)
+
+    reranker.score_batch = counting
+    candidates = [_result(corpus.ids[i], "x", "y") for i in range(3)]
+    first = reranker.rerank("q", candidates, query_vector=[0, 0, 1, 0])
+    assert first[0]["id"] == corpus.ids[2]
+    more = candidates + [_result(corpus.ids[3], "x", "y")]
+    reranker.rerank("q", more, query_vector=[0, 0, 1, 0])
+    assert calls == [3, 1]
+    # Lexical-only scores are cached apart from the ones with a vector
+    reranker.rerank("q", more)
+    assert calls == [3, 1, 4]
+    assert get_reranker("none") is None
+    with pytest.raises(ValueError):
+        get_reranker("cross-encoder")
+
+
+@pytest.mark.dsm5
+def test_extension_points_are_abstract():
+    """Rerankers, search sources and embedding providers must implement."""
+    from process_data.embedding_pipeline import EmbeddingProvider
+    from retrieval import Reranker, SearchSource
+
+    for base, args in ((Reranker, ()), (SearchSource, ()), (EmbeddingProvider, (4,))):
+        with pytest.raises(TypeError):
+            base(*args)
+
+
+class _FakeES:
+    """Records search bodies; returns fixed ids with or without _source."""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.bodies, self.mget_calls, self.mget_sources = [], [], []
+        self.generation = "g1"
+
+    def search(self, index, body):
+        self.bodies.append(body)
+        rows = [3, 1] if "knn" in body else [1, 2, 4]
+        hits = []
+        for row in rows:
+            hit = {"_id": self.corpus.ids[row], "_score": 1.0}
+            if body.get("_source") is not False:
+                hit["_source"] = self.corpus.source(row)
+            hits.append(hit)
+        return {"hits": {"hits": hits}}
+
+    @property
+    def indices(self):
+        return self
+
+    def get_mapping(self, index):
+        return {
+            index: {
+                "mappings": {
+                    "_meta": {"embedding_dims": 4, "index_generation": self.generation},
+                    "properties": {
+                        "disorder_key": {"type": "keyword"},
+                        "chapter_id": {"type": "keyword"},
+                    },
+                }
+            }
+        }
+
+    def mget(self, index, ids, source):
+        self.mget_calls.append(ids)
+        self.mget_sources.append(source)
+        return {
+            "docs": [
+                {
+                    "_id": i,
+                    "found": True,
+                    "_source": self.corpus.source(self.corpus.row(i), source),
+                }
+                for i in ids
+            ]
+        }
+
+
+@pytest.fixture
+def es_retriever(corpus):
+    from chains.healthcare_chain import HealthcareRetriever
+
+    retriever = HealthcareRetriever.__new__(HealthcareRetriever)
+    retriever.index_name = "test"
+    retriever.els_client = _FakeES(corpus)
+    retriever.index_profile = get_index_profile("float")
+    retriever._vector_size, retriever._vector_size_fallback_at = None, 0.0
+    retriever._disorder_index, retriever._disorder_index_failed = None, True
+    retriever._filter_fields = {}
+    retriever._hierarchy, retriever._hierarchy_failed = None, True
+    retriever.sources = [
+        ElasticsearchKeywordSource(retriever),
+        ElasticsearchVectorSource(retriever),
+    ]
+    retriever.reranker = None
+    retriever.planner = RetrievalPlanner()
+    retriever.result_cache = None
+    retriever._generation, retriever._generation_checked = None, 0.0
+    retriever.two_phase, retriever.payload_store = True, "elasticsearch"
+    retriever._get_embedding = lambda text: [0.0] * 4
+    return retriever
+
+
+@pytest.mark.dsm5
+def test_binary_vector_index_rescoring():
+    """Hamming candidates + exact rescoring recover the float top-k."""
+    from evaluator.benchmark_knn import benchmark_offline
+
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(8, 64))
+    vectors = centers[rng.integers(0, 8, 300)] + 0.5 * rng.normal(size=(300, 64))
+    index = BinaryVectorIndex.from_index(LocalVectorIndex.build(vectors))
+    assert index.codes.shape == (300, 8)
+    assert index.vectors.nbytes == 32 * index.codes.nbytes
+
+    queries = vectors[:20] + 0.01
+    rows, scores = index.search(queries, k=5)
+    assert rows.tolist() == exact_top_k(vectors, queries, k=5).tolist()
+    assert np.all(np.diff(scores, axis=1) <= 0)
+    odd = BinaryVectorIndex.from_index(LocalVectorIndex.build(vectors[:, :9]))
+    assert odd.codes.shape == (300, 2)
+    assert odd.search(vectors[0, :9], k=3)[0][0, 0] == 0
+
+    results = benchmark_offline(vectors, k=5, n_queries=20, rescore_factors=[10])
+    assert results[-1]["within_tolerance"]
+
+
+@pytest.mark.dsm5
+def test_query_dims_come_from_index_metadata(es_retriever, corpus, monkeypatch):
+    """The retriever embeds queries at the size recorded in the index."""
+    assert es_retriever.vector_size == 4
+    es_retriever._vector_size = None
+    vectors = LocalVectorIndex.build(np.eye(len(corpus), 6))
+    es_retriever.sources[1] = LocalVectorSource(vectors, corpus)
+    assert es_retriever.vector_size == 6
+
+    # No dims anywhere: the VECTOR_SIZE fallback is cached until the refresh
+    es_retriever._vector_size = None
+    es_retriever.sources = es_retriever.sources[:1]
+    es = es_retriever.els_client
+    mapping = es.get_mapping
+    calls = []
+
+    def without_dims(index):
+        calls.append(index)
+        body = mapping(index)
+        body[index]["mappings"]["_meta"].pop("embedding_dims")
+        return body
+
+    es.get_mapping = without_dims
+    monkeypatch.setattr(AppConfig, "DSM5_GENERATION_REFRESH_S", 3600)
+    assert es_retriever.vector_size == AppConfig.VECTOR_SIZE
+    assert es_retriever.vector_size == AppConfig.VECTOR_SIZE
+    assert len(calls) == 1
+    es.get_mapping = mapping
+    monkeypatch.setattr(AppConfig, "DSM5_GENERATION_REFRESH_S", 0)
+    assert es_retriever.vector_size == 4
+
+
+@pytest.mark.dsm5
+def test_two_phase_search_fetches_only_winners(es_retriever):
+    """Score-only searches, then one mget for the fused top_k."""
+    results = es_retriever.hybrid_search("q", top_k=2)
+    es = es_retriever.els_client
+    assert all(body["_source"] is False for body in es.bodies)
+    assert es.mget_calls == [[r["id"] for r in results]]
+    assert results[0]["id"] == es.corpus.ids[1] and results[0]["title"] == "1.1 First"
+
+    single = es_retriever.hybrid_search("q", top_k=2, two_phase=False)
+    assert [r["title"] for r in single] == [r["title"] for r in results]
+    assert len(es.mget_calls) == 1
+
+
+@pytest.mark.dsm5
+def test_rerank_pool_fetches_light_fields_then_final_payloads(es_retriever, corpus):
+    """The rerank pool gets titles only; full payloads only for the top_k."""
+    from retrieval.corpus import SOURCE_FIELDS
+
+    es = es_retriever.els_client
+    es_retriever.reranker = LexicalReranker(corpus=corpus)
+    results = es_retriever.hybrid_search("Second", top_k=1, rerank_depth=4)
+    assert len(es.mget_calls) == 2 and len(es.mget_calls[0]) == 4
+    assert es.mget_sources == [list(es_retriever.reranker.fields), list(SOURCE_FIELDS)]
+    assert "content" not in es_retriever.reranker.fields
+    assert es.mget_calls[1] == [results[0]["id"]]
+    assert (
+        results[0]["content"] == corpus.chunks[corpus.row(results[0]["id"])]["content"]
+    )
+
+
+@pytest.mark.dsm5
+def test_coarse_to_fine_routes_knn_to_best_chapter(es_retriever, corpus, tmp_path):
+    """Centroids pick a chapter; kNN then searches only its chunks."""
+    vectors = np.array([[1, 0.1 * i, 0, 0] for i in range(5)] + [[0, 0, 1, 0.1]] * 2)
+    index = LocalVectorIndex.build(vectors)
+    router = SectionRouter(SectionHierarchy.build(corpus), index)
+    assert router.section_ids == ["1", "9"]
+
+    routed = router.route([0, 0, 1, 0], n_sections=1)
+    assert routed.rows.tolist() == [5, 6]
+    assert routed.es_clause == {"terms": {"chapter_id": ["9"]}}
+    assert router.route([0, 0, 1, 0], n_sections=2) is None
+    rows, _ = index.search([1, 0, 0, 0], k=3, rows=routed.rows)
+    assert set(rows[0].tolist()) == {5, 6}
+
+    # Without exported vectors: same routing from the saved centroid file
+    path = save_centroids(
+        str(tmp_path / "centroids.npz"), router.section_ids, router.centroids
+    )
+    from_file = SectionRouter(
+        SectionHierarchy.build(corpus), centroids=load_centroids(path)
+    )
+    assert from_file.route([0, 0, 1, 0], n_sections=1).rows.tolist() == [5, 6]
+
+    es_retriever._section_router, es_retriever._section_router_failed = router, False
+    es_retriever._get_embedding = lambda text: [0.0, 0.0, 1.0, 0.0]
+    es_retriever.hybrid_search("q", top_k=2, coarse_sections=1)
+    knn_body = next(body for body in es_retriever.els_client.bodies if "knn" in body)
+    assert knn_body["knn"]["filter"] == routed.es_clause
+
+
+@pytest.fixture
+def criteria_corpus():
+    title = "4.2 Rối loạn trầm cảm chủ yếu (Major Depressive Disorder)"
+    return DSM5Corpus(
+        [
+            _chunk("4.2", "4", title),
+            _chunk("4.2", "4", title, sub_id="criteria_A_p1", sub_title="Tiêu chí A"),
+            _chunk("4.2", "4", title, sub_id="criteria_A_p2", sub_title="Tiêu chí A"),
+            _chunk("4.2", "4", title, sub_id="criteria_B", sub_title="Tiêu chí B"),
+        ]
+    )
+
+
+@pytest.mark.dsm5
+def test_criteria_index_lookup(criteria_corpus):
+    """Folded, English and fuzzy disorder names resolve to criterion chunks."""
+    index = CriteriaIndex(criteria_corpus)
+    assert index.lookup("roi loan tram cam chu yeu", "A") == [(1, 1.0), (2, 1.0)]
+    assert [row for row, _ in index.lookup("Major Depressive Disorder")] == [1, 2, 3]
+    assert [
+        row for row, _ in index.lookup("Rối loạn trầm cảm chủ yéu", "Tiêu chí B")
+    ] == [3]
+    assert index.lookup("Major Depressive Disorder", "depressed mood") == []
+    assert index.lookup("Rối loạn ăn uống") == []
+    assert normalize_criterion("criteria_C_p2") == "C"
+
+
+@pytest.mark.dsm5
+def test_search_by_criteria_uses_index_then_es(es_retriever, criteria_corpus):
+    """Index hits skip Elasticsearch; misses fall back to it."""
+    es_retriever._criteria_index = CriteriaIndex(criteria_corpus)
+    es_retriever._criteria_index_failed = False
+    results = es_retriever.search_by_criteria("Major Depressive Disorder", "B")
+    assert [r["sub_title"] for r in results] == ["Tiêu chí B"]
+    assert es_retriever.els_client.bodies == []
+
+    es_retriever.search_by_criteria("Unknown disorder")
+    assert len(es_retriever.els_client.bodies) == 1
+
+
+@pytest.mark.dsm5
+def test_title_suggester_prefix_and_typos():
+    """Whole-title prefix beats later-word prefix; typos still match."""
+    suggester = TitleSuggester(
+        DSM5Corpus(
+            [
+                _chunk(
+                    "4.2",
+                    "4",
+                    "4.2 Rối loạn trầm cảm chủ yếu",
+                    parent_section_title="4 RỐI LOẠN TRẦM CẢM",
+                ),
+                _chunk("3.1.3", "3", "3.1.3 Giai đoạn trầm cảm chủ yếu"),
+                _chunk("5.5", "5", "5.5 Rối loạn hoảng sợ (Panic Disorder)"),
+            ]
+        )
+    )
+    assert len(suggester) == 4
+    titles = [s["title"] for s in suggester.suggest("roi loan tr")][:2]
+    assert titles == ["4 RỐI LOẠN TRẦM CẢM", "4.2 Rối loạn trầm cảm chủ yếu"]
+    hits = suggester.suggest("tram cam", limit=1)
+    assert hits[0]["score"] == 0.8
+    assert suggester.suggest("panic")[0]["section_id"] == "5.5"
+    assert suggester.suggest("roi lon hoang so")[0]["section_id"] == "5.5"
+    assert suggester.suggest("xyz") == []
+
+
+@pytest.mark.dsm5
+def test_disorder_detection_filters_knn_and_bm25(es_retriever):
+    """A named disorder becomes a terms filter on both searches."""
+    corpus = DSM5Corpus(
+        [
+            _chunk("4", None, "4 RỐI LOẠN TRẦM CẢM"),
+            _chunk(
+                "4.2", "4", "4.2 Rối loạn trầm cảm chủ yếu (Major Depressive Disorder)"
+            ),
+            _chunk(
+                "4.2", "4", "4.2 Rối loạn trầm cảm chủ yếu (Major Depressive Disorder)"
+            ),
+            _chunk("4.4", "4", "4.4 Rối loạn cảm xúc tiền kinh nguyệt"),
+            _chunk("5.5", "5", "5.5 Rối loạn hoảng sợ (Panic Disorder)"),
+        ]
+    )
+    index = DisorderIndex(corpus)
+    assert index.row_keys[1] == ["roi loan tram cam chu yeu", "roi loan tram cam"]
+    assert index.detect("Rối loạn trầm cảm chủ yếu kéo dài bao lâu?") == [
+        "roi loan tram cam chu yeu"
+    ]
+    assert index.detect("major depressive disorder và panic disorder") == [
+        "roi loan tram cam chu yeu",
+        "roi loan hoang so",
+    ]
+    assert index.filter(index.detect("các rối loạn trầm cảm")).rows.tolist() == [
+        0,
+        1,
+        2,
+        3,
+    ]
+    assert index.detect("hôm nay trời sáng") == []
+
+    es_retriever._disorder_index, es_retriever._disorder_index_failed = index, False
+    es_retriever.hybrid_search("rối loạn hoảng sợ là gì", top_k=2, entity_filter=True)
+    clause = {"terms": {"disorder_key": ["roi loan hoang so"]}}
+    keyword, knn = es_retriever.els_client.bodies
+    assert keyword["query"]["bool"]["filter"] == [clause]
+    assert knn["knn"]["filter"] == clause
+
+    rows, _ = BM25Index(corpus).search(
+        "rối loạn", rows=index.postings["roi loan hoang so"]
+    )
+    assert rows.tolist() == [4]
+
+    # Off by default: a query naming panic disorder but asking about
+    # depression must still reach the depression chunks
+    query = "rối loạn hoảng sợ có kèm trầm cảm chủ yếu không"
+    assert index.detect(query) == ["roi loan hoang so"]
+    es_retriever.els_client.bodies.clear()
+    es_retriever.hybrid_search(query, top_k=2)
+    keyword, knn = es_retriever.els_client.bodies
+    assert "filter" not in keyword["query"]["bool"] and "filter" not in knn["knn"]
+    rows, _ = BM25Index(corpus).search(query)
+    assert {0, 4} <= set(rows.tolist())
+
+
+@pytest.mark.dsm5
+def test_planner_budget_policy_and_early_stop(es_retriever):
+    """Pressure shrinks the fetch; a bare disorder name stops after BM25."""
+    planner = RetrievalPlanner(budget_ms=100)
+    profile = get_index_profile("float")
+    relaxed = planner.plan("q", top_k=5, include_context=True, profile=profile)
+    assert (relaxed.fetch_size, relaxed.early_stop) == (15, False)
+
+    # One cold request is not enough to act on
+    planner.tracker.observe("knn", 300)
+    cold = planner.plan("q", 5, True, profile, es_stages=["knn"])
+    assert not cold.early_stop and not cold.signals["warm"]
+    for _ in range(4):
+        planner.tracker.observe("knn", 300)
+    loaded = planner.plan(
+        "q", 5, True, profile, es_stages=["knn"], context_in_memory=False
+    )
+    assert loaded.fetch_size == 10 and loaded.early_stop
+    assert loaded.num_candidates == relaxed.num_candidates // 2
+    assert not loaded.include_context and loaded.signals["pressure"] == 3.0
+
+    # Periodic probes keep observing the stage that early stop skips
+    planner.probe_every = 3
+    stops = [
+        planner.plan("q", 5, False, profile, es_stages=["knn"]).early_stop
+        for _ in range(6)
+    ]
+    assert stops == [True, False, True, True, False, True]
+
+    pure = planner.plan(
+        "Rối loạn hoảng sợ", 5, False, profile, disorders=["roi loan hoang so"]
+    )
+    assert pure.fetch_size == 5 and pure.signals["pure_disorder"]
+    assert planner.clear_winner([3.0, 1.0]) and not planner.clear_winner([3.0, 2.5])
+
+    corpus = DSM5Corpus(
+        [_chunk("5.5", "5", "5.5 Rối loạn hoảng sợ (Panic Disorder)")] * 5
+    )
+    index = DisorderIndex(corpus)
+    es_retriever._disorder_index, es_retriever._disorder_index_failed = index, False
+    es = es_retriever.els_client
+    search = es.search
+
+    def ranked_search(index, body):
+        response = search(index, body)
+        for rank, hit in enumerate(response["hits"]["hits"]):
+            hit["_score"] = 4.0 / (rank + 1) ** 2
+        return response
+
+    es.search = ranked_search
+    es_retriever._get_embedding = lambda text: pytest.fail("kNN should be skipped")
+    results = es_retriever.hybrid_search(
+        "Rối loạn hoảng sợ", top_k=2, entity_filter=True, adaptive=True
+    )
+    assert len(es.bodies) == 1 and "knn" not in es.bodies[0]
+    assert [r["id"] for r in results] == es.corpus.ids[1:3]
+    assert set(es_retriever.planner.tracker.snapshot()) == {"bm25"}
+
+    es.bodies.clear()
+    es_retriever._get_embedding = lambda text: [0.0] * 4
+    es_retriever.hybrid_search("Rối loạn hoảng sợ", top_k=2, adaptive=False)
+    assert len(es.bodies) == 2
+
+    # Under load the planner drops context unless the caller asked for it
+    for _ in range(5):
+        es_retriever.planner.tracker.observe("bm25", 1e4)
+    for include_context, expected in [(None, False), (True, True)]:
+        stages = [
+            event["stage"]
+            for event in es_retriever.hybrid_search_stream(
+                "q", top_k=2, include_context=include_context, adaptive=True
+            )
+        ]
+        assert ("context" in stages) is expected
+
+
+@pytest.mark.dsm5
+def test_check_doc_ids_rejects_legacy_index(es_retriever):
+    """An index with positional ids (pre content-hash) refuses to start."""
+    from retrieval import is_chunk_doc_id
+
+    assert is_chunk_doc_id(es_retriever.els_client.corpus.ids[0])
+    assert is_chunk_doc_id("5.5-0123456789abcdef~2")
+    assert not is_chunk_doc_id("17")
+    es_retriever.check_doc_ids()
+
+    es_retriever.els_client.search = lambda index, body: {
+        "hits": {"hits": [{"_id": "17", "_score": 1.0}]}
+    }
+    with pytest.raises(RuntimeError, match="legacy doc ids"):
+        es_retriever.check_doc_ids()
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode("utf-8")
+
+
+@pytest.mark.dsm5
+def test_result_cache_tiers_and_generation(es_retriever, monkeypatch):
+    """Repeat searches skip ES; a new index generation invalidates them."""
+    redis = _FakeRedis()
+    cache = ResultCache(max_size=1, redis_client=redis)
+    cache.put("hybrid:a", [{"score": np.float32(0.5)}])
+    cache.put("hybrid:b", [1])
+    assert len(cache) == 1 and cache.get("hybrid:a") == [{"score": 0.5}]
+    assert cache.get("hybrid:missing") is None
+    assert cache.stats()["l2_hits"] == 1 and cache.stats()["misses"] == 1
+
+    monkeypatch.setattr(AppConfig, "DSM5_GENERATION_REFRESH_S", 0)
+    es_retriever.result_cache = ResultCache(redis_client=redis)
+    es = es_retriever.els_client
+    first = es_retriever.hybrid_search("Rối loạn  HOẢNG sợ", top_k=2)
+    calls = len(es.bodies)
+    first[0]["title"] = "mutated"
+    again = es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2)
+    assert len(es.bodies) == calls and again[0]["title"] == "1.1 First"
+    es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=3)
+    assert len(es.bodies) == 2 * calls
+
+    es.generation = "g2"
+    es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2)
+    assert len(es.bodies) == 3 * calls
+    assert es_retriever.result_cache.stats()["l1_hits"] == 1
+
+    # Another reranker or backend changes the key, not the generation
+    es_retriever.reranker = LexicalReranker()
+    es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2)
+    assert len(es.bodies) == 4 * calls
+    es_retriever.sources = es_retriever.sources[:1]
+    es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2)
+    assert len(es.bodies) == 4 * calls + 1
+
+    # Legacy index without a recorded generation: never cached
+    es.generation = ""
+    for _ in range(2):
+        es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2)
+    assert len(es.bodies) == 4 * calls + 3
+
+    # A plan degraded under load (smaller fetch) is not cached either
+    es.generation = "g3"
+    for _ in range(5):
+        es_retriever.planner.tracker.observe("bm25", 1e4)
+    cached = len(es_retriever.result_cache)
+    for n in range(1, 3):
+        es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2, adaptive=True)
+        assert len(es.bodies) == 4 * calls + 3 + n
+    assert len(es_retriever.result_cache) == cached
+    es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2, adaptive=False)
+    assert len(es_retriever.result_cache) == cached + 1
+
+    # An options object and the same keyword overrides share one entry
+    options = HybridOptions(two_phase=False, rrf_k=30)
+    es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2, options=options)
+    assert len(es_retriever.result_cache) == cached + 2
+    es_retriever.hybrid_search("rối loạn hoảng sợ", top_k=2, two_phase=False, rrf_k=30)
+    assert len(es_retriever.result_cache) == cached + 2
+    assert HybridOptions.of(options, rrf_k=60) == HybridOptions(two_phase=False)
+
+
+@pytest.mark.dsm5
+def test_embedding_and_search_failures_are_logged_apart(es_retriever):
+    """An embedding API error is not reported as an Elasticsearch failure."""
+    from utils import logger
+
+    messages = []
+    handler = logger.add(lambda message: messages.append(message.record["message"]))
+    try:
+
+        def broken(*args, **kwargs):
+            raise ConnectionError("down")
+
+        es_retriever._get_embedding = broken
+        with pytest.raises(ConnectionError):
+            es_retriever.hybrid_search("q", top_k=2)
+        assert "Query embedding failed: down" in messages
+        assert not any("search failed" in m for m in messages)
+
+        es_retriever.els_client.search = broken
+        with pytest.raises(ConnectionError):
+            es_retriever.hybrid_search("q", top_k=2)
+        assert "Elasticsearch bm25 search failed: down" in messages
+    finally:
+        logger.remove(handler)
+
+
+def _profile_node(kind, nanos, children=()):
+    return {
+        "type": kind,
+        "time_in_nanos": nanos,
+        "breakdown": {"score": nanos // 2, "score_count": 3},
+        "children": list(children),
+    }
+
+
+@pytest.mark.dsm5
+def test_profile_aggregates_clauses_and_phases(es_retriever):
+    """Profile trees become per-clause / per-phase percentile rows."""
+    from chains.healthcare_chain import HealthcareRetriever
+    from retrieval import clause_names
+
+    body = HealthcareRetriever._build_keyword_query(es_retriever, "q")
+    names = clause_names(body)
+    assert names == [
+        "multi_match:best_fields",
+        "multi_match:phrase",
+        "match:parent_section_title",
+    ]
+
+    es = es_retriever.els_client
+    nanos = iter([(4e6, 2e6), (8e6, 7e6)])
+
+    def profiled_search(index, body):
+        assert body["profile"] is True
+        total, phrase = next(nanos)
+        clauses = [
+            _profile_node("DisjunctionMaxQuery", 1e6),
+            _profile_node("DisjunctionMaxQuery", phrase),
+            _profile_node("TermQuery", 0.5e6),
+        ]
+        query = _profile_node("BooleanQuery", total, clauses)
+        return {
+            "took": 3,
+            "profile": {
+                "shards": [{"searches": [{"query": [query], "rewrite_time": 1e5}]}]
+            },
+        }
+
+    es.search = profiled_search
+    report = es_retriever.profile_queries(["fast", "slow"], slowest=1)
+    stages = {row["stage"]: row for row in report["stages"]}
+    assert report["stages"][0]["stage"] == "query"
+    phrase = stages["clause:multi_match:phrase"]
+    assert phrase["mean_ms"] == 4.5 and phrase["max_ms"] == 7.0
+    assert phrase["share_of_query"] == 0.75
+    assert stages["phase:score"]["p50_ms"] == 3.0
+    assert "phase:score_count" not in stages
+    assert report["slowest_queries"] == [
+        {
+            "question": "slow",
+            "query_ms": 8.0,
+            "slowest_clause": "clause:multi_match:phrase",
+        }
+    ]
+
+
+@pytest.mark.dsm5
+def test_shared_store_maps_chunks_and_vectors(tmp_path, corpus, monkeypatch):
+    """Workers attach one mapped copy; stale sources trigger a rebuild."""
+    import json
+
+    from retrieval.shared_store import ensure_shared_store
+
+    chunks_path = tmp_path / "chunks.json"
+    chunks_path.write_text(json.dumps(corpus.chunks, ensure_ascii=False), "utf-8")
+    vectors = np.random.default_rng(2).normal(size=(len(corpus), 16))
+    vectors_path = LocalVectorIndex.build(vectors).save(str(tmp_path / "v.npy"))
+
+    store = SharedStore.build(str(tmp_path / "shared"), str(chunks_path), vectors_path)
+    attached = SharedStore.attach(store.directory).corpus()
+    assert attached.chunks[-1] == corpus.chunks[-1]
+    assert [attached.source(r) for r in range(len(corpus))] == [
+        corpus.source(r) for r in range(len(corpus))
+    ]
+    assert isinstance(attached.chunks.blob, np.memmap)
+    # Doc ids come from the mapped table: no chunk is decoded to look them up
+    assert isinstance(attached.ids.keys, np.memmap)
+    assert attached.ids[:] == corpus.ids
+    assert [attached.row(i) for i in corpus.ids] == list(range(len(corpus)))
+
+    index = store.vector_index()
+    assert isinstance(index.vectors, np.memmap)
+    assert index.search(vectors[3], k=1)[0].tolist() == [[3]]
+    binary = store.vector_index("binary")
+    expected = BinaryVectorIndex.from_index(LocalVectorIndex.build(vectors))
+    assert np.array_equal(binary.codes, expected.codes)
+    assert store.is_current(str(chunks_path), vectors_path)
+
+    chunks_path.write_text(json.dumps(corpus.chunks[:2]), "utf-8")
+    assert not store.is_current(str(chunks_path), vectors_path)
+    with pytest.raises(ValueError):
+        SharedStore.build(store.directory, str(chunks_path), vectors_path)
+
+    monkeypatch.setattr(AppConfig, "DSM5_CHUNKS_PATH", str(chunks_path))
+    monkeypatch.setattr(AppConfig, "DSM5_VECTORS_PATH", str(tmp_path / "none.npy"))
+    text_only = ensure_shared_store(str(tmp_path / "text"))
+    assert len(text_only.corpus()) == 2 and text_only.vector_index() is None
+    again = ensure_shared_store(str(tmp_path / "text"))
+    assert again.manifest == text_only.manifest
+
+    # Without fcntl (Windows) the store is still attached, only not locked
+    from retrieval import shared_store
+
+    monkeypatch.setattr(shared_store, "fcntl", None)
+    assert ensure_shared_store(str(tmp_path / "text")).manifest == again.manifest
+
+
+@pytest.mark.dsm5
+def test_hybrid_stream_emits_bm25_before_embedding(es_retriever):
+    """keyword → fused → context; the query is embedded after BM25 is sent."""
+    stages = []
+
+    def embed(text):
+        stages.append("embed")
+        return [0.0] * 4
+
+    es_retriever._get_embedding = embed
+    ids = es_retriever.els_client.corpus.ids
+    for event in es_retriever.hybrid_search_stream("q", top_k=2, include_context=True):
+        stages.append(event["stage"])
+        if event["stage"] == "keyword":
+            assert [r["id"] for r in event["results"]] == ids[1:3]
+        elif event["stage"] == "fused":
+            fused = event["results"]
+        else:
+            assert "related_sections" not in fused[0]
+            assert all("related_sections" in r for r in event["results"])
+    assert stages == ["keyword", "embed", "fused", "context"]
+    assert es_retriever.hybrid_search("q", top_k=2) == fused
+
+
+@pytest.mark.dsm5
+def test_embedding_pipeline_batches_retries_and_orders():
+    """max_batch per request, 429s retried with Retry-After, map keeps order."""
+    from process_data.embedding_pipeline import (
+        EmbeddingPipeline,
+        EmbeddingProvider,
+        RateLimited,
+        TokenBucket,
+    )
+
+    class _Provider(EmbeddingProvider):
+        name, max_batch = "fake", 3
+
+        def __init__(self):
+            super().__init__(dims=1)
+            self.calls, self.fail = [], 2
+
+        def embed(self, texts):
+            self.calls.append(len(texts))
+            if self.fail:
+                self.fail -= 1
+                raise RateLimited("429", retry_after=0.5)
+            return [[float(t)] for t in texts]
+
+    provider, slept = _Provider(), []
+    pipeline = EmbeddingPipeline(
+        provider, workers=3, limiter=TokenBucket(1e6), sleep=slept.append
+    )
+    assert pipeline.embed([str(i) for i in range(7)]) == [[float(i)] for i in range(7)]
+    assert provider.calls == [3, 3, 3, 3, 1] and slept == [0.5, 0.5]
+    assert pipeline.stats["requests"] == 5 and pipeline.stats["retries"] == 2
+
+    batches = [[str(b * 10 + i) for i in range(b % 3 + 1)] for b in range(9)]
+    results = list(pipeline.map(batches))
+    assert [i for i, _ in results] == list(range(9))
+    assert [v for _, v in results] == [[[float(t)] for t in b] for b in batches]
+
+    provider.fail, pipeline.max_retries = 5, 1
+    with pytest.raises(RateLimited):
+        pipeline.embed(["1"])
+
+    bucket = TokenBucket(rate=100, capacity=1)
+    assert bucket.acquire() == 0.0 and bucket.acquire() > 0.0
+
+
+@pytest.mark.dsm5
+def test_incremental_reindex_sends_only_the_diff(tmp_path, corpus, monkeypatch):
+    """Stable ids: unchanged chunks are skipped, stale ids deleted, vectors reused."""
+    import json
+
+    from process_data.embedding_pipeline import (
+        EmbeddingPipeline,
+        EmbeddingProvider,
+        TokenBucket,
+    )
+    from process_data.index_elastic import ElsIndexer
+    from retrieval import chunk_doc_ids
+
+    class _Provider(EmbeddingProvider):
+        name, model = "fake", "m"
+
+        def __init__(self):
+            super().__init__(dims=4)
+            self.texts = []
+
+        def embed(self, texts):
+            self.texts.extend(texts)
+            return [[float(len(t)), 0.0, 0.0, 1.0] for t in texts]
+
+    chunks_path = tmp_path / "chunks.json"
+    indexer = ElsIndexer(
+        model_name="hf_api",
+        batch_size=2,
+        chunk_path=str(chunks_path),
+        index_name="test",
+        dims=4,
+        embedding_store=str(tmp_path / "embeddings.sqlite"),
+        centroids_path=str(tmp_path / "centroids.npz"),
+    )
+    provider = _Provider()
+    indexer.embedder = EmbeddingPipeline(provider, workers=2, limiter=TokenBucket(1e6))
+    indexed, bumps = {"test": {}}, []
+
+    def bulk(actions):
+        actions = list(actions)
+        for action in actions:
+            docs = indexed[action["_index"]]
+            if action["_op_type"] == "delete":
+                del docs[action["_id"]]
+            else:
+                docs[action["_id"]] = action["_source"]
+        return len(actions)
+
+    indexer._bulk = bulk
+    indexer._indexed_ids = lambda index_name: set(indexed[index_name])
+    indexer.bump_generation = lambda: bumps.append(1)
+
+    def sync(chunks, **kwargs):
+        provider.texts.clear()
+        chunks_path.write_text(json.dumps(chunks, ensure_ascii=False), "utf-8")
+        return indexer.upload_to_els(**kwargs)
+
+    chunks = list(corpus.chunks)
+    first = sync(chunks)
+    assert first == {"indexed": 7, "reused": 0, "embedded": 7, "deleted": 0}
+    assert set(indexed["test"]) == set(corpus.ids)
+    assert indexed["test"][corpus.ids[2]]["sub_title"] == "Tiêu chí B"
+    assert indexed["test"][corpus.ids[6]]["chapter_id"] == "9"
+    assert sorted(load_centroids(indexer.centroids_path)) == ["1", "9"]
+
+    assert sync(chunks)["indexed"] == 0 and bumps == [1]
+
+    edited = dict(chunks[3], content="1.2 Second, rewritten")
+    moved = chunks[:3] + [edited] + chunks[5:] + [dict(chunks[0], title="copy")]
+    second = sync(moved)
+    assert second == {"indexed": 2, "reused": 1, "embedded": 1, "deleted": 2}
+    assert provider.texts == ["1.2 Second, rewritten"]
+    assert set(indexed["test"]) == set(chunk_doc_ids(moved)) and bumps == [1, 1]
+
+    third = sync(moved, full=True)
+    assert third["indexed"] == 7 and third["embedded"] == 0
+
+    # A fresh indexer exports centroids on its own, from the chunk file
+    fresh = ElsIndexer(
+        model_name="hf_api",
+        chunk_path=str(chunks_path),
+        index_name="test",
+        dims=4,
+        embedding_store=str(tmp_path / "embeddings.sqlite"),
+        centroids_path=str(tmp_path / "fresh.npz"),
+    )
+    fresh.embedder = indexer.embedder
+    assert sorted(load_centroids(fresh.export_centroids())) == ["1", "9"]
+
+    # Stale docs left in the index are deleted before exporting vectors
+    import process_data.index_elastic as index_elastic
+
+    indexed["test"]["gone-0000"] = {"embedding": [1.0, 0.0, 0.0, 0.0]}
+    monkeypatch.setattr(
+        index_elastic.helpers,
+        "scan",
+        lambda client, index, _source: [
+            {"_id": doc_id, "_source": doc} for doc_id, doc in indexed[index].items()
+        ],
+    )
+    indexer._client = object()
+    path = indexer.export_vectors(str(tmp_path / "vectors.npy"))
+    assert "gone-0000" not in indexed["test"] and bumps == [1, 1, 1, 1]
+    assert len(LocalVectorIndex.load(path)) == len(moved)
+    assert chunk_doc_ids([chunks[0], chunks[0]])[1] == f"{corpus.ids[0]}~1"
+
+
+@pytest.mark.dsm5
+def test_chunk_store_streams_and_seeks(tmp_path, corpus):
+    """JSON array → .jsonl + offset index; rows and doc ids read one record."""
+    import json
+
+    from retrieval import ChunkStore, convert, iter_chunks
+    from retrieval.chunk_store import iter_json_array
+
+    chunks = list(corpus.chunks) + [dict(corpus.chunks[0], content='[a], {b} "c"')]
+    source = tmp_path / "chunks.json"
+    source.write_text(json.dumps(chunks, ensure_ascii=False, indent=2), "utf-8")
+    assert list(iter_json_array(str(source), buffer_size=7)) == chunks
+
+    store = convert(str(source))
+    assert store.path == str(tmp_path / "chunks.jsonl") and len(store) == len(chunks)
+    assert list(store) == chunks and list(iter_chunks(store.path)) == chunks
+    assert store[2] == chunks[2] and store[-1] == chunks[-1]
+    assert isinstance(store.offsets, np.memmap)
+    assert [store.row(doc_id) for doc_id in corpus.ids] == list(range(len(corpus)))
+    assert store.get(corpus.ids[6]) == chunks[6] and store.get("nope") is None
+
+    loaded = DSM5Corpus.load(store.path)
+    assert loaded.ids[: len(corpus)] == corpus.ids
+    assert loaded.source(2) == corpus.source(2)
+    # Ids come from the mapped index, not from decoding the chunks
+    assert loaded.ids is store.ids or isinstance(loaded.ids.keys, np.memmap)
+    assert loaded.row(corpus.ids[4]) == 4 and loaded.row("nope") == -1
+    assert loaded.row(loaded.ids[-1]) == len(chunks) - 1
+    assert corpus.ids[3] in loaded.ids and "nope" not in loaded.ids
+
+    with open(store.path, "a", encoding="utf-8") as f:
+        f.write("{}\n")
+    with pytest.raises(ValueError):
+        ChunkStore(store.path)
+    source.write_text('{"not": "a list"}', "utf-8")
+    with pytest.raises(ValueError):
+        list(iter_chunks(str(source)))
+
+
+@pytest.mark.dsm5
+def test_stream_keyword_stage_does_not_poison_rerank_cache(es_retriever, corpus):
+    """The vector-less keyword rerank must not be reused by the fused stage."""
+    vectors = np.eye(len(corpus), 4, dtype=np.float32) + 0.01
+    index = LocalVectorIndex.build(vectors)
+    es_retriever._get_embedding = lambda text: [0.0, 0.0, 1.0, 0.0]
+    es_retriever.reranker = LexicalReranker(vector_index=index, corpus=corpus)
+    events = {
+        event["stage"]: event["results"]
+        for event in es_retriever.hybrid_search_stream("First", top_k=3)
+    }
+    assert set(events) == {"keyword", "fused"}
+
+    es_retriever.reranker = LexicalReranker(vector_index=index, corpus=corpus)
+    fresh = es_retriever.hybrid_search("First", top_k=3)
+    assert [(r["id"], r["scores"]["rerank"]) for r in events["fused"]] == [
+        (r["id"], r["scores"]["rerank"]) for r in fresh
+    ]
@@ -0,0 +1,227 @@
+"""Tests for the hospital review chain and its Neo4j vector retriever."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_community.vectorstores import Neo4jVector
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+
+import main
+from chains import review_retriever
+from chains.hospital_review_chain import HospitalReviewChain
+from chains.review_retriever import REVIEW_RETRIEVAL_QUERY, ReviewVectorRetriever
+from prompt.hospital_prompt import TEXT_NODE_PROPERTIES
+from utils import close_neo4j_drivers, helper
+
+
+class _SlowRetriever:
+    """Async retriever returning fixed reviews after `delay` seconds."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    async def ainvoke(self, input):
+        await asyncio.sleep(self.delay)
+        return [
+            Document(page_content="Nurses were kind"),
+            Document(page_content="Long wait"),
+        ]
+
+
+class _FakeStuffChain:
+    """Stands in for prompt | llm | str; records whether it was cancelled."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.cancelled = False
+
+    async def ainvoke(self, inputs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return f"{len(inputs['context'])} reviews"
+
+    async def astream(self, inputs):
+        for token in ("Patients ", "are ", "happy"):
+            yield token
+
+
+@pytest.fixture
+def review_chain():
+    """HospitalReviewChain with a fake retriever and LLM chain (no Neo4j / API)."""
+    chain = HospitalReviewChain(embedding_model="openai", llm_model="openai")
+    chain._vector_index = _SlowRetriever()
+    chain._stuff_chain = _FakeStuffChain()
+    return chain
+
+
+def test_ainvoke_returns_answer_and_docs(review_chain):
+    """Retrieval then generation, both awaited."""
+    answer, docs = asyncio.run(review_chain.ainvoke("Are patients satisfied?"))
+    assert answer == "2 reviews"
+    assert [doc.page_content for doc in docs] == ["Nurses were kind", "Long wait"]
+
+
+def test_ainvoke_timeout_covers_retrieval_and_generation(review_chain):
+    """The deadline applies to the whole pipeline and aborts the LLM call."""
+    review_chain._vector_index = _SlowRetriever(delay=1.0)
+    with pytest.raises(TimeoutError):
+        asyncio.run(review_chain.ainvoke("q", timeout=0.01))
+
+    review_chain._vector_index = _SlowRetriever()
+    review_chain._stuff_chain = _FakeStuffChain(delay=1.0)
+    with pytest.raises(TimeoutError):
+        asyncio.run(review_chain.ainvoke("q", timeout=0.01))
+    assert review_chain._stuff_chain.cancelled
+
+
+def test_ainvoke_cancellation_propagates(review_chain):
+    """Cancelling the caller cancels the in-flight LLM call."""
+    review_chain._stuff_chain = _FakeStuffChain(delay=1.0)
+
+    async def cancel_midway():
+        task = asyncio.create_task(review_chain.ainvoke("q"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel_midway())
+    assert review_chain._stuff_chain.cancelled
+
+
+def test_review_stream_sends_context_then_tokens(
+    client: TestClient, review_chain, monkeypatch
+):
+    """/reviews/stream sends context, one event per token, then done."""
+    monkeypatch.setattr(main, "review_chain", review_chain)
+    response = client.post("/reviews/stream?query=Are patients satisfied?")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line[len("data: ") :]) for line in response.text.splitlines() if line
+    ]
+    assert [event["type"] for event in events] == ["context"] + ["token"] * 3 + ["done"]
+    assert events[0]["documents"] == ["Nurses were kind", "Long wait"]
+    assert "".join(event["content"] for event in events[1:4]) == "Patients are happy"
+
+
+class _Record(dict):
+    def data(self):
+        return dict(self)
+
+
+class _Result(list):
+    def single(self):
+        return self[0] if self else None
+
+
+class _FakeDriver:
+    """Sync Neo4j driver whose sessions return `rows` for every query."""
+
+    def __init__(self, rows):
+        self.rows, self.queries, self.closed = rows, [], False
+
+    def session(self, database):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **params):
+        self.queries.append((query, params))
+        return _Result(self.rows)
+
+    def close(self):
+        self.closed = True
+
+
+def test_attach_checks_index_without_embedding(monkeypatch):
+    """attach runs one SHOW INDEXES on the shared driver, no embedding call."""
+    driver = _FakeDriver([_Record(state="ONLINE")])
+    monkeypatch.setattr(review_retriever, "get_neo4j_driver", lambda: driver)
+
+    class NoEmbeddings(FakeEmbeddings):
+        def embed_query(self, text):
+            pytest.fail("attach must not embed")
+
+    embedder = NoEmbeddings(size=4)
+
+    retriever = ReviewVectorRetriever.attach(embedder=embedder, index_name="reviews")
+    assert len(driver.queries) == 1 and "SHOW INDEXES" in driver.queries[0][0]
+    assert driver.queries[0][1] == {"index": "reviews"}
+    assert retriever.retrieval_query == REVIEW_RETRIEVAL_QUERY
+
+    driver.rows = []
+    with pytest.raises(ValueError, match="does not exist"):
+        ReviewVectorRetriever.attach(embedder=embedder, index_name="reviews")
+
+
+def test_fast_attach_search_returns_documents(monkeypatch):
+    """queryNodes + the prebuilt retrieval query, mapped to Documents."""
+    driver = _FakeDriver(
+        [
+            _Record(
+                text="\nreview: Great",
+                metadata={"id": None, "hospital": "X"},
+                score=0.9,
+            )
+        ]
+    )
+    monkeypatch.setattr(review_retriever, "get_neo4j_driver", lambda: driver)
+    retriever = ReviewVectorRetriever(embedder=FakeEmbeddings(size=4), k=3)
+
+    docs = retriever.invoke("Are patients satisfied?")
+    query, params = driver.queries[0]
+    assert query.startswith("CALL db.index.vector.queryNodes($index, $k, $embedding)")
+    assert query.endswith(REVIEW_RETRIEVAL_QUERY)
+    assert params["k"] == 3 and len(params["embedding"]) == 4
+    assert docs[0].page_content == "\nreview: Great"
+    assert docs[0].metadata == {"hospital": "X", "score": 0.9}
+
+
+def test_retrieval_query_matches_neo4j_vector(monkeypatch):
+    """The prebuilt query is the one Neo4jVector.from_existing_graph builds."""
+
+    class Built(Exception):
+        pass
+
+    def capture(self, **kwargs):
+        raise Built(kwargs["retrieval_query"])
+
+    monkeypatch.setattr(Neo4jVector, "__init__", capture)
+    with pytest.raises(Built) as built:
+        Neo4jVector.from_existing_graph(
+            embedding=FakeEmbeddings(size=4),
+            node_label="Review",
+            text_node_properties=TEXT_NODE_PROPERTIES,
+            embedding_node_property="embedding",
+        )
+    assert built.value.args[0] == REVIEW_RETRIEVAL_QUERY
+
+
+def test_close_neo4j_drivers_closes_shared_and_async(monkeypatch):
+    """Shutdown closes the shared driver and the loop's async driver."""
+    driver = _FakeDriver([])
+    monkeypatch.setattr(helper, "_neo4j_driver", driver)
+    closed = []
+
+    class AsyncDriver:
+        async def close(self):
+            closed.append(True)
+
+    async def shutdown():
+        helper._async_neo4j_drivers[asyncio.get_running_loop()] = AsyncDriver()
+        await close_neo4j_drivers()
+
+    asyncio.run(shutdown())
+    assert driver.closed and closed == [True]
+    assert helper._neo4j_driver is None and len(helper._async_neo4j_drivers) == 0
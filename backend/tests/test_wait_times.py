@@ -0,0 +1,165 @@
+"""Tests for the hospital registry and wait time tools."""
+
+import numpy as np
+import pytest
+
+from tools import wait_times
+from tools.wait_time_feed import SimulatedWaitTimeSource, WaitTimeFeed, WaitTimeSource
+from tools.wait_times import HospitalRegistry
+
+HOSPITALS = ["Wallace-Hamilton", "Burke, Griffin and Cooper", "Jordan Inc"]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Registry backed by a static loader instead of Neo4j."""
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return HOSPITALS
+
+    reg = HospitalRegistry(loader=loader, refresh_interval=0)
+    reg.calls = calls
+    monkeypatch.setattr(wait_times, "hospital_registry", reg)
+    return reg
+
+
+@pytest.fixture
+def feed(registry, monkeypatch):
+    """Wait time feed over the static registry, polled manually."""
+    reg_feed = WaitTimeFeed(
+        registry=registry,
+        source=SimulatedWaitTimeSource(seed=7),
+        capacity=8,
+        interval=0,
+    )
+    monkeypatch.setattr(wait_times, "wait_time_feed", reg_feed)
+    return reg_feed
+
+
+@pytest.mark.wait_times
+def test_registry_loads_once(registry):
+    """Registry hits the loader once, not per lookup."""
+    for _ in range(5):
+        registry.lookup("Jordan Inc")
+    assert len(registry.calls) == 1
+
+
+@pytest.mark.wait_times
+def test_registry_lookup_is_case_insensitive(registry):
+    """Lookup ignores case and surrounding whitespace."""
+    assert registry.lookup("  jordan inc ") == 2
+    assert registry.lookup("WALLACE-HAMILTON") == 0
+    assert registry.lookup("Unknown Hospital") == -1
+
+
+@pytest.mark.wait_times
+def test_current_wait_times_unknown_hospital(feed):
+    """Unknown hospital returns an explicit message."""
+    assert wait_times.get_current_wait_times("Nowhere") == (
+        "Hospital 'Nowhere' does not exist."
+    )
+
+
+@pytest.mark.wait_times
+def test_current_wait_times_known_hospital(feed):
+    """Known hospital returns a formatted duration."""
+    assert "minutes" in wait_times.get_current_wait_times("jordan inc")
+
+
+@pytest.mark.wait_times
+def test_most_available_hospital(feed):
+    """Most available hospital is one of the registered hospitals."""
+    result = wait_times.get_most_available_hospital(None)
+    assert len(result) == 1
+    name, minutes = next(iter(result.items()))
+    assert name in HOSPITALS
+    assert 0 <= minutes < 600
+
+
+@pytest.mark.wait_times
+def test_feed_ring_buffer_wraps(feed):
+    """Feed keeps at most `capacity` samples per hospital."""
+    for _ in range(20):
+        feed.poll()
+    hospitals, samples = feed._window(None)
+    assert hospitals == tuple(HOSPITALS)
+    assert samples.shape == (len(HOSPITALS), 8)
+    assert not np.isnan(samples).any()
+
+
+@pytest.mark.wait_times
+def test_feed_stats_match_numpy(feed):
+    """Rolling average and percentile are computed over the latest samples."""
+    for _ in range(5):
+        feed.poll()
+    _, samples = feed._window(3)
+    _, average = feed.rolling_average(window=3)
+    _, p90 = feed.percentile(90, window=3)
+    np.testing.assert_allclose(average, samples.mean(axis=1), rtol=1e-5)
+    np.testing.assert_allclose(p90, np.percentile(samples, 90, axis=1), rtol=1e-5)
+    _, current = feed.current()
+    np.testing.assert_array_equal(current, samples[:, 0])
+
+    row = feed.row("Jordan Inc")
+    stats = feed.hospital_stats("  jordan inc ", window=3, q=90)
+    assert stats["current"] == samples[row, 0] and stats["samples"] == 3
+    np.testing.assert_allclose(stats["average"], average[row], rtol=1e-5)
+    np.testing.assert_allclose(stats["percentile"], p90[row], rtol=1e-5)
+    assert feed.hospital_stats("Nowhere") is None
+
+
+@pytest.mark.wait_times
+def test_feed_samples_count_readings_not_columns(feed, registry):
+    """A hospital added to the registry later reports only its own readings."""
+    feed.start()
+    for _ in range(2):
+        feed.poll()
+    registry._loader = lambda: HOSPITALS + ["New Hospital"]
+    registry.refresh()
+    feed.poll()
+
+    assert feed.hospital_stats("New Hospital", window=3)["samples"] == 1
+    assert feed.hospital_stats("Jordan Inc", window=3)["samples"] == 3
+    assert feed.stats(window=3)["samples"].tolist() == [3, 3, 3, 1]
+
+
+@pytest.mark.wait_times
+def test_wait_time_source_is_abstract():
+    """A source must implement `sample`."""
+    with pytest.raises(TypeError):
+        WaitTimeSource()
+
+
+@pytest.mark.wait_times
+def test_feed_keeps_history_when_registry_changes(feed, registry):
+    """Existing hospital histories survive a registry refresh."""
+    feed.poll()
+    _, before = feed.current()
+    registry._loader = lambda: HOSPITALS + ["New Hospital"]
+    registry.refresh()
+    feed.poll()
+    hospitals, samples = feed._window(2)
+    assert hospitals[-1] == "New Hospital"
+    np.testing.assert_array_equal(samples[:3, 1], before)
+    assert np.isnan(samples[3, 1])
+
+
+@pytest.mark.wait_times
+def test_wait_times_endpoint(client, feed):
+    """Bulk wait time endpoint returns one entry per hospital."""
+    response = client.get("/hospitals/wait-times", params={"window": 10})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == len(HOSPITALS)
+    assert {h["hospital"] for h in data["hospitals"]} == set(HOSPITALS)
+    for entry in data["hospitals"]:
+        assert entry["current_minutes"] is not None
+
+
+@pytest.mark.wait_times
+def test_wait_times_endpoint_invalid_percentile(client):
+    """Percentile outside [0, 100] is rejected."""
+    response = client.get("/hospitals/wait-times", params={"percentile": 150})
+    assert response.status_code == 422
@@ -1,4 +1,8 @@
 from .cypher_tool import CypherTool
 from .health_tool import DSM5RetrievalTool
 from .review_tool import ReviewTool
-from .wait_times import get_current_wait_times, get_most_available_hospital
+from .wait_times import (
+    get_all_wait_times,
+    get_current_wait_times,
+    get_most_available_hospital,
+)
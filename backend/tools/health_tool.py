@@ -1,4 +1,5 @@
 import threading
+from typing import Any, Dict, List
 
 from langchain.tools import BaseTool
 
@@ -64,6 +65,33 @@ class DSM5RetrievalTool(BaseTool):
                 self._retriever = HealthcareRetriever(model_name=self.embedding_model)
         return self._retriever
 
+    def _format_results(
+        self, results: List[Dict[str, Any]], include_scores: bool = True
+    ) -> str:
+        """
+        Format retriever results as text, one "[Section ...]" block per chunk.
+
+        Args:
+            results: Output of hybrid_search / search_by_criteria
+            include_scores: Whether to append each result's scores
+        """
+        if not results:
+            return "No relevant DSM-5 information found."
+
+        blocks = []
+        for result in results:
+            header = (
+                f"[Section {result.get('section_id') or 'N/A'}] "
+                f"{result.get('title', '')}"
+            )
+            if result.get("sub_title"):
+                header += f"\nTiêu chí: {result['sub_title']}"
+            if include_scores:
+                header += f"\nScores: {result.get('scores', result.get('score'))}"
+            blocks.append(f"{header}\n\n{result.get('content', '')}")
+
+        return f"\n{'─' * 60}\n".join(blocks)
+
     def _run(self, query: str) -> str:
         """
         Synchronous execution of DSM-5 retrieval.
@@ -0,0 +1,238 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+from utils import AppConfig, logger
+
+
+class WaitTimeSource(ABC):
+    """
+    A source of live wait times.
+
+    `sample` returns one wait time (minutes) per hospital, in the same order
+    as the `hospitals` argument. NaN means "no reading for this hospital".
+    """
+
+    name: str = "base"
+
+    @abstractmethod
+    def sample(self, hospitals: tuple[str, ...]) -> np.ndarray:
+        """One wait time (minutes, NaN if unknown) per hospital, in order."""
+
+
+class SimulatedWaitTimeSource(WaitTimeSource):
+    """
+    Local stand-in for a real hospital feed.
+
+    Each hospital gets a random baseline and then follows a bounded random
+    walk, so consecutive samples are correlated like real queue lengths.
+    """
+
+    name: str = "simulator"
+
+    def __init__(
+        self,
+        low: int = 0,
+        high: int = 600,
+        step: int = 30,
+        seed: Optional[int] = None,
+    ):
+        self.low = low
+        self.high = high
+        self.step = step
+        self._rng = np.random.default_rng(seed)
+        self._state: dict[str, float] = {}
+
+    def sample(self, hospitals: tuple[str, ...]) -> np.ndarray:
+        previous = np.array(
+            [self._state.get(h, np.nan) for h in hospitals], dtype=np.float32
+        )
+        fresh = np.isnan(previous)
+        previous[fresh] = self._rng.integers(self.low, self.high, size=fresh.sum())
+        drift = self._rng.integers(-self.step, self.step + 1, size=len(hospitals))
+        current = np.clip(previous + drift, self.low, self.high - 1)
+        self._state = dict(zip(hospitals, current.tolist()))
+        return current
+
+
+WAIT_TIME_SOURCES = {
+    SimulatedWaitTimeSource.name: SimulatedWaitTimeSource,
+}
+
+
+def get_wait_time_source(name: str = AppConfig.WAIT_TIME_SOURCE) -> WaitTimeSource:
+    """Instantiate a registered wait time source by name."""
+    if name not in WAIT_TIME_SOURCES:
+        raise ValueError(
+            f"Unknown wait time source '{name}'. "
+            f"Available: {', '.join(WAIT_TIME_SOURCES)}"
+        )
+    return WAIT_TIME_SOURCES[name]()
+
+
+class WaitTimeFeed:
+    """
+    In-memory wait time history for every hospital in the registry.
+
+    Samples are written column by column into a fixed-size ring buffer of
+    shape (n_hospitals, capacity). Current, rolling-average and percentile
+    queries are NumPy reductions over the last `window` columns, so they are
+    answered from memory without touching Neo4j or the source.
+    """
+
+    def __init__(
+        self,
+        registry,
+        source: Optional[WaitTimeSource] = None,
+        capacity: int = AppConfig.WAIT_TIME_HISTORY_SIZE,
+        interval: float = AppConfig.WAIT_TIME_SAMPLE_INTERVAL,
+    ):
+        self.registry = registry
+        self.source = source or get_wait_time_source()
+        self.capacity = capacity
+        self.interval = interval
+        self._hospitals: tuple[str, ...] = ()
+        self._rows: dict[str, int] = {}
+        self._buffer = np.full((0, capacity), np.nan, dtype=np.float32)
+        self._head = 0  # next column to write
+        self._count = 0  # number of columns written (<= capacity)
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._started = threading.Event()
+        self._stop = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+
+    def _resize(self, hospitals: tuple[str, ...]) -> None:
+        """Re-map rows after the registry changed, keeping known histories."""
+        buffer = np.full((len(hospitals), self.capacity), np.nan, dtype=np.float32)
+        for row, hospital in enumerate(hospitals):
+            old_row = self._rows.get(hospital.lower())
+            if old_row is not None:
+                buffer[row] = self._buffer[old_row]
+        self._hospitals = hospitals
+        self._rows = {h.lower(): row for row, h in enumerate(hospitals)}
+        self._buffer = buffer
+
+    def poll(self) -> None:
+        """Take one sample from the source and append it to the ring buffer."""
+        hospitals = self.registry.names
+        samples = np.asarray(self.source.sample(hospitals), dtype=np.float32)
+        with self._lock:
+            if hospitals != self._hospitals:
+                self._resize(hospitals)
+            self._buffer[:, self._head] = samples
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Wait time feed poll failed: {str(e)}")
+
+    def start(self) -> None:
+        """Take the first sample synchronously, then keep polling in background."""
+        if self._started.is_set():
+            return
+        with self._start_lock:
+            if self._started.is_set():
+                return
+            self.poll()
+            if self.interval and self.interval > 0:
+                self._poller = threading.Thread(
+                    target=self._poll_loop, name="wait-time-feed", daemon=True
+                )
+                self._poller.start()
+            self._started.set()
+
+    def stop(self) -> None:
+        """Stop the background poller."""
+        self._stop.set()
+
+    def _columns(self, window: Optional[int]) -> np.ndarray:
+        """Ring buffer columns of the latest `window` samples, newest first.
+
+        Callers hold `_lock`.
+        """
+        n = self._count if not window else min(window, self._count)
+        return (self._head - 1 - np.arange(max(n, 1))) % self.capacity
+
+    def _window(self, window: Optional[int]) -> tuple[tuple[str, ...], np.ndarray]:
+        """Hospitals and a (n_hospitals, window) copy of the latest samples."""
+        self.start()
+        with self._lock:
+            return self._hospitals, self._buffer[:, self._columns(window)]
+
+    def row(self, hospital: str) -> int:
+        """Row of a hospital in the feed, or -1 if it is unknown."""
+        self.start()
+        with self._lock:
+            return self._rows.get(hospital.strip().lower(), -1)
+
+    def hospital_stats(
+        self, hospital: str, window: Optional[int] = None, q: float = 90
+    ) -> Optional[dict]:
+        """
+        Current, average and percentile wait time of one hospital, or None if
+        it is unknown. The row and its samples are read under one lock, so a
+        concurrent registry resize cannot pair a row with another hospital.
+        """
+        self.start()
+        with self._lock:
+            row = self._rows.get(hospital.strip().lower(), -1)
+            if row == -1:
+                return None
+            samples = self._buffer[row : row + 1, self._columns(window)]
+        return {
+            "current": float(samples[0, 0]),
+            "average": float(_nan_reduce(np.nanmean, samples)[0]),
+            "percentile": float(_nan_reduce(np.nanpercentile, samples, q)[0]),
+            "samples": int(np.count_nonzero(~np.isnan(samples))),
+        }
+
+    def current(self) -> tuple[tuple[str, ...], np.ndarray]:
+        """Latest wait time (minutes) for every hospital."""
+        hospitals, samples = self._window(1)
+        return hospitals, samples[:, 0]
+
+    def rolling_average(
+        self, window: Optional[int] = None
+    ) -> tuple[tuple[str, ...], np.ndarray]:
+        """Mean wait time over the last `window` samples (all history if None)."""
+        hospitals, samples = self._window(window)
+        return hospitals, _nan_reduce(np.nanmean, samples)
+
+    def percentile(
+        self, q: float, window: Optional[int] = None
+    ) -> tuple[tuple[str, ...], np.ndarray]:
+        """q-th percentile wait time over the last `window` samples."""
+        hospitals, samples = self._window(window)
+        return hospitals, _nan_reduce(np.nanpercentile, samples, q)
+
+    def stats(self, window: Optional[int] = None, q: float = 90) -> dict:
+        """
+        Current, average and percentile wait times for every hospital, plus
+        the number of readings behind them (hospitals added later have fewer).
+        """
+        hospitals, samples = self._window(window)
+        return {
+            "hospitals": hospitals,
+            "current": samples[:, 0],
+            "average": _nan_reduce(np.nanmean, samples),
+            "percentile": _nan_reduce(np.nanpercentile, samples, q),
+            "samples": np.count_nonzero(~np.isnan(samples), axis=1),
+        }
+
+
+def _nan_reduce(func, samples: np.ndarray, *args) -> np.ndarray:
+    """Row-wise NaN-aware reduction that returns NaN for rows without data."""
+    if samples.size == 0:
+        return np.full(samples.shape[0], np.nan, dtype=np.float32)
+    empty = np.isnan(samples).all(axis=1)
+    result = np.full(samples.shape[0], np.nan, dtype=np.float32)
+    if (~empty).any():
+        result[~empty] = func(samples[~empty], *args, axis=1)
+    return result
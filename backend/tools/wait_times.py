@@ -1,63 +1,162 @@
-import os
-from typing import Any
+import threading
+from typing import Any, Callable, Optional
 
 import numpy as np
-from langchain_community.graphs import Neo4jGraph
 
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USER = os.getenv("NEO4J_USER")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+from tools.wait_time_feed import WaitTimeFeed
+from utils import AppConfig, get_neo4j_driver, logger
+
+
+def _load_hospitals_from_neo4j() -> list[str]:
+    """Read every hospital name from Neo4j using the shared driver."""
+    with get_neo4j_driver().session(database="neo4j") as session:
+        records = session.run("MATCH (h:Hospital) RETURN h.name AS hospital_name")
+        return [r["hospital_name"] for r in records if r["hospital_name"]]
+
+
+class HospitalRegistry:
+    """
+    In-memory registry of hospital names.
+
+    Loaded once on first use, then refreshed by a daemon thread every
+    `refresh_interval` seconds. Lookups are O(1) and case-insensitive and never
+    touch Neo4j on the request path.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[], list[str]]] = None,
+        refresh_interval: float = AppConfig.HOSPITAL_REFRESH_INTERVAL,
+    ):
+        self._loader = loader or _load_hospitals_from_neo4j
+        self.refresh_interval = refresh_interval
+        # (names, lowercase name -> position); swapped as a whole on refresh
+        self._snapshot: tuple[tuple[str, ...], dict[str, int]] = ((), {})
+        self._loaded = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+
+    def refresh(self) -> None:
+        """Reload hospital names and atomically swap the snapshot."""
+        names = tuple(dict.fromkeys(self._loader()))
+        index = {name.lower(): pos for pos, name in enumerate(names)}
+        self._snapshot = (names, index)
+        self._loaded.set()
+        logger.info(f"Hospital registry loaded {len(names)} hospitals")
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Hospital registry refresh failed: {str(e)}")
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded.is_set():
+            return
+        with self._lock:
+            if self._loaded.is_set():
+                return
+            self.refresh()
+            if self.refresh_interval and self.refresh_interval > 0:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="hospital-registry", daemon=True
+                )
+                self._refresher.start()
+
+    def stop(self) -> None:
+        """Stop the background refresh thread."""
+        self._stop.set()
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        self._ensure_loaded()
+        return self._snapshot[0]
+
+    def lookup(self, hospital: str) -> int:
+        """Return the registry position of a hospital, or -1 if unknown."""
+        self._ensure_loaded()
+        return self._snapshot[1].get(hospital.strip().lower(), -1)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+hospital_registry = HospitalRegistry()
+wait_time_feed = WaitTimeFeed(registry=hospital_registry)
+
+
+def _format_minutes(wait_time_in_minutes: float) -> str:
+    hours, minutes = divmod(int(round(wait_time_in_minutes)), 60)
 
-
-def _get_current_hospitals() -> list[str]:
-    graph = Neo4jGraph(
-        url=NEO4J_URI,
-        username=NEO4J_USER,
-        password=NEO4J_PASSWORD,
-        enhanced_schema=True,
-    )
-
-    current_hospitals = graph.query(
-        query="MATCH (h:Hospital) RETURN h.name AS hospital_name"
-    )
-    current_hospitals = [d["hospital_name"].lower() for d in current_hospitals]
-    return current_hospitals
-
-
-def _get_current_wait_time_minutes(hospital: str) -> int:
-    curr_hospitals = _get_current_hospitals()
-    if hospital.lower() not in curr_hospitals:
-        return -1
-    return np.random.randint(low=0, high=600)
+    if hours > 0:
+        return f"{hours} hours {minutes} minutes"
+    return f"{minutes} minutes"
 
 
 def get_current_wait_times(hospital: str) -> str:
-    """Get the current wait time at a hospital formatted as a string."""
+    """
+    Get the current, rolling-average and percentile wait time at a hospital
+    formatted as a string.
+    """
 
-    wait_time_in_minutes = _get_current_wait_time_minutes(hospital)
-
-    if wait_time_in_minutes == -1:
+    stats = wait_time_feed.hospital_stats(
+        hospital, window=AppConfig.WAIT_TIME_WINDOW, q=AppConfig.WAIT_TIME_PERCENTILE
+    )
+    if stats is None:
         return f"Hospital '{hospital}' does not exist."
+    if np.isnan(stats["current"]):
+        return f"No current wait time reading for hospital '{hospital}'."
 
-    hours, minutes = divmod(wait_time_in_minutes, 60)
+    formatted_wait_time = _format_minutes(stats["current"])
 
-    if hours > 0:
-        formatted_wait_time = f"{hours} hours {minutes} minutes"
-    else:
-        formatted_wait_time = f"{minutes} minutes"
+    average, percentile = stats["average"], stats["percentile"]
+    if stats["samples"] > 1 and not np.isnan(average):
+        formatted_wait_time += (
+            f" (average over the last {stats['samples']} samples: "
+            f"{_format_minutes(average)}, "
+            f"p{AppConfig.WAIT_TIME_PERCENTILE:g}: {_format_minutes(percentile)})"
+        )
 
     return formatted_wait_time
 
 
 def get_most_available_hospital(_: Any) -> dict[str, float]:
-    """Find the hospital with the shortest wait time."""
+    """Find the hospital with the shortest current wait time."""
 
-    current_hospitals = _get_current_hospitals()
+    current_hospitals, current_wait_times = wait_time_feed.current()
+    if not current_hospitals or np.isnan(current_wait_times).all():
+        return {}
 
-    current_wait_times = [_get_current_wait_time_minutes(h) for h in current_hospitals]
-
-    best_time_idx = np.argmin(current_wait_times)
+    best_time_idx = int(np.nanargmin(current_wait_times))
     best_hospital = current_hospitals[best_time_idx]
-    best_wait_time = current_wait_times[best_time_idx]
+    best_wait_time = int(current_wait_times[best_time_idx])
 
     return {best_hospital: best_wait_time}
+
+
+def get_all_wait_times(
+    window: int = AppConfig.WAIT_TIME_WINDOW,
+    percentile: float = AppConfig.WAIT_TIME_PERCENTILE,
+) -> list[dict[str, Any]]:
+    """Current, rolling-average and percentile wait times for every hospital."""
+    stats = wait_time_feed.stats(window=window, q=percentile)
+
+    def _minutes(value: float) -> Optional[float]:
+        return None if np.isnan(value) else round(float(value), 1)
+
+    return [
+        {
+            "hospital": hospital,
+            "current_minutes": _minutes(current),
+            "average_minutes": _minutes(average),
+            "percentile_minutes": _minutes(pct),
+        }
+        for hospital, current, average, pct in zip(
+            stats["hospitals"],
+            stats["current"],
+            stats["average"],
+            stats["percentile"],
+        )
+    ]
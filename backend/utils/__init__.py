@@ -1,3 +1,12 @@
 from .config import AppConfig
-from .helper import ModelFactory, async_retry, format_output, load_json, save_json
+from .helper import (
+    ModelFactory,
+    async_retry,
+    close_neo4j_drivers,
+    format_output,
+    get_async_neo4j_driver,
+    get_neo4j_driver,
+    load_json,
+    save_json,
+)
 from .logging import logger
@@ -27,6 +27,14 @@ class AppConfig:
     HF_EMBEDDING_API: str = os.getenv("HF_EMBEDDING_API")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY")
+    # Embedding pipeline of the indexers (process_data/embedding_pipeline.py):
+    # requests per second per provider, worker threads, retries on 429 / 5xx
+    EMBED_RPS_OPENAI: float = float(os.getenv("EMBED_RPS_OPENAI", "20"))
+    EMBED_RPS_GOOGLE: float = float(os.getenv("EMBED_RPS_GOOGLE", "2"))
+    EMBED_RPS_HF_API: float = float(os.getenv("EMBED_RPS_HF_API", "10"))
+    EMBED_WORKERS: int = int(os.getenv("EMBED_WORKERS", "4"))
+    EMBED_MAX_RETRIES: int = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+    EMBED_TIMEOUT: float = float(os.getenv("EMBED_TIMEOUT", "60"))
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
 
     # DATABASE CONFIGURATION
@@ -40,15 +48,69 @@ class AppConfig:
     # HOST, PORT
     ELS_HOST: str = os.getenv("ELS_HOST")
     ELS_PORT: str = os.getenv("ELS_PORT")
+    # dense_vector profile of the DSM-5 index: float | int8 | int4 | bbq
+    ELS_INDEX_PROFILE: str = os.getenv("ELS_INDEX_PROFILE", "float")
+    # DSM-5 index queried by the chatbot, e.g. "healthcare-d256"; the query
+    # embedding size is read from its mapping (see retrieval/dimensions.py)
+    DSM5_INDEX_NAME: str = os.getenv("DSM5_INDEX_NAME", INDEX_NAME_ELS)
+    # DSM-5 kNN backend: "elasticsearch" or "local" (NumPy, see DSM5_VECTORS_PATH)
+    DSM5_VECTOR_BACKEND: str = os.getenv("DSM5_VECTOR_BACKEND", "elasticsearch")
+    # Local kNN vectors: "none" (float) or "binary" (sign bits + exact rescoring
+    # of DSM5_RESCORE_FACTOR * k Hamming candidates)
+    DSM5_VECTOR_QUANTIZATION: str = os.getenv("DSM5_VECTOR_QUANTIZATION", "none")
+    DSM5_RESCORE_FACTOR: int = int(os.getenv("DSM5_RESCORE_FACTOR", "10"))
+    # Coarse-to-fine kNN: search only the chunks of the N chapters whose
+    # centroid is closest to the query (0 = flat search over every chunk)
+    DSM5_COARSE_SECTIONS: int = int(os.getenv("DSM5_COARSE_SECTIONS", "0"))
+    # Restrict kNN and BM25 to the disorder(s) a query names (disorder_key).
+    # Off by default: it drops disorders a query asks about but does not name.
+    DSM5_ENTITY_FILTER: bool = (
+        os.getenv("DSM5_ENTITY_FILTER", "false").lower() == "true"
+    )
+    # DSM-5 keyword backend: "elasticsearch" or "local" (in-process BM25)
+    DSM5_KEYWORD_BACKEND: str = os.getenv("DSM5_KEYWORD_BACKEND", "elasticsearch")
+    # Second stage after fusion: "lexical" or "none". The lexical weights are
+    # hand-tuned and not evaluated yet, so fused order is kept by default.
+    DSM5_RERANKER: str = os.getenv("DSM5_RERANKER", "none")
+    # Two-phase search: score-only ES queries, then one payload fetch for winners
+    DSM5_TWO_PHASE: bool = os.getenv("DSM5_TWO_PHASE", "true").lower() == "true"
+    # Where two-phase payloads come from: "elasticsearch" (mget) or "local"
+    DSM5_PAYLOAD_STORE: str = os.getenv("DSM5_PAYLOAD_STORE", "elasticsearch")
+    # Adaptive retrieval planner: fetch size, num_candidates, context and early
+    # stop chosen per request so the ES stages stay within the budget. Off until
+    # the thresholds are tuned from the "retrieval_plan" log lines.
+    DSM5_ADAPTIVE_PLANNER: bool = (
+        os.getenv("DSM5_ADAPTIVE_PLANNER", "false").lower() == "true"
+    )
+    DSM5_LATENCY_BUDGET_MS: float = float(os.getenv("DSM5_LATENCY_BUDGET_MS", "300"))
+    # Result cache for hybrid_search / search_by_criteria: in-process LRU, plus
+    # Redis (REDIS_URL) shared across workers. Keys include the index generation
+    # ElsIndexer writes on every (re)index, re-read every N seconds.
+    DSM5_RESULT_CACHE: bool = os.getenv("DSM5_RESULT_CACHE", "true").lower() == "true"
+    DSM5_RESULT_CACHE_REDIS: bool = (
+        os.getenv("DSM5_RESULT_CACHE_REDIS", "true").lower() == "true"
+    )
+    DSM5_RESULT_CACHE_SIZE: int = int(os.getenv("DSM5_RESULT_CACHE_SIZE", "1024"))
+    DSM5_RESULT_CACHE_TTL: int = int(os.getenv("DSM5_RESULT_CACHE_TTL", "86400"))
+    DSM5_GENERATION_REFRESH_S: float = float(
+        os.getenv("DSM5_GENERATION_REFRESH_S", "30")
+    )
 
     JAEGER_ENDPOINT = os.getenv("JAEGER_ENDPOINT")
 
     # PARAMETERS
+    # Default embedding size; DSM-5 indexes may use any of EMBEDDING_DIMS
     VECTOR_SIZE: int = 768
     TEMPERATURE: float = 0
     REVIEW_TOP_K: int = 10
     CYPHER_TOP_K: int = 5
     MEMORY_TOP_K: int = 5
+    HOSPITAL_REFRESH_INTERVAL: int = 300  # seconds between hospital registry reloads
+    WAIT_TIME_SOURCE: str = "simulator"  # registered source in tools/wait_time_feed.py
+    WAIT_TIME_SAMPLE_INTERVAL: int = 60  # seconds between wait time samples
+    WAIT_TIME_HISTORY_SIZE: int = 1440  # samples kept per hospital (24h at 1/min)
+    WAIT_TIME_WINDOW: int = 60  # default rolling window, in samples
+    WAIT_TIME_PERCENTILE: float = 90
     TTL: int = 86400  # 24 hours in seconds
     LANGUAGE: str = "Vietnamese"
     ENV_LOG: str = os.getenv("ENV_LOG")
@@ -75,7 +137,38 @@ class AppConfig:
     DSM5_PATH: str = str(
         PROJET_ROOT / "data" / "dsm5" / "dsm-5-cac-tieu-chuan-chan-doan.pdf"
     )
-    DSM5_CHUNKS_PATH: str = str(PROJET_ROOT / "data" / "dsm5" / "dsm5_chunks.json")
+    # .json array, or a streaming chunk store (.jsonl + .idx, see
+    # retrieval/chunk_store.py: `python -m retrieval.chunk_store` converts)
+    DSM5_CHUNKS_PATH: str = os.getenv(
+        "DSM5_CHUNKS_PATH", str(PROJET_ROOT / "data" / "dsm5" / "dsm5_chunks.json")
+    )
+    DSM5_VECTORS_PATH: str = str(PROJET_ROOT / "data" / "dsm5" / "dsm5_embeddings.npy")
+    # Chapter centroids for the coarse kNN stage, written by ElsIndexer; used
+    # when the full matrix (DSM5_VECTORS_PATH) is not exported
+    DSM5_CENTROIDS_PATH: str = os.getenv(
+        "DSM5_CENTROIDS_PATH",
+        str(PROJET_ROOT / "data" / "dsm5" / "dsm5_chapter_centroids.npz"),
+    )
+    # Embeddings reused across (re)indexing runs, keyed by content hash + model
+    DSM5_EMBEDDING_STORE: str = os.getenv(
+        "DSM5_EMBEDDING_STORE",
+        str(PROJET_ROOT / "data" / "dsm5" / "dsm5_embeddings.sqlite"),
+    )
+    # Chunks + vectors as memory-mapped arrays shared by every worker
+    # (retrieval/shared_store.py); e.g. /dev/shm/dsm5 to keep them in RAM
+    DSM5_SHARED_STORE: bool = os.getenv("DSM5_SHARED_STORE", "false").lower() == "true"
+    DSM5_SHARED_DIR: str = os.getenv(
+        "DSM5_SHARED_DIR", str(PROJET_ROOT / "data" / "dsm5" / "shared")
+    )
+
+    DSM5_QUESTIONS_PATH: str = str(
+        PROJET_ROOT / "data" / "questions" / "questions_dsm5.csv"
+    )
+    # POST /admin/dsm5/profile replays DSM5_QUESTIONS_PATH against the live
+    # index (and embeds every question with knn=true): off unless enabled
+    DSM5_PROFILE_ENDPOINT: bool = (
+        os.getenv("DSM5_PROFILE_ENDPOINT", "false").lower() == "true"
+    )
 
     DSM5_DATASET_EVAL_PATH: str = str(
         PROJET_ROOT / "data" / "evaluate" / "dataset" / "dsm5_dataset_eval.csv"
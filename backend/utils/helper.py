@@ -1,5 +1,7 @@
 import asyncio
 import json
+import threading
+import weakref
 from typing import Literal
 
 from utils.config import AppConfig
@@ -103,6 +105,76 @@ class ModelFactory:
         return embedding_model
 
 
+_neo4j_driver = None
+_neo4j_driver_lock = threading.Lock()
+
+
+def get_neo4j_driver():
+    """
+    Process-wide Neo4j driver.
+
+    The driver is thread-safe and pools its own connections, so every caller
+    (hospital registry, review retriever, ...) should share this instance
+    instead of opening a new Neo4jGraph per request.
+    """
+    global _neo4j_driver
+    if _neo4j_driver is None:
+        with _neo4j_driver_lock:
+            if _neo4j_driver is None:
+                from neo4j import GraphDatabase
+
+                _neo4j_driver = GraphDatabase.driver(
+                    AppConfig.NEO4J_URI,
+                    auth=(AppConfig.NEO4J_USER, AppConfig.NEO4J_PASSWORD),
+                )
+    return _neo4j_driver
+
+
+_async_neo4j_drivers: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_async_neo4j_driver():
+    """
+    Async Neo4j driver for the running event loop.
+
+    Async drivers are bound to the loop that created them, so one driver is
+    kept per loop (normally just the uvicorn loop).
+    """
+    loop = asyncio.get_running_loop()
+    driver = _async_neo4j_drivers.get(loop)
+    if driver is None:
+        from neo4j import AsyncGraphDatabase
+
+        driver = AsyncGraphDatabase.driver(
+            AppConfig.NEO4J_URI,
+            auth=(AppConfig.NEO4J_USER, AppConfig.NEO4J_PASSWORD),
+        )
+        _async_neo4j_drivers[loop] = driver
+    return driver
+
+
+async def close_neo4j_drivers() -> None:
+    """
+    Close the shared driver and every per-loop async driver (app shutdown).
+
+    Must run on the event loop: its own async driver is awaited, drivers of
+    other running loops are closed on their loop, the rest are dropped.
+    """
+    global _neo4j_driver
+    with _neo4j_driver_lock:
+        driver, _neo4j_driver = _neo4j_driver, None
+    if driver is not None:
+        driver.close()
+
+    current = asyncio.get_running_loop()
+    for loop, async_driver in list(_async_neo4j_drivers.items()):
+        _async_neo4j_drivers.pop(loop, None)
+        if loop is current:
+            await async_driver.close()
+        elif loop.is_running():
+            asyncio.run_coroutine_threadsafe(async_driver.close(), loop)
+
+
 def save_json(data: dict, output_path: str):
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
@@ -1,6 +1,7 @@
 """Tools page with separate tool access."""
 import streamlit as st
 from src.utils.api_client import api_client
+from src.utils.helpers import parse_stream_event
 import json
 
 def show_tools():
@@ -68,26 +69,44 @@ def show_dsm5_hybrid():
             st.warning("Please enter a search query")
             return
             
-        with st.spinner("Performing hybrid search..."):
-            response = api_client.dsm5_hybrid_search(query, top_k)
+        # Kết quả BM25 hiện ngay, sau đó được thay bằng kết quả đã fuse với kNN
+        status = st.empty()
+        results_placeholder = st.empty()
+        stage_labels = {
+            "keyword": "Keyword results (semantic search running...)",
+            "fused": "Hybrid results",
+            "context": "Hybrid results with related sections",
+        }
+        response = None
+        
+        for line in api_client.dsm5_hybrid_stream(query, top_k):
+            event = parse_stream_event(line)
+            if not event:
+                continue
+            if event.get("type") == "error":
+                st.error(f"Error: {event.get('error')}")
+                return
+            if event.get("type") in stage_labels:
+                response = event
+                status.info(
+                    f"{stage_labels[event['type']]} · {event.get('elapsed_ms', 0):.0f} ms"
+                )
+                results_placeholder.markdown(event.get("response", "No results found"))
+        
+        if response is not None:
+            results_count = response.get('results_count', 0)
+            status.success(
+                f"✅ Found {results_count} results in {response.get('elapsed_ms', 0):.0f} ms"
+            )
             
-            if "error" in response:
-                st.error(f"Error: {response['error']}")
-            else:
-                results_count = response.get('results_count', 0)
-                st.success(f"✅ Found {results_count} results")
-                
-                with st.container():
-                    st.markdown(response.get("response", "No results found"))
-                
-                # Show stats
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Results Count", results_count)
-                with col2:
-                    st.metric("Top-K Setting", top_k)
-                with col3:
-                    st.metric("Query Length", len(query))
+            # Show stats
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Results Count", results_count)
+            with col2:
+                st.metric("Top-K Setting", top_k)
+            with col3:
+                st.metric("Query Length", len(query))
 
 def show_hospital_query():
     """Hospital Query tool using Neo4j."""
@@ -216,6 +216,21 @@ class APIClient:
         except Exception as e:
             return {"error": str(e)}
     
+    def dsm5_hybrid_stream(self, query: str, top_k: int = 5) -> Iterator[str]:
+        """Stream hybrid search stages (keyword → fused → context)."""
+        try:
+            response = requests.post(
+                f"{self.base_url}/dsm5/hybrid/stream",
+                params={"query": query, "top_k": top_k},
+                stream=True,
+                timeout=TIMEOUT
+            )
+            for line in response.iter_lines():
+                if line:
+                    yield line.decode('utf-8')
+        except Exception as e:
+            yield "data: " + json.dumps({"type": "error", "error": str(e)})
+    
     # ============================================================
     # Neo4j/Cypher Tools
     # ============================================================